@@ -0,0 +1,224 @@
+from __future__ import annotations
+
+import asyncio
+import contextvars
+import math
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from functools import partial
+from typing import TYPE_CHECKING, Any, Callable, Optional, TypeVar, Union
+
+from starlette.concurrency import run_in_threadpool
+
+from .metrics import REGISTRY
+from .profiling import profiled
+from .storage import Storage
+
+if TYPE_CHECKING:
+    from .sharding import ShardedStorage
+
+WRITER_IDLE_SECONDS = 5.0
+WRITE_QUEUE_LIMIT = 1000
+# Weight of the newest command when updating the average used for Retry-After.
+COMMAND_TIME_SMOOTHING = 0.2
+
+T = TypeVar("T")
+# A command is either a function taking the storage as its first argument or the
+# name of a storage method, which resolves correctly for plain and sharded stores.
+Command = Union[Callable[..., Any], str]
+
+WRITE_QUEUE_WAIT = REGISTRY.histogram(
+    "storage_write_queue_wait_seconds",
+    "Time a store mutation waited for the writer thread.",
+)
+WRITE_DURATION = REGISTRY.histogram(
+    "storage_write_duration_seconds",
+    "Time the writer thread spent applying a store mutation.",
+)
+WRITES_REJECTED = REGISTRY.counter(
+    "storage_writes_rejected_total",
+    "Store mutations refused because the writer queue was full.",
+)
+
+
+class WriteQueueFullError(RuntimeError):
+    def __init__(self, pending: int, retry_after: int) -> None:
+        super().__init__(f"store writer is saturated ({pending} pending writes)")
+        self.pending = pending
+        self.retry_after = retry_after
+
+
+def _bind(target: Any, func: Command, args: tuple, kwargs: dict) -> Callable[[], Any]:
+    if isinstance(func, str):
+        return profiled(partial(getattr(target, func), *args, **kwargs))
+    return profiled(partial(func, target, *args, **kwargs))
+
+
+class _Writer:
+    # One thread applying commands to one store file in order. The queue is bounded
+    # so bursts are refused with a retry hint instead of queueing until the file
+    # lock times out.
+    def __init__(self, name: str, idle_seconds: float, max_pending: int) -> None:
+        self.name = name
+        self.idle_seconds = idle_seconds
+        self.max_pending = max_pending
+        self._queue: queue.SimpleQueue[tuple[Future, contextvars.Context, Callable[[], Any], float]] = queue.SimpleQueue()
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        self._pending = 0
+        self._average_seconds = 0.0
+
+    @property
+    def pending(self) -> int:
+        with self._lock:
+            return self._pending
+
+    def owns_current_thread(self) -> bool:
+        return threading.current_thread() is self._thread
+
+    def submit(self, call: Callable[[], Any], bounded: bool = True) -> Future:
+        future: Future = Future()
+        with self._lock:
+            if bounded and self._pending >= self.max_pending:
+                WRITES_REJECTED.inc()
+                raise WriteQueueFullError(self._pending, max(math.ceil(self._pending * self._average_seconds), 1))
+            self._pending += 1
+            # The caller's context travels with the job so request timings still see
+            # the storage phases that run on the writer thread.
+            self._queue.put((future, contextvars.copy_context(), call, time.perf_counter()))
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name=self.name, daemon=True)
+                self._thread.start()
+        return future
+
+    def _run(self) -> None:
+        while True:
+            try:
+                future, context, call, queued_at = self._queue.get(timeout=self.idle_seconds)
+            except queue.Empty:
+                with self._lock:
+                    if self._queue.empty():
+                        self._thread = None
+                        return
+                continue
+            started = time.perf_counter()
+            WRITE_QUEUE_WAIT.observe(started - queued_at)
+            try:
+                if not future.set_running_or_notify_cancel():
+                    continue
+                try:
+                    result = context.run(call)
+                except BaseException as exc:
+                    future.set_exception(exc)
+                else:
+                    future.set_result(result)
+            finally:
+                elapsed = time.perf_counter() - started
+                WRITE_DURATION.observe(elapsed)
+                with self._lock:
+                    self._pending -= 1
+                    self._average_seconds += COMMAND_TIME_SMOOTHING * (elapsed - self._average_seconds)
+
+
+class AsyncStorage:
+    # Async front for a Storage or ShardedStorage. Every mutation is a command
+    # applied in order by the writer that owns the target store, which is the only
+    # code in the process that saves it; reads use the snapshot it last published.
+    # Commands given a ``shard_key`` go to that account's shard writer, so writes to
+    # different shards proceed in parallel. Other commands use the store-wide writer
+    # and, on a sharded store, must only touch data outside the account shards.
+    def __init__(
+        self,
+        storage: Union[Storage, "ShardedStorage"],
+        idle_seconds: float = WRITER_IDLE_SECONDS,
+        max_pending: int = WRITE_QUEUE_LIMIT,
+    ) -> None:
+        self.storage = storage
+        self.idle_seconds = idle_seconds
+        self.max_pending = max_pending
+        self._writers: dict[int, _Writer] = {}
+        self._writers_lock = threading.Lock()
+
+    def _target(self, shard_key: Optional[str]) -> Any:
+        return self.storage if shard_key is None else self.storage.shard_for(shard_key)
+
+    def _writer_for(self, target: Any) -> _Writer:
+        with self._writers_lock:
+            writer = self._writers.get(id(target))
+            if writer is None:
+                writer = self._writers[id(target)] = _Writer(
+                    f"storage-writer-{len(self._writers)}", self.idle_seconds, self.max_pending
+                )
+            return writer
+
+    @property
+    def pending(self) -> int:
+        with self._writers_lock:
+            writers = list(self._writers.values())
+        return sum(writer.pending for writer in writers)
+
+    async def read(
+        self,
+        func: Command,
+        *args: Any,
+        shard_key: Optional[str] = None,
+        inline: bool = False,
+        **kwargs: Any,
+    ) -> Any:
+        return await self.read_from(self._target(shard_key), func, *args, inline=inline, **kwargs)
+
+    async def read_from(self, target: Any, func: Command, *args: Any, inline: bool = False, **kwargs: Any) -> Any:
+        # Only reads the caller marks ``inline`` (keyed lookups that cost about the
+        # same as a threadpool hop) run on the event loop, and only while the
+        # snapshot is current. Scans, sorts and index builds always go to the
+        # threadpool so one large read never stalls every other connection.
+        call = _bind(target, func, args, kwargs)
+        if inline and target.is_cached():
+            return call()
+        return await run_in_threadpool(call)
+
+    def submit(
+        self,
+        func: Command,
+        *args: Any,
+        shard_key: Optional[str] = None,
+        bounded: bool = True,
+        **kwargs: Any,
+    ) -> Future:
+        target = self._target(shard_key)
+        return self._writer_for(target).submit(_bind(target, func, args, kwargs), bounded=bounded)
+
+    async def write(self, func: Command, *args: Any, shard_key: Optional[str] = None, **kwargs: Any) -> Any:
+        return await asyncio.wrap_future(self.submit(func, *args, shard_key=shard_key, **kwargs))
+
+    async def write_each(self, func: Command, *args: Any, **kwargs: Any) -> list[Any]:
+        # Fan a command out to every shard's writer; a plain store has one shard.
+        futures = [
+            self._writer_for(shard).submit(_bind(shard, func, args, kwargs)) for shard in self.storage.shards()
+        ]
+        return list(await asyncio.gather(*(asyncio.wrap_future(future) for future in futures)))
+
+    def call(self, func: Command, *args: Any, shard_key: Optional[str] = None, **kwargs: Any) -> Any:
+        # Blocking form for background threads such as the scheduler. Internal work
+        # is never refused, and a command issued from its own writer runs inline.
+        target = self._target(shard_key)
+        writer = self._writer_for(target)
+        call = _bind(target, func, args, kwargs)
+        if writer.owns_current_thread():
+            return call()
+        return writer.submit(call, bounded=False).result()
+
+    def call_each(self, func: Command, *args: Any, **kwargs: Any) -> list[Any]:
+        futures = []
+        for shard in self.storage.shards():
+            writer = self._writer_for(shard)
+            call = _bind(shard, func, args, kwargs)
+            if writer.owns_current_thread():
+                future: Future = Future()
+                future.set_result(call())
+                futures.append(future)
+            else:
+                futures.append(writer.submit(call, bounded=False))
+        return [future.result() for future in futures]
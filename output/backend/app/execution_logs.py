@@ -0,0 +1,73 @@
+from __future__ import annotations
+
+import threading
+from pathlib import Path
+from typing import Optional
+
+FLUSH_BYTES = 8192
+FLUSH_INTERVAL_SECONDS = 0.5
+
+
+class LogAppender:
+    def __init__(
+        self,
+        path: Path,
+        flush_bytes: int = FLUSH_BYTES,
+        flush_interval: float = FLUSH_INTERVAL_SECONDS,
+    ) -> None:
+        self.path = path
+        self.flush_bytes = flush_bytes
+        self.flush_interval = flush_interval
+        self._handle = path.open("ab")
+        self._buffer: list[bytes] = []
+        self._buffered = 0
+        self._timer: Optional[threading.Timer] = None
+        self._lock = threading.Lock()
+        self._closed = False
+
+    def write_line(self, message: str) -> None:
+        data = (message + "\n").encode("utf-8")
+        with self._lock:
+            if self._closed:
+                # Late output from a timed-out handler still lands in the log.
+                with self.path.open("ab") as handle:
+                    handle.write(data)
+                return
+            self._buffer.append(data)
+            self._buffered += len(data)
+            if self._buffered >= self.flush_bytes:
+                self._flush_locked()
+            elif self._timer is None:
+                self._timer = threading.Timer(self.flush_interval, self.flush)
+                self._timer.daemon = True
+                self._timer.start()
+
+    def flush(self) -> None:
+        with self._lock:
+            if not self._closed:
+                self._flush_locked()
+
+    def _flush_locked(self) -> None:
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        if self._buffer:
+            self._handle.write(b"".join(self._buffer))
+            self._buffer.clear()
+            self._buffered = 0
+        self._handle.flush()
+
+    def close(self) -> None:
+        with self._lock:
+            if self._closed:
+                return
+            self._flush_locked()
+            self._handle.close()
+            self._closed = True
+
+    def __enter__(self) -> "LogAppender":
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        self.close()
+
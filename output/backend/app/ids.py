@@ -0,0 +1,35 @@
+from __future__ import annotations
+
+import os
+import threading
+import time
+import uuid
+
+_lock = threading.Lock()
+_last_ms = 0
+_sequence = 0
+
+
+def uuid7() -> uuid.UUID:
+    # RFC 9562 version 7: 48-bit Unix milliseconds, then a 12-bit counter that keeps
+    # ids from one process in creation order within a millisecond, then random bits.
+    global _last_ms, _sequence
+    with _lock:
+        now_ms = time.time_ns() // 1_000_000
+        if now_ms > _last_ms:
+            _last_ms = now_ms
+            _sequence = int.from_bytes(os.urandom(2), "big") & 0x3FF
+        else:
+            _sequence += 1
+            if _sequence > 0xFFF:
+                # Counter exhausted: borrow the next millisecond rather than go backwards.
+                _last_ms += 1
+                _sequence = 0
+        timestamp, sequence = _last_ms, _sequence
+    random_bits = int.from_bytes(os.urandom(8), "big") & ((1 << 62) - 1)
+    value = (timestamp & ((1 << 48) - 1)) << 80 | 0x7 << 76 | sequence << 64 | 0b10 << 62 | random_bits
+    return uuid.UUID(int=value)
+
+
+def new_transaction_id() -> str:
+    return str(uuid7())
@@ -0,0 +1,146 @@
+from __future__ import annotations
+
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from typing import Iterator, Optional
+
+from .metrics import MetricsRegistry
+
+
+@dataclass
+class RequestTimings:
+    phases: dict[str, float] = field(default_factory=dict)
+    bytes_read: int = 0
+    bytes_written: int = 0
+
+    def add(self, phase: str, seconds: float) -> None:
+        self.phases[phase] = self.phases.get(phase, 0.0) + seconds
+
+
+_current: ContextVar[Optional[RequestTimings]] = ContextVar("request_timings", default=None)
+
+
+class _NullTimer:
+    def __enter__(self) -> None:
+        return None
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        return None
+
+
+class _PhaseTimer:
+    __slots__ = ("timings", "phase", "start")
+
+    def __init__(self, timings: RequestTimings, phase: str) -> None:
+        self.timings = timings
+        self.phase = phase
+        self.start = 0.0
+
+    def __enter__(self) -> None:
+        self.start = time.perf_counter()
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        self.timings.add(self.phase, time.perf_counter() - self.start)
+
+
+_NULL_TIMER = _NullTimer()
+
+
+def timed(phase: str) -> _NullTimer | _PhaseTimer:
+    timings = _current.get()
+    if timings is None:
+        return _NULL_TIMER
+    return _PhaseTimer(timings, phase)
+
+
+def record_bytes(read: int = 0, written: int = 0) -> None:
+    timings = _current.get()
+    if timings is not None:
+        timings.bytes_read += read
+        timings.bytes_written += written
+
+
+def current_timings() -> Optional[RequestTimings]:
+    return _current.get()
+
+
+@contextmanager
+def collect_timings() -> Iterator[RequestTimings]:
+    timings = RequestTimings()
+    token = _current.set(timings)
+    try:
+        yield timings
+    finally:
+        _current.reset(token)
+
+
+class RequestTimingMiddleware:
+    def __init__(self, app, registry: MetricsRegistry) -> None:
+        self.app = app
+        self.request_duration = registry.histogram(
+            "http_request_duration_seconds",
+            "HTTP request latency by route.",
+            ("method", "route", "status"),
+        )
+        self.storage_phase = registry.histogram(
+            "http_storage_phase_seconds",
+            "Time spent per storage phase within a request.",
+            ("route", "phase"),
+        )
+        self.storage_bytes_read = registry.counter(
+            "http_storage_bytes_read_total",
+            "Store bytes read while serving requests.",
+            ("route",),
+        )
+        self.storage_bytes_written = registry.counter(
+            "http_storage_bytes_written_total",
+            "Store bytes written while serving requests.",
+            ("route",),
+        )
+
+    async def __call__(self, scope, receive, send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        timings = RequestTimings()
+        token = _current.set(timings)
+        start = time.perf_counter()
+        status_code = 500
+
+        async def send_with_timing(message) -> None:
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+                headers = list(message.get("headers", []))
+                headers.append((b"server-timing", self._server_timing(timings, time.perf_counter() - start).encode("latin-1")))
+                message = {**message, "headers": headers}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            _current.reset(token)
+            route = scope.get("route")
+            route_path = getattr(route, "path", "unmatched")
+            self.request_duration.observe(
+                time.perf_counter() - start,
+                method=scope["method"],
+                route=route_path,
+                status=str(status_code),
+            )
+            for phase, seconds in timings.phases.items():
+                self.storage_phase.observe(seconds, route=route_path, phase=phase)
+            if timings.bytes_read:
+                self.storage_bytes_read.inc(timings.bytes_read, route=route_path)
+            if timings.bytes_written:
+                self.storage_bytes_written.inc(timings.bytes_written, route=route_path)
+
+    @staticmethod
+    def _server_timing(timings: RequestTimings, elapsed: float) -> str:
+        entries = [f"app;dur={elapsed * 1000:.3f}"]
+        for phase, seconds in timings.phases.items():
+            entries.append(f"storage-{phase.replace('_', '-')};dur={seconds * 1000:.3f}")
+        entries.append(f'storage-bytes;desc="read={timings.bytes_read} written={timings.bytes_written}"')
+        return ", ".join(entries)
@@ -0,0 +1,255 @@
+from __future__ import annotations
+
+import gzip
+import json
+import os
+import shutil
+import tempfile
+import threading
+import uuid
+from dataclasses import asdict, dataclass
+from datetime import datetime
+from pathlib import Path
+from typing import IO, Container, Iterable, Optional
+
+SEGMENT_MAX_BYTES = 1024 * 1024
+INDEX_NAME = "index.jsonl"
+
+
+@dataclass(frozen=True)
+class LogRecord:
+    execution_id: str
+    segment: int
+    offset: int
+    length: int
+    created_at: str
+
+
+@dataclass
+class _TaskIndex:
+    records: dict[str, LogRecord]
+    tombstones: int
+    active_segment: int
+    stamp: tuple[int, int]
+
+
+class ExecutionLogStore:
+    def __init__(self, root: Path, segment_max_bytes: int = SEGMENT_MAX_BYTES) -> None:
+        self.root = root
+        self.segment_max_bytes = segment_max_bytes
+        self._indexes: dict[str, _TaskIndex] = {}
+        self._lock = threading.RLock()
+
+    def live_path(self, task_id: str, execution_id: str) -> Path:
+        return self.root / task_id / f"{execution_id}.log"
+
+    def _task_dir(self, task_id: str) -> Path:
+        return self.root / task_id
+
+    def _index_path(self, task_id: str) -> Path:
+        return self._task_dir(task_id) / INDEX_NAME
+
+    def _segment_path(self, task_id: str, segment: int, compressed: bool = False) -> Path:
+        suffix = ".log.gz" if compressed else ".log"
+        return self._task_dir(task_id) / f"segment-{segment:06d}{suffix}"
+
+    @staticmethod
+    def _stamp(path: Path) -> tuple[int, int]:
+        try:
+            stat = path.stat()
+        except FileNotFoundError:
+            return (0, 0)
+        return (stat.st_size, stat.st_mtime_ns)
+
+    def _index(self, task_id: str) -> _TaskIndex:
+        index_path = self._index_path(task_id)
+        stamp = self._stamp(index_path)
+        cached = self._indexes.get(task_id)
+        if cached is not None and cached.stamp == stamp:
+            return cached
+        records: dict[str, LogRecord] = {}
+        tombstones = 0
+        active_segment = 1
+        if stamp != (0, 0):
+            with index_path.open("r", encoding="utf-8") as handle:
+                for line in handle:
+                    if not line.strip():
+                        continue
+                    entry = json.loads(line)
+                    if entry.pop("op") == "del":
+                        if records.pop(entry["execution_id"], None) is not None:
+                            tombstones += 1
+                        continue
+                    record = LogRecord(**entry)
+                    records[record.execution_id] = record
+                    active_segment = max(active_segment, record.segment)
+        index = _TaskIndex(records=records, tombstones=tombstones, active_segment=active_segment, stamp=stamp)
+        self._indexes[task_id] = index
+        return index
+
+    def _append_index(self, task_id: str, index: _TaskIndex, entries: Iterable[dict]) -> None:
+        index_path = self._index_path(task_id)
+        with index_path.open("a", encoding="utf-8") as handle:
+            for entry in entries:
+                handle.write(json.dumps(entry, sort_keys=True) + "\n")
+            handle.flush()
+            os.fsync(handle.fileno())
+        index.stamp = self._stamp(index_path)
+
+    def _rewrite_index(self, task_id: str, index: _TaskIndex) -> None:
+        index_path = self._index_path(task_id)
+        with tempfile.NamedTemporaryFile("w", delete=False, dir=index_path.parent, encoding="utf-8") as handle:
+            for record in index.records.values():
+                handle.write(json.dumps({"op": "put", **asdict(record)}, sort_keys=True) + "\n")
+            handle.flush()
+            os.fsync(handle.fileno())
+            temp_name = handle.name
+        os.replace(temp_name, index_path)
+        index.tombstones = 0
+        index.stamp = self._stamp(index_path)
+
+    def _compress_segment(self, task_id: str, segment: int) -> None:
+        raw = self._segment_path(task_id, segment)
+        if not raw.exists():
+            return
+        compressed = self._segment_path(task_id, segment, compressed=True)
+        with raw.open("rb") as source, gzip.open(compressed, "wb") as target:
+            shutil.copyfileobj(source, target)
+        raw.unlink()
+
+    def commit(self, task_id: str, execution_id: str, created_at: str) -> Optional[LogRecord]:
+        live = self.live_path(task_id, execution_id)
+        if not live.exists():
+            return None
+        data = live.read_bytes()
+        with self._lock:
+            index = self._index(task_id)
+            segment_path = self._segment_path(task_id, index.active_segment)
+            if segment_path.exists() and segment_path.stat().st_size >= self.segment_max_bytes:
+                self._compress_segment(task_id, index.active_segment)
+                index.active_segment += 1
+                segment_path = self._segment_path(task_id, index.active_segment)
+            with segment_path.open("ab") as handle:
+                offset = handle.tell()
+                handle.write(data)
+                handle.flush()
+                os.fsync(handle.fileno())
+            record = LogRecord(
+                execution_id=execution_id,
+                segment=index.active_segment,
+                offset=offset,
+                length=len(data),
+                created_at=created_at,
+            )
+            self._append_index(task_id, index, [{"op": "put", **asdict(record)}])
+            index.records[execution_id] = record
+        live.unlink()
+        return record
+
+    def import_loose(self, active: Container[str] = ()) -> int:
+        # Logs written before segments existed are loose per-execution files in the
+        # task directory, indistinguishable from a running execution's live file.
+        # Fold every one that is not ``active`` into the segments, oldest first, so
+        # listings see them; the import removes the files, so it runs only once.
+        if not self.root.exists():
+            return 0
+        imported = 0
+        for task_dir in sorted(self.root.iterdir()):
+            if not task_dir.is_dir() or task_dir.name.startswith("."):
+                continue
+            loose = [
+                path
+                for path in task_dir.glob("*.log")
+                if not path.name.startswith("segment-") and path.stem not in active
+            ]
+            for path in sorted(loose, key=lambda item: item.stat().st_mtime_ns):
+                created_at = datetime.fromtimestamp(path.stat().st_mtime).isoformat(timespec="seconds")
+                if self.commit(task_dir.name, path.stem, created_at) is not None:
+                    imported += 1
+        return imported
+
+    def get(self, task_id: str, execution_id: str) -> Optional[LogRecord]:
+        with self._lock:
+            return self._index(task_id).records.get(execution_id)
+
+    def list(self, task_id: str) -> list[LogRecord]:
+        with self._lock:
+            return list(reversed(self._index(task_id).records.values()))
+
+    def size(self, task_id: str, execution_id: str) -> Optional[int]:
+        live = self.live_path(task_id, execution_id)
+        try:
+            return live.stat().st_size
+        except FileNotFoundError:
+            pass
+        record = self.get(task_id, execution_id)
+        return record.length if record else None
+
+    def read(self, task_id: str, execution_id: str, start: int = 0, end: Optional[int] = None) -> Optional[bytes]:
+        # ``end`` is inclusive, matching HTTP Range semantics. Running executions are
+        # served from their live file until commit moves the bytes into a segment.
+        live = self.live_path(task_id, execution_id)
+        try:
+            with live.open("rb") as handle:
+                handle.seek(start)
+                return handle.read() if end is None else handle.read(max(end - start + 1, 0))
+        except FileNotFoundError:
+            pass
+        record = self.get(task_id, execution_id)
+        if record is None:
+            return None
+        start = min(start, record.length)
+        stop = record.length if end is None else min(end + 1, record.length)
+        with self._open_segment(task_id, record.segment) as handle:
+            handle.seek(record.offset + start)
+            return handle.read(max(stop - start, 0))
+
+    def _open_segment(self, task_id: str, segment: int) -> IO[bytes]:
+        try:
+            return self._segment_path(task_id, segment).open("rb")
+        except FileNotFoundError:
+            return gzip.open(self._segment_path(task_id, segment, compressed=True), "rb")
+
+    def delete(self, task_id: str, execution_ids: Iterable[str]) -> int:
+        execution_ids = list(execution_ids)
+        with self._lock:
+            index = self._index(task_id)
+            removed = [execution_id for execution_id in execution_ids if execution_id in index.records]
+            for execution_id in execution_ids:
+                try:
+                    self.live_path(task_id, execution_id).unlink()
+                except FileNotFoundError:
+                    pass
+            if not removed:
+                return 0
+            self._append_index(task_id, index, [{"op": "del", "execution_id": item} for item in removed])
+            touched = {index.records.pop(execution_id).segment for execution_id in removed}
+            index.tombstones += len(removed)
+            live_segments = {record.segment for record in index.records.values()}
+            for segment in touched - live_segments - {index.active_segment}:
+                for compressed in (False, True):
+                    try:
+                        self._segment_path(task_id, segment, compressed=compressed).unlink()
+                    except FileNotFoundError:
+                        pass
+            if index.tombstones > max(len(index.records), 64):
+                self._rewrite_index(task_id, index)
+            return len(removed)
+
+    def detach_task(self, task_id: str, trash_dir: Path) -> Optional[Path]:
+        # A single rename takes the task's logs out of service; the files
+        # themselves are removed later by the reclamation worker.
+        with self._lock:
+            self._indexes.pop(task_id, None)
+            task_dir = self._task_dir(task_id)
+            if not task_dir.exists():
+                return None
+            trash_dir.mkdir(parents=True, exist_ok=True)
+            target = trash_dir / f"{task_id}-{uuid.uuid4().hex}"
+            os.replace(task_dir, target)
+            return target
+
+    def delete_task(self, task_id: str) -> None:
+        with self._lock:
+            self._indexes.pop(task_id, None)
+            shutil.rmtree(self._task_dir(task_id), ignore_errors=True)
@@ -1,13 +1,21 @@
 from __future__ import annotations
 
+import asyncio
+import os
+import re
 from decimal import Decimal
 from pathlib import Path
-from typing import Optional
+from typing import AsyncIterator, Optional, Union
 
-from fastapi import FastAPI, HTTPException, Query
+from fastapi import Depends, FastAPI, Header, HTTPException, Query, Request
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import PlainTextResponse
+from fastapi.responses import FileResponse, JSONResponse, PlainTextResponse, Response, StreamingResponse
+from starlette.concurrency import run_in_threadpool
 
+from .async_storage import AsyncStorage, WriteQueueFullError
+from .compression import CompressionMiddleware
+from .instrumentation import RequestTimingMiddleware
+from .metrics import REGISTRY
 from .models import (
     Account,
     AccountCreate,
@@ -16,6 +24,9 @@ from .models import (
     AmountRequest,
     ApplyInterestBatchResult,
     ApplyInterestResult,
+    BalanceAsOfResponse,
+    ProfilesResponse,
+    ReclaimStatus,
     ScheduledTask,
     ScheduledTaskCreate,
     ScheduledTaskExecution,
@@ -25,10 +36,13 @@ from .models import (
     ScheduledTaskUpdate,
     ScheduledTasksResponse,
     StatementResponse,
+    SummaryResponse,
     Transaction,
     TransactionCreate,
     TransactionsResponse,
 )
+from .profiling import ProfileStore, ProfilingMiddleware, ProfilingRoute, RequestProfiler
+from .responses import ModelResponse, model_response, rows_response
 from .scheduled_tasks import (
     ScheduledTaskManager,
     create_task,
@@ -37,21 +51,48 @@ from .scheduled_tasks import (
     update_task,
 )
 from .services import (
+    ACCOUNT_FIELDS,
+    STATEMENT_LIMIT,
+    TRANSACTION_FIELDS,
     DomainError,
     apply_interest_all,
     apply_interest_for_account,
+    balance_as_of,
+    combine_interest_batches,
     create_account,
     create_transaction,
+    dashboard_summary,
     delete_account,
     deposit,
+    find_accounts,
+    find_transactions,
     list_statement,
+    parse_fields,
+    parse_sort,
     update_account,
     withdraw,
 )
-from .storage import Storage
+from .sharding import DEFAULT_SHARD_COUNT, ShardedStorage
+from .storage import SEARCH_LIMIT, Storage
 
 app = FastAPI(title="Bank Account API")
 
+app.router.route_class = ProfilingRoute
+
+COMPRESSION_ENABLED = os.environ.get("BANKACCT_COMPRESSION", "1") != "0"
+if COMPRESSION_ENABLED:
+    app.add_middleware(CompressionMiddleware)
+
+REQUEST_TIMING_ENABLED = os.environ.get("BANKACCT_REQUEST_TIMING", "1") != "0"
+if REQUEST_TIMING_ENABLED:
+    app.add_middleware(RequestTimingMiddleware, registry=REGISTRY)
+
+STATEMENTS_DIR = Path(os.environ.get("BANKACCT_STATEMENTS_DIR", Path(__file__).resolve().parents[1] / "statements"))
+PROFILES_DIR = Path(os.environ.get("BANKACCT_PROFILES_DIR", Path(__file__).resolve().parents[1] / "profiles"))
+SCHEDULED_PROFILE_RATE = float(os.environ.get("BANKACCT_SCHEDULED_PROFILE_RATE", "0"))
+PROFILER = RequestProfiler(ProfileStore(PROFILES_DIR), enabled=os.environ.get("BANKACCT_PROFILING", "0") == "1")
+app.add_middleware(ProfilingMiddleware, profiler=PROFILER)
+
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["*"] ,
@@ -61,26 +102,68 @@ app.add_middleware(
 )
 
 DATA_PATH = Path(__file__).resolve().parents[1] / "store.json"
-app.state.storage = Storage(DATA_PATH)
+SHARDS_DIR = os.environ.get("BANKACCT_SHARDS_DIR")
+if SHARDS_DIR:
+    app.state.storage = ShardedStorage(Path(SHARDS_DIR), int(os.environ.get("BANKACCT_SHARD_COUNT", DEFAULT_SHARD_COUNT)))
+else:
+    app.state.storage = Storage(DATA_PATH)
 LOGS_DIR = Path(__file__).resolve().parents[1] / "logs"
+WRITE_QUEUE_LIMIT = int(os.environ.get("BANKACCT_WRITE_QUEUE_LIMIT", "1000"))
+TAIL_POLL_SECONDS = 0.5
+CHANGE_POLL_SECONDS = 0.5
+EVENTS_KEEPALIVE_SECONDS = 15.0
+IDEMPOTENCY_KEY_MAX_LENGTH = 255
+BYTE_RANGE_RE = re.compile(r"^bytes=(\d*)-(\d*)$")
+# Range bounds for GET /transactions: "2025/01/31", "2025-01-31", optionally
+# followed by " 13:45:00" or "T13:45:00".
+TIME_BOUND_RE = re.compile(r"^(\d{4})[/-](\d{2})[/-](\d{2})(?:[ T](\d{2}):(\d{2})(?::(\d{2}))?)?$")
+
+
+def get_storage() -> Union[Storage, ShardedStorage]:
+    return app.state.storage
 
 
-def get_storage() -> Storage:
-    return app.state.storage
+def get_async_storage() -> AsyncStorage:
+    storage = get_storage()
+    current: Optional[AsyncStorage] = getattr(app.state, "async_storage", None)
+    if current is None or current.storage is not storage:
+        current = app.state.async_storage = AsyncStorage(storage, max_pending=WRITE_QUEUE_LIMIT)
+    return current
+
+
+@app.exception_handler(WriteQueueFullError)
+async def write_queue_full_handler(request: Request, exc: WriteQueueFullError) -> JSONResponse:
+    return JSONResponse(
+        status_code=503,
+        content={"detail": str(exc)},
+        headers={"Retry-After": str(exc.retry_after)},
+    )
 
 
 @app.get("/health")
-def health() -> dict:
+async def health() -> dict:
     return {"status": "ok"}
 
 
+@app.get("/metrics", response_class=PlainTextResponse)
+async def metrics() -> PlainTextResponse:
+    return PlainTextResponse(REGISTRY.render(), media_type="text/plain; version=0.0.4")
+
+
 def get_scheduler() -> ScheduledTaskManager:
     return app.state.scheduler
 
 
 @app.on_event("startup")
 def on_startup() -> None:
-    scheduler = ScheduledTaskManager(get_storage(), LOGS_DIR)
+    scheduler = ScheduledTaskManager(
+        get_storage(),
+        LOGS_DIR,
+        profile_store=PROFILER.store if PROFILER.enabled else None,
+        profile_sample_rate=SCHEDULED_PROFILE_RATE,
+        writer=get_async_storage(),
+        statements_dir=STATEMENTS_DIR,
+    )
     scheduler.ensure_default_tasks()
     scheduler.start()
     app.state.scheduler = scheduler
@@ -92,126 +175,352 @@ def on_shutdown() -> None:
     scheduler.shutdown()
 
 
+@app.get("/summary", response_model=SummaryResponse)
+async def summary_route() -> Response:
+    return ModelResponse(await get_async_storage().read(dashboard_summary, inline=True))
+
+
+def _parse_time_bound(name: str, value: Optional[str], end: bool) -> Optional[str]:
+    # Returns the bound in stored "YYYY/MM/DD HH:MM:SS" form. A date-only upper
+    # bound covers the whole day.
+    if not value:
+        return None
+    match = TIME_BOUND_RE.match(value.strip())
+    if not match:
+        raise HTTPException(status_code=422, detail=f"{name} must be YYYY/MM/DD or YYYY/MM/DD HH:MM:SS")
+    year, month, day, hour, minute, second = match.groups()
+    if hour is None:
+        clock = "23:59:59" if end else "00:00:00"
+    else:
+        clock = f"{hour}:{minute}:{second or ('59' if end else '00')}"
+    return f"{year}/{month}/{day} {clock}"
+
+
+def _format_change_cursor(offsets: list[int]) -> str:
+    return ".".join(str(offset) for offset in offsets)
+
+
+def _parse_change_cursor(value: Optional[str], feeds: int) -> Optional[list[int]]:
+    # One offset per store file, e.g. "12" for a single store or "3.40.38.51.29"
+    # for meta plus four shards. Anything else cannot be resumed.
+    if value is None:
+        return None
+    parts = value.split(".")
+    if len(parts) != feeds or not all(part.isdigit() for part in parts):
+        return None
+    return [int(part) for part in parts]
+
+
+async def _change_heads(storage: AsyncStorage, feeds: list) -> list[int]:
+    return [await storage.read_from(feed, "change_offset", inline=True) for feed in feeds]
+
+
+async def _follow_changes(cursor: Optional[str], follow: bool) -> AsyncIterator[str]:
+    storage = get_async_storage()
+    feeds = storage.storage.change_feeds()
+    offsets = _parse_change_cursor(cursor, len(feeds))
+    if offsets is None:
+        offsets = await _change_heads(storage, feeds)
+        # A client that sent a cursor we cannot resume must refetch its state.
+        event = "ready" if cursor is None else "reset"
+    else:
+        event = "ready"
+    yield f"id: {_format_change_cursor(offsets)}\nevent: {event}\ndata: \n\n"
+    idle = 0.0
+    while True:
+        emitted = False
+        for index, feed in enumerate(feeds):
+            changes, complete = await storage.read_from(feed, "changes_since", offsets[index], inline=True)
+            if not complete:
+                offsets = await _change_heads(storage, feeds)
+                yield f"id: {_format_change_cursor(offsets)}\nevent: reset\ndata: \n\n"
+                emitted = True
+                break
+            for change in changes:
+                offsets[index] = change.offset
+                yield f"id: {_format_change_cursor(offsets)}\nevent: change\ndata: {change.model_dump_json()}\n\n"
+                emitted = True
+        if not follow:
+            return
+        if emitted:
+            idle = 0.0
+            continue
+        await asyncio.sleep(CHANGE_POLL_SECONDS)
+        idle += CHANGE_POLL_SECONDS
+        if idle >= EVENTS_KEEPALIVE_SECONDS:
+            idle = 0.0
+            yield ": keepalive\n\n"
+
+
+@app.get("/events")
+async def change_events(
+    offset: Optional[str] = None,
+    follow: bool = True,
+    last_event_id: Optional[str] = Header(default=None, alias="Last-Event-ID"),
+) -> StreamingResponse:
+    return StreamingResponse(
+        _follow_changes(last_event_id or offset, follow),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache"},
+    )
+
+
 @app.get("/accounts", response_model=AccountsResponse)
-def list_accounts() -> AccountsResponse:
-    storage = get_storage()
-    return AccountsResponse(accounts=storage.list_accounts())
+async def list_accounts(
+    fields: Optional[str] = None,
+    sort: Optional[str] = None,
+    account_type: Optional[str] = Query(default=None, min_length=1, max_length=1),
+    min_balance: Optional[Decimal] = None,
+    max_balance: Optional[Decimal] = None,
+    limit: Optional[int] = Query(default=None, ge=1),
+) -> Response:
+    try:
+        columns = parse_fields(fields, ACCOUNT_FIELDS)
+        order = parse_sort(sort, ACCOUNT_FIELDS)
+    except DomainError as exc:
+        raise HTTPException(status_code=exc.status_code, detail=str(exc))
+    accounts = await get_async_storage().read(
+        find_accounts,
+        account_type.upper() if account_type else None,
+        min_balance,
+        max_balance,
+        order,
+        limit,
+    )
+    return rows_response(AccountsResponse, "accounts", columns, accounts=accounts)
 
 
 @app.post("/accounts", response_model=Account)
-def create_account_route(payload: AccountCreate) -> Account:
-    storage = get_storage()
-    account, _ = create_account(storage, payload)
+async def create_account_route(payload: AccountCreate) -> Account:
+    account, _ = await get_async_storage().write(create_account, payload, shard_key=payload.account_id)
     return account
 
 
+def account_etag(account: Account) -> str:
+    return f'"{account.version}"'
+
+
+def parse_if_match(value: Optional[str]) -> Optional[int]:
+    # ``*`` and a missing header both mean "any version".
+    if value is None or value.strip() == "*":
+        return None
+    tag = value.split(",")[0].strip()
+    if tag.startswith("W/"):
+        tag = tag[2:]
+    try:
+        return int(tag.strip('"'))
+    except ValueError:
+        raise HTTPException(status_code=412, detail="If-Match does not name an account version")
+
+
+def idempotency_key_header(
+    idempotency_key: Optional[str] = Header(default=None, alias="Idempotency-Key"),
+) -> Optional[str]:
+    if idempotency_key is None:
+        return None
+    idempotency_key = idempotency_key.strip()
+    if not idempotency_key or len(idempotency_key) > IDEMPOTENCY_KEY_MAX_LENGTH:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Idempotency-Key must be 1 to {IDEMPOTENCY_KEY_MAX_LENGTH} characters",
+        )
+    return idempotency_key
+
+
+@app.get("/accounts/search", response_model=AccountsResponse)
+async def search_accounts(
+    q: str = Query(min_length=1, max_length=64),
+    limit: int = Query(default=SEARCH_LIMIT, ge=1, le=100),
+) -> Response:
+    accounts = await get_async_storage().read("search_accounts", q, limit)
+    return model_response(AccountsResponse, accounts=accounts)
+
+
 @app.get("/accounts/{account_id}", response_model=Account)
-def get_account(account_id: str) -> Account:
-    storage = get_storage()
-    account = storage.get_account(account_id)
+async def get_account(account_id: str, response: Response) -> Account:
+    account = await get_async_storage().read("get_account", account_id, shard_key=account_id, inline=True)
     if not account:
         raise HTTPException(status_code=404, detail="account not found")
+    response.headers["ETag"] = account_etag(account)
     return account
 
 
 @app.put("/accounts/{account_id}", response_model=Account)
-def update_account_route(account_id: str, payload: AccountUpdate) -> Account:
+async def update_account_route(
+    account_id: str,
+    payload: AccountUpdate,
+    response: Response,
+    if_match: Optional[str] = Header(default=None, alias="If-Match"),
+) -> Account:
+    expected_version = parse_if_match(if_match)
     try:
-        return update_account(get_storage(), account_id, payload)
+        account = await get_async_storage().write(
+            update_account, account_id, payload, expected_version, shard_key=account_id
+        )
     except DomainError as exc:
         raise HTTPException(status_code=exc.status_code, detail=str(exc))
+    response.headers["ETag"] = account_etag(account)
+    return account
 
 
 @app.delete("/accounts/{account_id}")
-def delete_account_route(account_id: str) -> dict:
+async def delete_account_route(account_id: str) -> dict:
     try:
-        delete_account(get_storage(), account_id)
+        await get_async_storage().write(delete_account, account_id, shard_key=account_id)
         return {"status": "deleted"}
     except DomainError as exc:
         raise HTTPException(status_code=exc.status_code, detail=str(exc))
 
 
 @app.post("/accounts/{account_id}/deposit")
-def deposit_route(account_id: str, payload: AmountRequest) -> dict:
+async def deposit_route(
+    account_id: str,
+    payload: AmountRequest,
+    idempotency_key: Optional[str] = Depends(idempotency_key_header),
+) -> dict:
     try:
-        account, transaction = deposit(get_storage(), account_id, payload.amount)
+        account, transaction = await get_async_storage().write(
+            deposit, account_id, payload.amount, idempotency_key, shard_key=account_id
+        )
         return {"account": account, "transaction": transaction}
     except DomainError as exc:
         raise HTTPException(status_code=exc.status_code, detail=str(exc))
 
 
 @app.post("/accounts/{account_id}/withdraw")
-def withdraw_route(account_id: str, payload: AmountRequest) -> dict:
+async def withdraw_route(
+    account_id: str,
+    payload: AmountRequest,
+    idempotency_key: Optional[str] = Depends(idempotency_key_header),
+) -> dict:
     try:
-        account, transaction = withdraw(get_storage(), account_id, payload.amount)
+        account, transaction = await get_async_storage().write(
+            withdraw, account_id, payload.amount, idempotency_key, shard_key=account_id
+        )
         return {"account": account, "transaction": transaction}
     except DomainError as exc:
         raise HTTPException(status_code=exc.status_code, detail=str(exc))
 
 
 @app.post("/accounts/{account_id}/apply-interest", response_model=ApplyInterestResult)
-def apply_interest_route(account_id: str) -> ApplyInterestResult:
+async def apply_interest_route(account_id: str) -> ApplyInterestResult:
     try:
-        return apply_interest_for_account(get_storage(), account_id)
+        return await get_async_storage().write(apply_interest_for_account, account_id, shard_key=account_id)
     except DomainError as exc:
         raise HTTPException(status_code=exc.status_code, detail=str(exc))
 
 
 @app.post("/accounts/apply-interest", response_model=ApplyInterestBatchResult)
-def apply_interest_all_route() -> ApplyInterestBatchResult:
-    return apply_interest_all(get_storage())
+async def apply_interest_all_route() -> ApplyInterestBatchResult:
+    return combine_interest_batches(await get_async_storage().write_each(apply_interest_all))
 
 
 @app.get("/accounts/{account_id}/statement", response_model=StatementResponse)
-def statement_route(account_id: str) -> StatementResponse:
-    storage = get_storage()
-    account = storage.get_account(account_id)
+async def statement_route(
+    account_id: str,
+    recent: bool = False,
+    limit: int = Query(default=STATEMENT_LIMIT, ge=1, le=1000),
+) -> Response:
+    storage = get_async_storage()
+    account = await storage.read("get_account", account_id, shard_key=account_id, inline=True)
     if not account:
         raise HTTPException(status_code=404, detail="account not found")
-    transactions = list_statement(storage, account_id)
-    return StatementResponse(account_id=account_id, transactions=transactions)
+    transactions = await storage.read(list_statement, account_id, limit, recent, shard_key=account_id)
+    return model_response(StatementResponse, account_id=account_id, transactions=transactions)
+
+
+@app.get("/accounts/{account_id}/balance", response_model=BalanceAsOfResponse)
+async def balance_as_of_route(account_id: str, as_of: str = Query(min_length=1)) -> BalanceAsOfResponse:
+    # A date-only as_of means the end of that day.
+    bound = _parse_time_bound("as_of", as_of, end=True)
+    try:
+        return await get_async_storage().read(balance_as_of, account_id, bound, shard_key=account_id)
+    except DomainError as exc:
+        raise HTTPException(status_code=exc.status_code, detail=str(exc))
 
 
 @app.post("/transactions", response_model=Transaction)
-def create_transaction_route(payload: TransactionCreate) -> Transaction:
+async def create_transaction_route(
+    payload: TransactionCreate,
+    idempotency_key: Optional[str] = Depends(idempotency_key_header),
+) -> Transaction:
     try:
-        return create_transaction(get_storage(), payload)
+        return await get_async_storage().write(
+            create_transaction, payload, idempotency_key, shard_key=payload.account_id
+        )
     except DomainError as exc:
         raise HTTPException(status_code=exc.status_code, detail=str(exc))
 
 
 @app.get("/transactions", response_model=TransactionsResponse)
-def list_transactions(
+async def list_transactions(
     account_id: Optional[str] = None,
     transaction_type: Optional[str] = Query(default=None, min_length=1, max_length=1),
-) -> TransactionsResponse:
+    from_: Optional[str] = Query(default=None, alias="from"),
+    to: Optional[str] = None,
+    min_amount: Optional[Decimal] = None,
+    max_amount: Optional[Decimal] = None,
+    fields: Optional[str] = None,
+    sort: Optional[str] = None,
+    limit: Optional[int] = Query(default=None, ge=1),
+) -> Response:
     if transaction_type:
         transaction_type = transaction_type.upper()
-    transactions = get_storage().list_transactions(
-        account_id=account_id,
-        transaction_type=transaction_type,
+    try:
+        columns = parse_fields(fields, TRANSACTION_FIELDS)
+        order = parse_sort(sort, TRANSACTION_FIELDS)
+    except DomainError as exc:
+        raise HTTPException(status_code=exc.status_code, detail=str(exc))
+    transactions = await get_async_storage().read(
+        find_transactions,
+        account_id,
+        transaction_type,
+        _parse_time_bound("from", from_, end=False),
+        _parse_time_bound("to", to, end=True),
+        min_amount,
+        max_amount,
+        order,
+        limit,
     )
-    return TransactionsResponse(transactions=transactions)
+    return rows_response(TransactionsResponse, "transactions", columns, transactions=transactions)
 
 
 @app.get("/transactions/{transaction_id}", response_model=Transaction)
-def get_transaction(transaction_id: str) -> Transaction:
-    transactions = get_storage().list_transactions()
+async def get_transaction(transaction_id: str) -> Transaction:
+    transactions = await get_async_storage().read("list_transactions")
     for txn in transactions:
         if txn.transaction_id == transaction_id:
             return txn
     raise HTTPException(status_code=404, detail="transaction not found")
 
 
+@app.get("/profiles", response_model=ProfilesResponse)
+async def list_profiles() -> ProfilesResponse:
+    return ProfilesResponse(profiles=await run_in_threadpool(PROFILER.store.list))
+
+
+@app.get("/profiles/{name:path}")
+async def download_profile(name: str) -> FileResponse:
+    path = PROFILER.store.path_for(name)
+    if path is None:
+        raise HTTPException(status_code=404, detail="profile not found")
+    return FileResponse(path, media_type="application/octet-stream", filename=path.name)
+
+
+@app.get("/maintenance/reclaim", response_model=ReclaimStatus)
+async def reclaim_status() -> ReclaimStatus:
+    return ReclaimStatus(**get_scheduler().reclaimer.stats())
+
+
 @app.get("/scheduled-tasks", response_model=ScheduledTasksResponse)
-def list_scheduled_tasks() -> ScheduledTasksResponse:
-    return ScheduledTasksResponse(tasks=list_tasks_with_last_run(get_storage()))
+async def list_scheduled_tasks() -> Response:
+    return model_response(ScheduledTasksResponse, tasks=await get_async_storage().read(list_tasks_with_last_run))
 
 
 @app.post("/scheduled-tasks", response_model=ScheduledTask)
-def create_scheduled_task(payload: ScheduledTaskCreate) -> ScheduledTask:
+async def create_scheduled_task(payload: ScheduledTaskCreate) -> ScheduledTask:
     try:
-        task = create_task(get_storage(), payload)
+        task = await get_async_storage().write(create_task, payload)
         get_scheduler().add_or_update_job(task)
         return task
     except DomainError as exc:
@@ -219,17 +528,17 @@ def create_scheduled_task(payload: ScheduledTaskCreate) -> ScheduledTask:
 
 
 @app.get("/scheduled-tasks/{task_id}", response_model=ScheduledTask)
-def get_scheduled_task(task_id: str) -> ScheduledTask:
-    task = get_storage().get_scheduled_task(task_id)
+async def get_scheduled_task(task_id: str) -> ScheduledTask:
+    task = await get_async_storage().read("get_scheduled_task", task_id, inline=True)
     if not task:
         raise HTTPException(status_code=404, detail="task not found")
     return task
 
 
 @app.put("/scheduled-tasks/{task_id}", response_model=ScheduledTask)
-def update_scheduled_task(task_id: str, payload: ScheduledTaskUpdate) -> ScheduledTask:
+async def update_scheduled_task(task_id: str, payload: ScheduledTaskUpdate) -> ScheduledTask:
     try:
-        task = update_task(get_storage(), task_id, payload)
+        task = await get_async_storage().write(update_task, task_id, payload)
         get_scheduler().add_or_update_job(task)
         return task
     except DomainError as exc:
@@ -237,59 +546,63 @@ def update_scheduled_task(task_id: str, payload: ScheduledTaskUpdate) -> Schedul
 
 
 @app.delete("/scheduled-tasks/{task_id}")
-def delete_scheduled_task(task_id: str) -> dict:
+async def delete_scheduled_task(task_id: str) -> dict:
     try:
-        storage = get_storage()
-        executions = storage.list_task_executions(task_id=task_id)
-        delete_task(storage, task_id)
-        get_scheduler().remove_job(task_id)
-        for execution in executions:
-            try:
-                Path(execution.log_path).unlink()
-            except FileNotFoundError:
-                pass
+        await get_async_storage().write(delete_task, task_id)
+        scheduler = get_scheduler()
+        scheduler.remove_job(task_id)
+        await run_in_threadpool(scheduler.discard_task_logs, task_id)
         return {"status": "deleted"}
     except DomainError as exc:
         raise HTTPException(status_code=exc.status_code, detail=str(exc))
 
 
 @app.get("/scheduled-tasks/{task_id}/executions", response_model=ScheduledTaskExecutionsResponse)
-def list_task_executions(task_id: str) -> ScheduledTaskExecutionsResponse:
-    if not get_storage().get_scheduled_task(task_id):
+async def list_task_executions(task_id: str) -> Response:
+    storage = get_async_storage()
+    if not await storage.read("get_scheduled_task", task_id, inline=True):
         raise HTTPException(status_code=404, detail="task not found")
-    executions = get_storage().list_task_executions(task_id=task_id)
-    return ScheduledTaskExecutionsResponse(executions=executions)
+    executions = await storage.read("list_task_executions", task_id=task_id)
+    return model_response(ScheduledTaskExecutionsResponse, executions=executions)
 
 
 @app.get("/scheduled-tasks/{task_id}/executions/{execution_id}", response_model=ScheduledTaskExecution)
-def get_task_execution(task_id: str, execution_id: str) -> ScheduledTaskExecution:
-    execution = get_storage().get_task_execution(task_id, execution_id)
+async def get_task_execution(task_id: str, execution_id: str) -> ScheduledTaskExecution:
+    execution = await get_async_storage().read("get_task_execution", task_id, execution_id, inline=True)
     if not execution:
         raise HTTPException(status_code=404, detail="execution not found")
     return execution
 
 
 @app.post("/scheduled-tasks/{task_id}/run", response_model=ScheduledTaskExecution)
-def run_task_now(task_id: str) -> ScheduledTaskExecution:
-    if not get_storage().get_scheduled_task(task_id):
+async def run_task_now(task_id: str) -> ScheduledTaskExecution:
+    if not await get_async_storage().read("get_scheduled_task", task_id, inline=True):
         raise HTTPException(status_code=404, detail="task not found")
-    execution = get_scheduler().run_task(task_id)
+    try:
+        # A manual run lasts as long as the task itself, so it gets a worker thread.
+        execution = await run_in_threadpool(get_scheduler().run_task, task_id)
+    except DomainError as exc:
+        raise HTTPException(status_code=exc.status_code, detail=str(exc))
     if not execution:
         raise HTTPException(status_code=400, detail="task disabled or unavailable")
     return execution
 
 
 @app.get("/scheduled-tasks/{task_id}/logs", response_model=ScheduledTaskLogsResponse)
-def list_task_logs(task_id: str) -> ScheduledTaskLogsResponse:
-    if not get_storage().get_scheduled_task(task_id):
+async def list_task_logs(task_id: str) -> ScheduledTaskLogsResponse:
+    if not await get_async_storage().read("get_scheduled_task", task_id, inline=True):
         raise HTTPException(status_code=404, detail="task not found")
-    task_dir = LOGS_DIR / task_id
-    if not task_dir.exists():
-        return ScheduledTaskLogsResponse(logs=[])
-    logs: list[ScheduledTaskLogItem] = []
-    for path in sorted(task_dir.glob("*.log"), key=lambda item: item.stat().st_mtime, reverse=True):
-        execution_id = path.stem
-        logs.append(ScheduledTaskLogItem(execution_id=execution_id, log_path=str(path)))
+    log_store = get_scheduler().log_store
+    records = await run_in_threadpool(log_store.list, task_id)
+    logs = [
+        ScheduledTaskLogItem(
+            execution_id=record.execution_id,
+            log_path=str(log_store.live_path(task_id, record.execution_id)),
+            size=record.length,
+            created_at=record.created_at,
+        )
+        for record in records
+    ]
     return ScheduledTaskLogsResponse(logs=logs)
 
 
@@ -297,12 +610,101 @@ def list_task_logs(task_id: str) -> ScheduledTaskLogsResponse:
     "/scheduled-tasks/{task_id}/executions/{execution_id}/log",
     response_class=PlainTextResponse,
 )
-def get_task_execution_log(task_id: str, execution_id: str) -> PlainTextResponse:
-    execution = get_storage().get_task_execution(task_id, execution_id)
+async def get_task_execution_log(task_id: str, execution_id: str) -> PlainTextResponse:
+    execution = await get_async_storage().read("get_task_execution", task_id, execution_id, inline=True)
     if not execution:
         raise HTTPException(status_code=404, detail="execution not found")
-    try:
-        text = Path(execution.log_path).read_text(encoding="utf-8")
-    except FileNotFoundError:
+    data = await run_in_threadpool(get_scheduler().log_store.read, task_id, execution_id)
+    if data is None:
+        raise HTTPException(status_code=404, detail="log not found")
+    return PlainTextResponse(data.decode("utf-8"))
+
+
+def _parse_byte_range(header: str, size: int) -> tuple[int, int]:
+    match = BYTE_RANGE_RE.match(header.strip())
+    if not match or match.groups() == ("", ""):
+        raise HTTPException(status_code=416, detail="invalid range")
+    first, last = match.groups()
+    if not first:
+        start = max(size - int(last), 0)
+        end = size - 1
+    else:
+        start = int(first)
+        end = min(int(last), size - 1) if last else size - 1
+    if start >= size or start > end:
+        raise HTTPException(
+            status_code=416,
+            detail="range not satisfiable",
+            headers={"Content-Range": f"bytes */{size}"},
+        )
+    return start, end
+
+
+async def _execution_finished(task_id: str, execution_id: str) -> bool:
+    if get_scheduler().is_execution_active(execution_id):
+        return False
+    execution = await get_async_storage().read("get_task_execution", task_id, execution_id, inline=True)
+    return execution is None or execution.status != "running"
+
+
+async def _follow_log(task_id: str, execution_id: str, offset: int) -> AsyncIterator[str]:
+    log_store = get_scheduler().log_store
+    position = offset
+    pending = b""
+    while True:
+        finished = await _execution_finished(task_id, execution_id)
+        chunk = await run_in_threadpool(log_store.read, task_id, execution_id, position + len(pending)) or b""
+        pending += chunk
+        *lines, pending = pending.split(b"\n")
+        for line in lines:
+            position += len(line) + 1
+            yield f"id: {position}\nevent: log\ndata: {line.decode('utf-8', errors='replace')}\n\n"
+        if finished and not chunk:
+            if pending:
+                position += len(pending)
+                yield f"id: {position}\nevent: log\ndata: {pending.decode('utf-8', errors='replace')}\n\n"
+            yield f"id: {position}\nevent: end\ndata: \n\n"
+            return
+        if not chunk:
+            await asyncio.sleep(TAIL_POLL_SECONDS)
+
+
+@app.get("/scheduled-tasks/{task_id}/executions/{execution_id}/log/tail")
+async def tail_task_execution_log(
+    task_id: str,
+    execution_id: str,
+    offset: int = Query(default=0, ge=0),
+    follow: bool = False,
+    range_header: Optional[str] = Header(default=None, alias="Range"),
+    last_event_id: Optional[str] = Header(default=None, alias="Last-Event-ID"),
+) -> Response:
+    execution = await get_async_storage().read("get_task_execution", task_id, execution_id, inline=True)
+    if not execution:
+        raise HTTPException(status_code=404, detail="execution not found")
+    if follow:
+        if last_event_id and last_event_id.isdigit():
+            offset = int(last_event_id)
+        return StreamingResponse(
+            _follow_log(task_id, execution_id, offset),
+            media_type="text/event-stream",
+            headers={"Cache-Control": "no-cache"},
+        )
+    log_store = get_scheduler().log_store
+    size = await run_in_threadpool(log_store.size, task_id, execution_id)
+    if size is None:
         raise HTTPException(status_code=404, detail="log not found")
-    return PlainTextResponse(text)
+    headers = {
+        "Accept-Ranges": "bytes",
+        "X-Log-Complete": "true" if execution.status != "running" else "false",
+    }
+    if range_header:
+        start, end = _parse_byte_range(range_header, size)
+        data = await run_in_threadpool(log_store.read, task_id, execution_id, start, end) or b""
+        headers["Content-Range"] = f"bytes {start}-{start + len(data) - 1}/{size}"
+        status_code = 206
+    else:
+        start = min(offset, size)
+        data = await run_in_threadpool(log_store.read, task_id, execution_id, start) or b""
+        status_code = 200
+    headers["X-Log-Offset"] = str(start + len(data))
+    return Response(content=data, status_code=status_code, media_type="text/plain", headers=headers)
@@ -12,7 +12,9 @@ def quantize_money(value: Decimal) -> Decimal:
     return value.quantize(MONEY_QUANT, rounding=ROUND_HALF_UP)
 
 
-BASE_CONFIG = ConfigDict(extra="forbid", json_encoders={Decimal: lambda v: str(v)})
+# Pydantic already writes Decimal as a JSON string; a custom encoder would only add
+# a Python call per value.
+BASE_CONFIG = ConfigDict(extra="forbid")
 
 
 class AccountBase(BaseModel):
@@ -53,6 +55,8 @@ class AccountUpdate(AccountBase):
 
 class Account(AccountBase):
     account_id: str
+    # Bumped by the store on every write; exposed to clients as the ETag.
+    version: int = Field(default=0, ge=0)
 
 
 class AmountRequest(BaseModel):
@@ -66,6 +70,11 @@ class AmountRequest(BaseModel):
         return quantize_money(value)
 
 
+# How each transaction type moves the balance. Any other type, such as the
+# zero-amount "X" rows in the legacy transaction file, leaves it unchanged.
+TRANSACTION_SIGNS = {"D": 1, "W": -1, "I": 1}
+
+
 class TransactionBase(BaseModel):
     model_config = BASE_CONFIG
 
@@ -102,6 +111,41 @@ class Transaction(TransactionBase):
     transaction_id: str
 
 
+class IdempotencyRecord(BaseModel):
+    model_config = BASE_CONFIG
+
+    key: str
+    # What the key was first used for; a retry must describe the same posting.
+    fingerprint: str
+    created_at: float
+    account: Account
+    transaction: Transaction
+
+
+class BalanceCheckpoint(BaseModel):
+    model_config = BASE_CONFIG
+
+    # "YYYY/MM/DD HH:MM:SS", the form transactions sort by.
+    as_of: str
+    balance: Decimal
+    # How many of the account's transactions, in time order, the balance includes.
+    transactions: int
+    # The balance was set directly (account opened or edited), so nothing before it
+    # can be replayed backwards from here.
+    adjusted: bool = False
+
+
+class ChangeEvent(BaseModel):
+    model_config = BASE_CONFIG
+
+    offset: int
+    # account, transaction, scheduled_task, task_execution, or store for a bulk rewrite.
+    entity: str
+    op: str
+    key: str
+    data: Optional[dict] = None
+
+
 class StatementResponse(BaseModel):
     account_id: str
     transactions: list[Transaction]
@@ -115,6 +159,15 @@ class TransactionsResponse(BaseModel):
     transactions: list[Transaction]
 
 
+class BalanceAsOfResponse(BaseModel):
+    account_id: str
+    as_of: str
+    balance: Decimal
+    # When the checkpoint replayed from was taken; None means the current balance.
+    checkpoint: Optional[str] = None
+    replayed: int
+
+
 class ApplyInterestResult(BaseModel):
     account_id: str
     interest_amount: Decimal
@@ -127,6 +180,27 @@ class ApplyInterestBatchResult(BaseModel):
     results: list[ApplyInterestResult]
 
 
+class AccountTypeSummary(BaseModel):
+    count: int
+    total_balance: Decimal
+
+
+class TransactionTypeSummary(BaseModel):
+    count: int
+    total_amount: Decimal
+
+
+class SummaryResponse(BaseModel):
+    account_count: int
+    total_balance: Decimal
+    average_balance: Decimal
+    accounts_by_type: dict[str, AccountTypeSummary]
+    transaction_count: int
+    transactions_by_type: dict[str, TransactionTypeSummary]
+    month: str
+    interest_this_month: Decimal
+
+
 class ScheduledTaskBase(BaseModel):
     model_config = BASE_CONFIG
 
@@ -158,8 +232,13 @@ class ScheduledTaskExecution(BaseModel):
     task_id: str
     status: str
     started_at: str
-    finished_at: str
+    finished_at: Optional[str] = None
     log_path: str
+    trigger: Optional[str] = None
+    scheduled_at: Optional[str] = None
+    fire_lag_ms: Optional[float] = None
+    queue_wait_ms: Optional[float] = None
+    duration_ms: Optional[float] = None
 
 
 class ScheduledTasksResponse(BaseModel):
@@ -175,7 +254,27 @@ class ScheduledTaskLogItem(BaseModel):
 
     execution_id: str
     log_path: str
+    size: Optional[int] = None
+    created_at: Optional[str] = None
 
 
 class ScheduledTaskLogsResponse(BaseModel):
     logs: list[ScheduledTaskLogItem]
+
+
+class ReclaimStatus(BaseModel):
+    pending: int
+    retrying: int
+    reclaimed: int
+    failures: int
+
+
+class ProfileItem(BaseModel):
+    name: str
+    label: str
+    size: int
+    created_at: str
+
+
+class ProfilesResponse(BaseModel):
+    profiles: list[ProfileItem]
@@ -0,0 +1,28 @@
+from __future__ import annotations
+
+from decimal import ROUND_HALF_UP, Decimal
+from fractions import Fraction
+
+# Integer cents are used where rounding has to be exact: balance changes and
+# interest in services, and the running totals in StoreSummary. Account and
+# Transaction keep Decimal, since they are both the stored records and the API
+# schema; balance checkpoints stay Decimal too, as replaying them adds the
+# transactions' Decimal amounts. This is about exact rounding, not speed: a
+# conversion costs several Decimal additions.
+Cents = int
+
+
+def to_cents(value: Decimal) -> Cents:
+    # Half-up (away from zero) to the cent, like quantize(ROUND_HALF_UP), in a
+    # single rounding step.
+    return int(value.scaleb(2).to_integral_value(ROUND_HALF_UP))
+
+
+def from_cents(cents: Cents) -> Decimal:
+    return Decimal(cents).scaleb(-2)
+
+
+def apply_rate(cents: Cents, rate: Fraction) -> Cents:
+    # Exact ``cents * rate`` rounded half-up to the cent, without Decimal arithmetic.
+    magnitude = (2 * abs(cents * rate.numerator) + rate.denominator) // (2 * rate.denominator)
+    return -magnitude if (cents < 0) != (rate.numerator < 0) else magnitude
@@ -0,0 +1,195 @@
+from __future__ import annotations
+
+import cProfile
+import functools
+import inspect
+import pstats
+import re
+import threading
+from contextvars import ContextVar
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Callable, Optional
+from urllib.parse import parse_qs
+
+from fastapi.routing import APIRoute
+
+from .models import ProfileItem
+
+PROFILE_HEADER = "x-profile"
+PROFILE_QUERY = "profile"
+PROFILE_SUFFIX = ".prof"
+
+
+class ProfileCapture:
+    # Collects one cProfile run per call made on behalf of a profiled request or
+    # task. Each call is profiled on the thread that runs it (a writer, a
+    # threadpool worker or the task thread), never on the event loop across
+    # awaits, and the runs are merged into one dump.
+    def __init__(self) -> None:
+        self._profiles: list[cProfile.Profile] = []
+        self._threads: set[int] = set()
+        self._lock = threading.Lock()
+
+    def run(self, func: Callable[..., Any], *args: Any, **kwargs: Any) -> Any:
+        ident = threading.get_ident()
+        with self._lock:
+            nested = ident in self._threads
+            self._threads.add(ident)
+        if nested:
+            # Already being profiled on this thread, e.g. a write issued inline
+            # from a profiled task; a second profiler would stop the first.
+            return func(*args, **kwargs)
+        profile = cProfile.Profile()
+        profile.enable()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            profile.disable()
+            with self._lock:
+                self._threads.discard(ident)
+                self._profiles.append(profile)
+
+    def stats(self) -> pstats.Stats:
+        with self._lock:
+            profiles = list(self._profiles)
+        return pstats.Stats(*profiles)
+
+
+_active: ContextVar[Optional[ProfileCapture]] = ContextVar("active_profile", default=None)
+
+
+def profiled(call: Callable[[], Any]) -> Callable[[], Any]:
+    # Wraps a storage call so it is profiled wherever it ends up running if the
+    # context it was issued from belongs to a profiled request.
+    def run() -> Any:
+        capture = _active.get()
+        if capture is None:
+            return call()
+        return capture.run(call)
+
+    return run
+
+
+def _slug(label: str) -> str:
+    return re.sub(r"[^A-Za-z0-9]+", "_", label).strip("_") or "root"
+
+
+class ProfileStore:
+    def __init__(self, root: Path) -> None:
+        self.root = root
+
+    @staticmethod
+    def new_name(label: str) -> str:
+        return f"{_slug(label)}/{datetime.now().strftime('%Y%m%dT%H%M%S%f')}{PROFILE_SUFFIX}"
+
+    def write(self, capture: ProfileCapture, name: str) -> None:
+        path = self.root / name
+        path.parent.mkdir(parents=True, exist_ok=True)
+        capture.stats().dump_stats(str(path))
+
+    def list(self) -> list[ProfileItem]:
+        if not self.root.exists():
+            return []
+        items: list[ProfileItem] = []
+        for path in self.root.glob(f"*/*{PROFILE_SUFFIX}"):
+            stat = path.stat()
+            items.append(
+                ProfileItem(
+                    name=f"{path.parent.name}/{path.name}",
+                    label=path.parent.name,
+                    size=stat.st_size,
+                    created_at=datetime.fromtimestamp(stat.st_mtime).isoformat(timespec="seconds"),
+                )
+            )
+        items.sort(key=lambda item: item.name.rsplit("/", 1)[1], reverse=True)
+        return items
+
+    def path_for(self, name: str) -> Optional[Path]:
+        root = self.root.resolve()
+        path = (self.root / name).resolve()
+        if root not in path.parents or path.suffix != PROFILE_SUFFIX or not path.is_file():
+            return None
+        return path
+
+
+def _profiled(endpoint: Callable[..., Any]) -> Callable[..., Any]:
+    # Sync endpoints run whole on a threadpool worker and are profiled there.
+    # Async endpoints are left alone: their storage work is profiled where it runs
+    # (see ``profiled``), and a profiler left on across an await would also count
+    # whatever else the event loop ran meanwhile.
+    if inspect.iscoroutinefunction(endpoint):
+        return endpoint
+
+    @functools.wraps(endpoint)
+    def wrapper(*args: Any, **kwargs: Any) -> Any:
+        capture = _active.get()
+        if capture is None:
+            return endpoint(*args, **kwargs)
+        return capture.run(endpoint, *args, **kwargs)
+
+    wrapper.__signature__ = inspect.signature(endpoint, eval_str=True)  # type: ignore[attr-defined]
+    return wrapper
+
+
+class ProfilingRoute(APIRoute):
+    def __init__(self, path: str, endpoint: Callable[..., Any], **kwargs: Any) -> None:
+        super().__init__(path, _profiled(endpoint), **kwargs)
+
+
+class RequestProfiler:
+    def __init__(self, store: ProfileStore, enabled: bool = False) -> None:
+        self.store = store
+        self.enabled = enabled
+
+    @staticmethod
+    def requested(scope: dict) -> bool:
+        for name, value in scope.get("headers", []):
+            if name == PROFILE_HEADER.encode("latin-1"):
+                return value.strip().lower() in (b"1", b"true", b"yes")
+        query = parse_qs(scope.get("query_string", b"").decode("latin-1"))
+        return query.get(PROFILE_QUERY, [""])[-1].lower() in ("1", "true", "yes")
+
+
+class ProfilingMiddleware:
+    def __init__(self, app, profiler: RequestProfiler) -> None:
+        self.app = app
+        self.profiler = profiler
+
+    async def __call__(self, scope, receive, send) -> None:
+        if scope["type"] != "http" or not self.profiler.enabled or not self.profiler.requested(scope):
+            await self.app(scope, receive, send)
+            return
+        capture = ProfileCapture()
+        token = _active.set(capture)
+        name: Optional[str] = None
+
+        def profile_name() -> str:
+            route = scope.get("route")
+            return ProfileStore.new_name(f"{scope['method']} {getattr(route, 'path', scope['path'])}")
+
+        async def send_with_profile(message) -> None:
+            nonlocal name
+            if message["type"] == "http.response.start":
+                name = profile_name()
+                headers = list(message.get("headers", []))
+                headers.append((b"x-profile-name", name.encode("latin-1")))
+                message = {**message, "headers": headers}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_profile)
+        finally:
+            _active.reset(token)
+            self.profiler.store.write(capture, name or profile_name())
+
+
+def run_profiled(store: ProfileStore, label: str, func: Callable[..., Any], *args: Any) -> Any:
+    # Writes the task hands to the store writer are captured too.
+    capture = ProfileCapture()
+    token = _active.set(capture)
+    try:
+        return capture.run(func, *args)
+    finally:
+        _active.reset(token)
+        store.write(capture, ProfileStore.new_name(label))
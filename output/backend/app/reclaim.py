@@ -0,0 +1,186 @@
+from __future__ import annotations
+
+import json
+import os
+import shutil
+import tempfile
+import threading
+import time
+import uuid
+from dataclasses import asdict, dataclass, field
+from pathlib import Path
+from typing import Optional
+
+from .log_store import ExecutionLogStore
+
+RECLAIM_BATCH_SIZE = 100
+RECLAIM_IDLE_SECONDS = 5.0
+RECLAIM_MAX_BACKOFF_SECONDS = 300.0
+
+
+@dataclass
+class ReclaimJob:
+    id: str
+    kind: str
+    task_id: Optional[str] = None
+    execution_ids: list[str] = field(default_factory=list)
+    path: Optional[str] = None
+    attempts: int = 0
+    not_before: float = 0.0
+
+
+class ReclamationQueue:
+    def __init__(self, log_store: ExecutionLogStore, queue_path: Path) -> None:
+        self.log_store = log_store
+        self.queue_path = queue_path
+        self._jobs: dict[str, ReclaimJob] = {}
+        self._completed_since_compact = 0
+        self._reclaimed = 0
+        self._failures = 0
+        self._condition = threading.Condition()
+        self._thread: Optional[threading.Thread] = None
+        self._stopping = False
+        self._replay()
+
+    def _replay(self) -> None:
+        if not self.queue_path.exists():
+            return
+        with self.queue_path.open("r", encoding="utf-8") as handle:
+            for line in handle:
+                if not line.strip():
+                    continue
+                entry = json.loads(line)
+                op = entry.pop("op")
+                if op == "done":
+                    self._jobs.pop(entry["id"], None)
+                    self._completed_since_compact += 1
+                else:
+                    job = ReclaimJob(**entry)
+                    self._jobs[job.id] = job
+
+    def _append(self, entries: list[dict]) -> None:
+        self.queue_path.parent.mkdir(parents=True, exist_ok=True)
+        with self.queue_path.open("a", encoding="utf-8") as handle:
+            for entry in entries:
+                handle.write(json.dumps(entry, sort_keys=True) + "\n")
+            handle.flush()
+            os.fsync(handle.fileno())
+
+    def _compact(self) -> None:
+        self.queue_path.parent.mkdir(parents=True, exist_ok=True)
+        with tempfile.NamedTemporaryFile("w", delete=False, dir=self.queue_path.parent, encoding="utf-8") as handle:
+            for job in self._jobs.values():
+                handle.write(json.dumps({"op": "add", **asdict(job)}, sort_keys=True) + "\n")
+            handle.flush()
+            os.fsync(handle.fileno())
+            temp_name = handle.name
+        os.replace(temp_name, self.queue_path)
+        self._completed_since_compact = 0
+
+    def _enqueue(self, job: ReclaimJob) -> None:
+        with self._condition:
+            self._append([{"op": "add", **asdict(job)}])
+            self._jobs[job.id] = job
+            self._condition.notify()
+
+    def enqueue_executions(self, task_id: str, execution_ids: list[str]) -> None:
+        if execution_ids:
+            self._enqueue(ReclaimJob(id=str(uuid.uuid4()), kind="executions", task_id=task_id, execution_ids=execution_ids))
+
+    def enqueue_path(self, path: Path) -> None:
+        self._enqueue(ReclaimJob(id=str(uuid.uuid4()), kind="path", path=str(path)))
+
+    def depth(self) -> int:
+        with self._condition:
+            return len(self._jobs)
+
+    def stats(self) -> dict:
+        with self._condition:
+            return {
+                "pending": len(self._jobs),
+                "retrying": sum(1 for job in self._jobs.values() if job.attempts),
+                "reclaimed": self._reclaimed,
+                "failures": self._failures,
+            }
+
+    def _due_batch(self, now: float) -> list[ReclaimJob]:
+        due = [job for job in self._jobs.values() if job.not_before <= now]
+        return due[:RECLAIM_BATCH_SIZE]
+
+    def _process(self, batch: list[ReclaimJob]) -> tuple[list[ReclaimJob], list[ReclaimJob]]:
+        done: list[ReclaimJob] = []
+        failed: list[ReclaimJob] = []
+        by_task: dict[str, list[ReclaimJob]] = {}
+        for job in batch:
+            if job.kind == "executions" and job.task_id:
+                by_task.setdefault(job.task_id, []).append(job)
+                continue
+            try:
+                if job.path:
+                    shutil.rmtree(job.path)
+                done.append(job)
+            except FileNotFoundError:
+                done.append(job)
+            except OSError:
+                failed.append(job)
+        for task_id, jobs in by_task.items():
+            execution_ids = [execution_id for job in jobs for execution_id in job.execution_ids]
+            try:
+                self.log_store.delete(task_id, execution_ids)
+                done.extend(jobs)
+            except OSError:
+                failed.extend(jobs)
+        return done, failed
+
+    def drain(self) -> int:
+        processed = 0
+        while True:
+            with self._condition:
+                batch = self._due_batch(time.time())
+            if not batch:
+                return processed
+            done, failed = self._process(batch)
+            with self._condition:
+                entries: list[dict] = []
+                for job in done:
+                    self._jobs.pop(job.id, None)
+                    entries.append({"op": "done", "id": job.id})
+                for job in failed:
+                    job.attempts += 1
+                    job.not_before = time.time() + min(2.0**job.attempts, RECLAIM_MAX_BACKOFF_SECONDS)
+                    entries.append({"op": "add", **asdict(job)})
+                self._append(entries)
+                self._reclaimed += len(done)
+                self._failures += len(failed)
+                self._completed_since_compact += len(done)
+                if self._completed_since_compact > max(len(self._jobs), RECLAIM_BATCH_SIZE):
+                    self._compact()
+            processed += len(done)
+            if not done:
+                return processed
+
+    def _run(self) -> None:
+        while True:
+            with self._condition:
+                if self._stopping:
+                    return
+                if not self._due_batch(time.time()):
+                    self._condition.wait(RECLAIM_IDLE_SECONDS)
+                    continue
+            self.drain()
+
+    def start(self) -> None:
+        if self._thread is not None:
+            return
+        self._stopping = False
+        self._thread = threading.Thread(target=self._run, name="log-reclaimer", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        if self._thread is None:
+            return
+        with self._condition:
+            self._stopping = True
+            self._condition.notify()
+        self._thread.join(timeout=5)
+        self._thread = None
@@ -0,0 +1,34 @@
+from __future__ import annotations
+
+from typing import Any, Optional
+
+from fastapi.responses import Response
+from pydantic import BaseModel
+from pydantic_core import to_json
+
+
+class ModelResponse(Response):
+    # Serializes a pydantic model straight to JSON bytes. Returning a Response from a
+    # route skips FastAPI's response_model pass (dump, re-validate, jsonable_encoder),
+    # so only use it for models built from already-validated storage records.
+    media_type = "application/json"
+
+    def __init__(self, content: Any, include: Optional[dict] = None, **kwargs: Any) -> None:
+        self.include = include
+        super().__init__(content, **kwargs)
+
+    def render(self, content: Any) -> bytes:
+        return to_json(content, include=self.include)
+
+
+def model_response(model: type[BaseModel], **fields: Any) -> ModelResponse:
+    return ModelResponse(model.model_construct(**fields))
+
+
+def rows_response(model: type[BaseModel], rows: str, columns: Optional[list[str]], **fields: Any) -> ModelResponse:
+    # Writes only ``columns`` of each item in the ``rows`` list field (all when None).
+    if columns is None:
+        return model_response(model, **fields)
+    include: dict = {name: True for name in fields}
+    include[rows] = {"__all__": set(columns)}
+    return ModelResponse(model.model_construct(**fields), include=include)
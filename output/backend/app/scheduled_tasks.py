@@ -1,32 +1,140 @@
 from __future__ import annotations
 
+import contextvars
+import hashlib
+import logging
+import random
+import threading
+import time
 import uuid
-from datetime import datetime
+from collections import deque
+from concurrent.futures import Future, TimeoutError as FutureTimeoutError
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from functools import lru_cache, partial
 from pathlib import Path
-from typing import Optional
+from typing import Any, Callable, Optional, TypeVar
 
+from apscheduler.events import EVENT_JOB_MAX_INSTANCES, EVENT_JOB_MISSED, JobExecutionEvent, JobSubmissionEvent
+from apscheduler.executors.pool import ThreadPoolExecutor
 from apscheduler.schedulers.background import BackgroundScheduler
+from apscheduler.triggers.base import BaseTrigger
 from apscheduler.triggers.cron import CronTrigger
 from apscheduler.jobstores.base import JobLookupError
 
+from .async_storage import AsyncStorage, Command
+from .execution_logs import LogAppender
+from .log_store import ExecutionLogStore
+from .metrics import REGISTRY
+from .profiling import ProfileStore, run_profiled
+from .reclaim import ReclamationQueue
 from .models import ScheduledTask, ScheduledTaskCreate, ScheduledTaskExecution, ScheduledTaskUpdate
-from .services import DomainError, apply_interest_all
+from .services import DomainError, apply_interest_all, combine_interest_batches
+from .statements import StatementPeriod, generate_statements
 from .storage import Storage
+from .task_registry import TaskFunction, TaskLog, get_task_function, register_task_function, validate_function_name
+
+logger = logging.getLogger(__name__)
+
+
+class TaskBusyError(DomainError):
+    def __init__(self, function_name: str) -> None:
+        super().__init__(f"function '{function_name}' is already running at its concurrency limit", status_code=409)
+
+
+SYNC_JOB_ID = "__sync_jobs__"
+SYNC_INTERVAL_SECONDS = 60
+RECLAIM_QUEUE_NAME = ".reclaim-queue.jsonl"
+TRASH_DIR_NAME = ".trash"
+COALESCE_COUNT_LIMIT = 1000
+
+T = TypeVar("T")
+
+FIRE_LAG = REGISTRY.histogram(
+    "scheduler_fire_lag_seconds",
+    "Delay between a cron fire time and the start of the task run.",
+    ("function",),
+)
+QUEUE_WAIT = REGISTRY.histogram(
+    "scheduler_queue_wait_seconds",
+    "Time a fired job waited in the executor before its run started.",
+    ("function",),
+)
+RUN_DURATION = REGISTRY.histogram(
+    "scheduler_run_duration_seconds",
+    "Wall time of task function runs.",
+    ("function", "status"),
+)
+RUNS = REGISTRY.counter("scheduler_runs_total", "Finished task runs.", ("function", "status", "trigger"))
+MISFIRES = REGISTRY.counter(
+    "scheduler_misfires_total",
+    "Cron fires dropped because they started later than misfire_grace_time.",
+    ("function",),
+)
+COALESCED = REGISTRY.counter(
+    "scheduler_coalesced_fires_total",
+    "Missed cron fires merged into a later run by coalescing.",
+    ("function",),
+)
+SKIPPED = REGISTRY.counter(
+    "scheduler_skipped_runs_total",
+    "Fires not run because the job or function was at its instance limit.",
+    ("function", "reason"),
+)
+
+
+@dataclass(frozen=True)
+class _Fire:
+    scheduled_at: datetime
+    submitted: float
+
+
+def _count_fires_between(trigger: BaseTrigger, previous: datetime, current: datetime) -> int:
+    count = 0
+    fire = trigger.get_next_fire_time(previous, previous)
+    while fire is not None and fire < current and count < COALESCE_COUNT_LIMIT:
+        count += 1
+        fire = trigger.get_next_fire_time(fire, fire)
+    return count
+
+
+class _InstrumentedExecutor(ThreadPoolExecutor):
+    # Hooks the point where APScheduler hands fire times to the pool, which is the
+    # only place the scheduled time is visible before the job function starts.
+    def __init__(self, manager: "ScheduledTaskManager") -> None:
+        super().__init__()
+        self._manager = manager
+
+    def _do_submit_job(self, job, run_times):
+        self._manager._record_submission(job, run_times)
+        return super()._do_submit_job(job, run_times)
 
 
 def now_iso() -> str:
     return datetime.now().isoformat(timespec="seconds")
 
 
+@lru_cache(maxsize=1024)
+def cron_trigger(cron: str) -> CronTrigger:
+    # Triggers are stateless, so one parsed instance can back every job with the same cron.
+    return CronTrigger.from_crontab(cron)
+
+
+def job_signature(task: ScheduledTask) -> str:
+    key = f"{task.cron}|{task.enabled}|{task.function_name}"
+    return hashlib.sha1(key.encode("utf-8")).hexdigest()
+
+
 def validate_cron(cron: str) -> None:
     try:
-        CronTrigger.from_crontab(cron)
+        cron_trigger(cron)
     except Exception as exc:  # pragma: no cover - exact exception varies
         raise DomainError("invalid cron expression", status_code=400) from exc
 
 
 def create_task(storage: Storage, payload: ScheduledTaskCreate) -> ScheduledTask:
     validate_cron(payload.cron)
+    validate_function_name(payload.function_name)
     if payload.task_id:
         if storage.get_scheduled_task(payload.task_id):
             raise DomainError("task id already exists", status_code=409)
@@ -53,6 +161,7 @@ def update_task(storage: Storage, task_id: str, payload: ScheduledTaskUpdate) ->
     if not existing:
         raise DomainError("task not found", status_code=404)
     validate_cron(payload.cron)
+    validate_function_name(payload.function_name)
     updated = ScheduledTask(
         id=task_id,
         display_name=payload.display_name,
@@ -95,26 +204,120 @@ def list_tasks_with_last_run(storage: Storage) -> list[ScheduledTask]:
     return results
 
 
+@register_task_function("heartbeat", max_instances=1, coalesce=True, misfire_grace_time=60)
+def run_heartbeat(manager: "ScheduledTaskManager", log: TaskLog) -> None:
+    log("Hello Heartbeat")
+
+
+@register_task_function(
+    "monthend_interest",
+    max_instances=1,
+    coalesce=True,
+    misfire_grace_time=6 * 60 * 60,
+    timeout_seconds=60 * 60,
+)
+def run_monthend_interest(manager: "ScheduledTaskManager", log: TaskLog) -> None:
+    log("MONTHEND INTEREST BATCH START")
+    log("Applying 2% annual interest to all savings accounts...")
+    result = combine_interest_batches(manager.write_each(apply_interest_all))
+    log(f"Interest applied to {result.applied_count} savings accounts.")
+    checkpoints = sum(manager.write_each(Storage.record_checkpoints))
+    log(f"Balance checkpoints recorded for {checkpoints} accounts.")
+    log("MONTHEND INTEREST BATCH COMPLETE")
+
+
+@register_task_function(
+    "monthend_statements",
+    max_instances=1,
+    coalesce=True,
+    misfire_grace_time=6 * 60 * 60,
+    timeout_seconds=60 * 60,
+)
+def run_monthend_statements(manager: "ScheduledTaskManager", log: TaskLog) -> None:
+    # Statements are reads only, so they go straight to the store rather than
+    # through the writer. A rerun of the same month picks up where the last stopped.
+    period = StatementPeriod.closed_before(datetime.now().date())
+    log("MONTHEND STATEMENTS BATCH START")
+    log(f"Generating statements for {period.month}...")
+    run = generate_statements(manager.storage, manager.statements_dir, period, log=log)
+    log(
+        f"{run.statements} statements for {run.accounts} accounts in {run.parts} parts, "
+        f"{run.accounts_per_second:.0f} accounts/sec."
+    )
+    log("MONTHEND STATEMENTS BATCH COMPLETE")
+
+
 class ScheduledTaskManager:
-    def __init__(self, storage: Storage, logs_dir: Path) -> None:
+    def __init__(
+        self,
+        storage: Storage,
+        logs_dir: Path,
+        profile_store: Optional[ProfileStore] = None,
+        profile_sample_rate: float = 0.0,
+        writer: Optional[AsyncStorage] = None,
+        statements_dir: Optional[Path] = None,
+    ) -> None:
         self.storage = storage
+        self.writer = writer
         self.logs_dir = logs_dir
-        self.scheduler = BackgroundScheduler()
+        self.statements_dir = statements_dir or logs_dir.parent / "statements"
+        self.profile_store = profile_store
+        self.profile_sample_rate = profile_sample_rate
+        self.log_store = ExecutionLogStore(logs_dir)
+        self.reclaimer = ReclamationQueue(self.log_store, logs_dir / RECLAIM_QUEUE_NAME)
+        self.scheduler = BackgroundScheduler(executors={"default": _InstrumentedExecutor(self)})
+        self.scheduler.add_listener(self._on_job_event, EVENT_JOB_MISSED | EVENT_JOB_MAX_INSTANCES)
         self._started = False
+        self._running: dict[str, int] = {}
+        self._running_lock = threading.Lock()
+        self._job_signatures: dict[str, str] = {}
+        self._active_logs: dict[str, LogAppender] = {}
+        self._pending_fires: dict[str, deque[_Fire]] = {}
+        self._last_fire: dict[str, datetime] = {}
+        self._job_functions: dict[str, str] = {}
+        self._sync_lock = threading.RLock()
 
     def start(self) -> None:
         if self._started:
             return
         self.logs_dir.mkdir(parents=True, exist_ok=True)
+        self.log_store.import_loose(active=set(self._active_logs))
+        self.reclaimer.start()
         self.scheduler.start()
         self._started = True
         self.sync_jobs()
+        self.scheduler.add_job(
+            self.sync_jobs,
+            trigger="interval",
+            seconds=SYNC_INTERVAL_SECONDS,
+            id=SYNC_JOB_ID,
+            replace_existing=True,
+            max_instances=1,
+            coalesce=True,
+        )
 
     def shutdown(self) -> None:
         if not self._started:
             return
         self.scheduler.shutdown(wait=False)
+        self.reclaimer.stop()
         self._started = False
+        self._job_signatures.clear()
+
+    def write(self, func: Command, *args: Any, **kwargs: Any) -> Any:
+        # Mutations go through the app's store writer when there is one, so the
+        # scheduler never races request handlers for the store.
+        if self.writer is not None:
+            return self.writer.call(func, *args, **kwargs)
+        if isinstance(func, str):
+            return getattr(self.storage, func)(*args, **kwargs)
+        return func(self.storage, *args, **kwargs)
+
+    def write_each(self, func: Callable[..., T], *args: Any, **kwargs: Any) -> list[T]:
+        # Account-wide batches run once per shard, each on that shard's writer.
+        if self.writer is not None:
+            return self.writer.call_each(func, *args, **kwargs)
+        return [func(shard, *args, **kwargs) for shard in self.storage.shards()]
 
     def ensure_default_tasks(self) -> None:
         existing = self.storage.list_scheduled_tasks()
@@ -131,77 +334,252 @@ class ScheduledTaskManager:
             updated_at=now_iso(),
             last_run=None,
         )
-        self.storage.upsert_scheduled_task(default_task)
+        self.write("upsert_scheduled_task", default_task)
 
     def sync_jobs(self) -> None:
         if not self._started:
             return
-        self.scheduler.remove_all_jobs()
-        for task in self.storage.list_scheduled_tasks():
-            if task.enabled:
+        with self._sync_lock:
+            desired = {task.id: task for task in self.storage.list_scheduled_tasks() if task.enabled}
+            live = {job.id for job in self.scheduler.get_jobs() if job.id != SYNC_JOB_ID}
+            for task_id in live - desired.keys():
+                self.remove_job(task_id)
+            for task_id, task in desired.items():
+                if task_id in live and self._job_signatures.get(task_id) == job_signature(task):
+                    continue
                 self._schedule_task(task)
 
     def add_or_update_job(self, task: ScheduledTask) -> None:
         if not self._started:
             return
-        if task.enabled:
-            self._schedule_task(task)
-        else:
-            self.remove_job(task.id)
+        with self._sync_lock:
+            if not task.enabled:
+                self.remove_job(task.id)
+            elif self._job_signatures.get(task.id) != job_signature(task):
+                self._schedule_task(task)
 
     def remove_job(self, task_id: str) -> None:
         if not self._started:
             return
-        try:
-            self.scheduler.remove_job(task_id)
-        except JobLookupError:
-            pass
+        with self._sync_lock:
+            self._job_signatures.pop(task_id, None)
+            self._job_functions.pop(task_id, None)
+            try:
+                self.scheduler.remove_job(task_id)
+            except JobLookupError:
+                pass
 
     def _schedule_task(self, task: ScheduledTask) -> None:
-        trigger = CronTrigger.from_crontab(task.cron)
+        trigger = cron_trigger(task.cron)
+        function = get_task_function(task.function_name)
+        options = {}
+        if function is not None:
+            options = {
+                "max_instances": function.max_instances,
+                "coalesce": function.coalesce,
+                "misfire_grace_time": function.misfire_grace_time,
+            }
         self.scheduler.add_job(
-            self.run_task,
+            self._run_scheduled,
             trigger=trigger,
             id=task.id,
             args=[task.id],
             replace_existing=True,
+            **options,
         )
+        self._job_signatures[task.id] = job_signature(task)
+        self._job_functions[task.id] = task.function_name
+
+    def _record_submission(self, job, run_times: list[datetime]) -> None:
+        if job.id == SYNC_JOB_ID:
+            return
+        submitted = time.perf_counter()
+        function_name = self._job_functions.get(job.id, "")
+        with self._running_lock:
+            previous = self._last_fire.get(job.id)
+            self._last_fire[job.id] = run_times[-1]
+            self._pending_fires.setdefault(job.id, deque()).extend(_Fire(run_time, submitted) for run_time in run_times)
+        if previous is not None and job.coalesce:
+            skipped = _count_fires_between(job.trigger, previous, run_times[0])
+            if skipped:
+                COALESCED.inc(skipped, function=function_name)
+
+    def _on_job_event(self, event: JobSubmissionEvent | JobExecutionEvent) -> None:
+        function_name = self._job_functions.get(event.job_id, "")
+        if event.code == EVENT_JOB_MISSED:
+            MISFIRES.inc(function=function_name)
+            with self._running_lock:
+                pending = self._pending_fires.get(event.job_id)
+                if pending:
+                    for fire in list(pending):
+                        if fire.scheduled_at == event.scheduled_run_time:
+                            pending.remove(fire)
+                            break
+        elif event.code == EVENT_JOB_MAX_INSTANCES:
+            SKIPPED.inc(function=function_name, reason="max_instances")
+
+    def _next_fire(self, task_id: str) -> Optional[_Fire]:
+        with self._running_lock:
+            pending = self._pending_fires.get(task_id)
+            return pending.popleft() if pending else None
+
+    def _run_scheduled(self, task_id: str) -> None:
+        try:
+            self.run_task(task_id, fire=self._next_fire(task_id))
+        except TaskBusyError as exc:
+            SKIPPED.inc(function=self._job_functions.get(task_id, ""), reason="busy")
+            logger.warning("Skipped scheduled run of %s: %s", task_id, exc)
+
+    def running_count(self, function_name: str) -> int:
+        with self._running_lock:
+            return self._running.get(function_name, 0)
+
+    def _acquire_slot(self, function: TaskFunction) -> None:
+        with self._running_lock:
+            running = self._running.get(function.name, 0)
+            if running >= function.max_instances:
+                raise TaskBusyError(function.name)
+            self._running[function.name] = running + 1
+
+    def _release_slot(self, function: TaskFunction) -> None:
+        with self._running_lock:
+            remaining = self._running.get(function.name, 0) - 1
+            if remaining > 0:
+                self._running[function.name] = remaining
+            else:
+                self._running.pop(function.name, None)
+
+    def _handler_for(self, function: TaskFunction) -> Callable[["ScheduledTaskManager", TaskLog], None]:
+        if self.profile_store is None or random.random() >= self.profile_sample_rate:
+            return function.handler
+        store = self.profile_store
+        return lambda manager, log: run_profiled(store, f"scheduled {function.name}", function.handler, manager, log)
+
+    def _invoke(self, function: TaskFunction, log: TaskLog, on_exit: Callable[[], None]) -> None:
+        handler = self._handler_for(function)
+        if function.timeout_seconds is None:
+            try:
+                handler(self, log)
+            finally:
+                self._release_slot(function)
+                on_exit()
+            return
+
+        # The slot stays held until the handler really returns, so a timed-out
+        # run still counts against max_instances while it winds down.
+        outcome: Future = Future()
+
+        def target() -> None:
+            try:
+                handler(self, log)
+            except BaseException as exc:  # pragma: no cover - surfaced via future
+                outcome.set_exception(exc)
+            else:
+                outcome.set_result(None)
+            finally:
+                self._release_slot(function)
+                on_exit()
+
+        # Run in a copy of the caller's context so storage timings and byte counts
+        # are still attributed to whoever started the run.
+        context = contextvars.copy_context()
+        threading.Thread(target=context.run, args=(target,), name=f"task-{function.name}", daemon=True).start()
+        try:
+            outcome.result(timeout=function.timeout_seconds)
+        except FutureTimeoutError:
+            raise TimeoutError(f"timed out after {function.timeout_seconds:g} seconds") from None
+
+    def is_execution_active(self, execution_id: str) -> bool:
+        with self._running_lock:
+            return execution_id in self._active_logs
 
     @staticmethod
-    def _emit_log(log_lines: list[str], message: str) -> None:
+    def _emit_log(appender: LogAppender, message: str) -> None:
         print(message)
-        log_lines.append(message)
-
-    def _run_monthend_interest(self, log_lines: list[str]) -> None:
-        self._emit_log(log_lines, "MONTHEND INTEREST BATCH START")
-        self._emit_log(log_lines, "Applying 2% annual interest to all savings accounts...")
-        result = apply_interest_all(self.storage)
-        self._emit_log(log_lines, f"Interest applied to {result.applied_count} savings accounts.")
-        self._emit_log(log_lines, "MONTHEND INTEREST BATCH COMPLETE")
+        appender.write_line(message)
 
-    def run_task(self, task_id: str) -> Optional[ScheduledTaskExecution]:
+    def run_task(self, task_id: str, fire: Optional[_Fire] = None) -> Optional[ScheduledTaskExecution]:
         task = self.storage.get_scheduled_task(task_id)
         if not task or not task.enabled:
             return None
+        function = get_task_function(task.function_name)
         execution_id = str(uuid.uuid4())
-        started_at = now_iso()
-        task_dir = self.logs_dir / task.id
-        task_dir.mkdir(parents=True, exist_ok=True)
-        log_path = task_dir / f"{execution_id}.log"
+        log_path = self.log_store.live_path(task.id, execution_id)
+        log_path.parent.mkdir(parents=True, exist_ok=True)
         status = "success"
-        log_lines: list[str] = []
+        if function is not None:
+            self._acquire_slot(function)
+        started_clock = time.perf_counter()
+        started_at = now_iso()
+        trigger = "cron" if fire else "manual"
+        scheduled_at: Optional[str] = None
+        fire_lag_ms: Optional[float] = None
+        queue_wait_ms: Optional[float] = None
+        if fire is not None:
+            scheduled_at = fire.scheduled_at.isoformat()
+            fire_lag = max((datetime.now(timezone.utc) - fire.scheduled_at).total_seconds(), 0.0)
+            queue_wait = started_clock - fire.submitted
+            fire_lag_ms = round(fire_lag * 1000, 3)
+            queue_wait_ms = round(queue_wait * 1000, 3)
+            FIRE_LAG.observe(fire_lag, function=task.function_name)
+            QUEUE_WAIT.observe(queue_wait, function=task.function_name)
+        appender = LogAppender(log_path)
+        with self._running_lock:
+            self._active_logs[execution_id] = appender
+        # The log is committed to the segment store once both this method and the
+        # handler are done with it; a timed-out handler may keep writing for a while.
+        holders = [2 if function is not None else 1]
+
+        def settle_log() -> None:
+            with self._running_lock:
+                holders[0] -= 1
+                if holders[0]:
+                    return
+                self._active_logs.pop(execution_id, None)
+            appender.close()
+            self.log_store.commit(task.id, execution_id, started_at)
+
         try:
-            if task.function_name == "heartbeat":
-                self._emit_log(log_lines, "Hello Heartbeat")
-            elif task.function_name == "monthend_interest":
-                self._run_monthend_interest(log_lines)
-            else:
+            self.write(
+                "append_task_execution",
+                ScheduledTaskExecution(
+                    id=execution_id,
+                    task_id=task.id,
+                    status="running",
+                    started_at=started_at,
+                    finished_at=None,
+                    log_path=str(log_path),
+                    trigger=trigger,
+                    scheduled_at=scheduled_at,
+                    fire_lag_ms=fire_lag_ms,
+                    queue_wait_ms=queue_wait_ms,
+                ),
+            )
+        except BaseException:
+            # The handler never started, so hand back its slot and drop the live
+            # log here; otherwise the function stays busy until a restart.
+            if function is not None:
+                self._release_slot(function)
+            with self._running_lock:
+                self._active_logs.pop(execution_id, None)
+            appender.close()
+            log_path.unlink(missing_ok=True)
+            raise
+        try:
+            if function is None:
                 raise RuntimeError(f"Unknown function {task.function_name}")
+            self._invoke(function, partial(self._emit_log, appender), settle_log)
+        except TimeoutError as exc:
+            status = "timeout"
+            appender.write_line(f"Error: {exc}")
         except Exception as exc:  # pragma: no cover - defensive
             status = "failed"
-            log_lines.append(f"Error: {exc}")
-        log_text = "\n".join(log_lines)
-        log_path.write_text(log_text + "\n", encoding="utf-8")
+            appender.write_line(f"Error: {exc}")
+        finally:
+            settle_log()
+        duration = time.perf_counter() - started_clock
+        RUN_DURATION.observe(duration, function=task.function_name, status=status)
+        RUNS.inc(function=task.function_name, status=status, trigger=trigger)
         finished_at = now_iso()
         execution = ScheduledTaskExecution(
             id=execution_id,
@@ -210,8 +588,13 @@ class ScheduledTaskManager:
             started_at=started_at,
             finished_at=finished_at,
             log_path=str(log_path),
+            trigger=trigger,
+            scheduled_at=scheduled_at,
+            fire_lag_ms=fire_lag_ms,
+            queue_wait_ms=queue_wait_ms,
+            duration_ms=round(duration * 1000, 3),
         )
-        self.storage.append_task_execution(execution)
+        self.write("upsert_task_execution", execution)
         updated_task = ScheduledTask(
             id=task.id,
             display_name=task.display_name,
@@ -222,11 +605,12 @@ class ScheduledTaskManager:
             updated_at=task.updated_at,
             last_run=started_at,
         )
-        self.storage.upsert_scheduled_task(updated_task)
-        removed = self.storage.prune_task_executions(task.id, keep=50)
-        for old in removed:
-            try:
-                Path(old.log_path).unlink()
-            except FileNotFoundError:
-                pass
+        self.write("upsert_scheduled_task", updated_task)
+        removed = self.write("prune_task_executions", task.id, keep=50)
+        self.reclaimer.enqueue_executions(task.id, [old.id for old in removed])
         return execution
+
+    def discard_task_logs(self, task_id: str) -> None:
+        detached = self.log_store.detach_task(task_id, self.logs_dir / TRASH_DIR_NAME)
+        if detached is not None:
+            self.reclaimer.enqueue_path(detached)
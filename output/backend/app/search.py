@@ -0,0 +1,193 @@
+from __future__ import annotations
+
+from bisect import bisect_left
+from dataclasses import dataclass, field, replace
+from itertools import islice
+from math import isqrt
+from typing import Iterable, Iterator, Optional
+
+from .models import Account
+
+SEARCH_GRAM = 3
+# Substring candidates checked one by one before the rest are first narrowed down
+# by a second trigram; dense matches finish well within this.
+GRAM_SCAN = 256
+# Changed accounts kept beside the sorted term lists before they are merged in.
+PENDING_MIN = 64
+
+
+def _grams(text: str) -> set[str]:
+    return {text[i : i + SEARCH_GRAM] for i in range(len(text) - SEARCH_GRAM + 1)}
+
+
+def _word_suffixes(name: str) -> list[str]:
+    # "ada m lovelace" -> ["m lovelace", "lovelace"]: the name from each later word on.
+    return [name[i:] for i in range(1, len(name)) if name[i - 1] == " " and name[i] != " "]
+
+
+def search_rank(query: str, account_id: str, name: str) -> tuple[int, str, str]:
+    # Lower sorts first: exact id, id prefix, name prefix, word prefix, then substring.
+    # Within a tier, by the matched text and then the id. Arguments are lowercased.
+    if account_id == query:
+        return (0, account_id, account_id)
+    if account_id.startswith(query):
+        return (1, account_id, account_id)
+    if name.startswith(query):
+        return (2, name, account_id)
+    words = [suffix for suffix in _word_suffixes(name) if suffix.startswith(query)]
+    if words:
+        return (3, min(words), account_id)
+    return (4, name, account_id)
+
+
+def _prefix_scan(terms: list[tuple[str, str]], query: str) -> Iterator[str]:
+    for position in range(bisect_left(terms, (query,)), len(terms)):
+        term, account_id = terms[position]
+        if not term.startswith(query):
+            break
+        yield account_id
+
+
+def _matches(query: str, account_id: str, name: str) -> bool:
+    # Whether any tier of SearchIndex.search would return the account. Lowercased.
+    if account_id.startswith(query) or name.startswith(query):
+        return True
+    if any(suffix.startswith(query) for suffix in _word_suffixes(name)):
+        return True
+    return len(query) >= SEARCH_GRAM and (query in name or query in account_id)
+
+
+@dataclass(frozen=True)
+class SearchIndex:
+    # Lowercased names and ids of one store's accounts. Sorted term lists answer the
+    # prefix tiers and trigram postings (ordered by name) the substring tier, each in
+    # rank order. Never mutated: a create, rename or delete returns a new index that
+    # shares the sorted lists and copies only ``pending``, the accounts changed since
+    # they were built (None once deleted). Searches check pending accounts one by
+    # one; past ``_pending_limit`` they are folded into new lists.
+    names: dict[str, str]
+    ids: list[tuple[str, str]]
+    full_names: list[tuple[str, str]]
+    words: list[tuple[str, str]]
+    grams: dict[str, tuple[str, ...]]
+    pending: dict[str, Optional[str]] = field(default_factory=dict)
+
+    @classmethod
+    def build(cls, accounts: Iterable[Account]) -> "SearchIndex":
+        return cls._from_names({account.account_id: account.name.lower() for account in accounts})
+
+    @classmethod
+    def _from_names(cls, names: dict[str, str]) -> "SearchIndex":
+        postings: dict[str, list[str]] = {}
+        words: list[tuple[str, str]] = []
+        for account_id in sorted(names, key=lambda key: (names[key], key.lower())):
+            name = names[account_id]
+            words.extend((suffix, account_id) for suffix in _word_suffixes(name))
+            for gram in _grams(name) | _grams(account_id.lower()):
+                postings.setdefault(gram, []).append(account_id)
+        return cls(
+            names=names,
+            ids=sorted((account_id.lower(), account_id) for account_id in names),
+            full_names=sorted((name, account_id) for account_id, name in names.items()),
+            words=sorted(words),
+            grams={gram: tuple(ids) for gram, ids in postings.items()},
+        )
+
+    def _pending_limit(self) -> int:
+        # Folding pending changes in is one linear pass over the lists, so letting
+        # about sqrt(n) build up keeps each write well below O(n) while searches
+        # check only a few extra accounts.
+        return max(PENDING_MIN, isqrt(len(self.names)))
+
+    def with_account(self, old: Optional[Account], new: Optional[Account]) -> "SearchIndex":
+        if old is not None and new is not None and old.name == new.name:
+            return self
+        changes: dict[str, Optional[str]] = {}
+        if old is not None:
+            changes[old.account_id] = None
+        if new is not None:
+            changes[new.account_id] = new.name.lower()
+        pending = {**self.pending, **changes}
+        if len(pending) <= self._pending_limit():
+            return replace(self, pending=pending)
+        return self._folded(pending)
+
+    def _folded(self, pending: dict[str, Optional[str]]) -> "SearchIndex":
+        # Drops the stale entries of every pending account and merges in the live
+        # ones. Each list is already sorted, so sorted() only merges two runs.
+        names = dict(self.names)
+        added: dict[str, str] = {}
+        touched: set[str] = set()
+        for account_id, name in pending.items():
+            previous = names.pop(account_id, None)
+            if previous is not None:
+                touched |= _grams(previous) | _grams(account_id.lower())
+            if name is not None:
+                names[account_id] = added[account_id] = name
+                touched |= _grams(name) | _grams(account_id.lower())
+
+        def merged(items: list[tuple[str, str]], entries: Iterable[tuple[str, str]]) -> list[tuple[str, str]]:
+            return sorted([item for item in items if item[1] not in pending] + list(entries))
+
+        grams = dict(self.grams)
+        for gram in touched:
+            posting = [account_id for account_id in grams.get(gram, ()) if account_id not in pending]
+            posting += [account_id for account_id, name in added.items() if gram in name or gram in account_id.lower()]
+            if posting:
+                grams[gram] = tuple(sorted(posting, key=lambda key: (names[key], key.lower())))
+            else:
+                grams.pop(gram, None)
+        return SearchIndex(
+            names=names,
+            ids=merged(self.ids, ((account_id.lower(), account_id) for account_id in added)),
+            full_names=merged(self.full_names, ((name, account_id) for account_id, name in added.items())),
+            words=merged(
+                self.words,
+                ((suffix, account_id) for account_id, name in added.items() for suffix in _word_suffixes(name)),
+            ),
+            grams=grams,
+        )
+
+    def _name(self, account_id: str) -> str:
+        name = self.pending.get(account_id)
+        return name if name is not None else self.names[account_id]
+
+    def search(self, query: str, limit: int) -> list[str]:
+        # Account ids of the best ``limit`` matches, best first.
+        query = query.strip().lower()
+        if not query or limit <= 0:
+            return []
+        found: list[str] = []
+        # Pending accounts are matched directly; their entries in the lists are stale.
+        seen: set[str] = set(self.pending)
+        # Each tier is scanned in its own rank order, so it can stop once the limit is met.
+        for terms in (self.ids, self.full_names, self.words):
+            for account_id in _prefix_scan(terms, query):
+                if len(found) >= limit:
+                    break
+                if account_id not in seen:
+                    seen.add(account_id)
+                    found.append(account_id)
+        # Queries shorter than a gram only match prefixes.
+        if len(found) < limit and len(query) >= SEARCH_GRAM:
+            # Candidates from the rarest trigram of the query, checked in full.
+            postings = sorted((self.grams.get(gram, ()) for gram in _grams(query)), key=len)
+            candidates: Iterator[str] = iter(postings[0])
+            self._substrings(query, islice(candidates, GRAM_SCAN), seen, found, limit)
+            if len(found) < limit and len(postings) > 1 and len(postings[0]) > GRAM_SCAN:
+                candidates = filter(set(postings[1]).__contains__, candidates)
+            self._substrings(query, candidates, seen, found, limit)
+        found.extend(
+            account_id
+            for account_id, name in self.pending.items()
+            if name is not None and _matches(query, account_id.lower(), name)
+        )
+        ranked = sorted(found, key=lambda account_id: search_rank(query, account_id.lower(), self._name(account_id)))
+        return ranked[:limit]
+
+    def _substrings(self, query: str, candidates: Iterable[str], seen: set[str], found: list[str], limit: int) -> None:
+        for account_id in candidates:
+            if len(found) >= limit:
+                return
+            if account_id not in seen and (query in self.names[account_id] or query in account_id.lower()):
+                found.append(account_id)
@@ -1,25 +1,40 @@
 from __future__ import annotations
 
-import uuid
 from dataclasses import dataclass
 from decimal import Decimal
 from datetime import datetime
-from typing import Optional
+from fractions import Fraction
+from typing import Any, Callable, Optional, Sequence, TypeVar
 
 from .models import (
     Account,
     AccountCreate,
+    AccountTypeSummary,
     AccountUpdate,
     ApplyInterestBatchResult,
     ApplyInterestResult,
+    BalanceAsOfResponse,
+    IdempotencyRecord,
+    SummaryResponse,
     Transaction,
     TransactionCreate,
-    quantize_money,
+    TransactionTypeSummary,
 )
-from .storage import Storage
+from .ids import new_transaction_id
+from .money import Cents, apply_rate, from_cents, to_cents
+from .storage import IdempotencyKeyReusedError, Storage, VersionConflictError
 
 INTEREST_RATE = Decimal("0.02")
+_INTEREST_RATIO = Fraction(INTEREST_RATE)
 STATEMENT_LIMIT = 5
+# Attempts at a balance compare-and-swap before giving up with a 409.
+CONFLICT_RETRIES = 5
+KEY_REUSED = "Idempotency-Key was already used for a different request"
+# Columns that list endpoints accept in ``fields=`` and ``sort=``.
+ACCOUNT_FIELDS = tuple(Account.model_fields)
+TRANSACTION_FIELDS = tuple(Transaction.model_fields)
+
+Record = TypeVar("Record", Account, Transaction)
 
 
 class DomainError(RuntimeError):
@@ -35,6 +50,67 @@ def now_date_time() -> tuple[str, str]:
     return date, time
 
 
+def _post_transaction(
+    storage: Storage,
+    account_id: str,
+    transaction_type: str,
+    compute: Callable[[Account, Cents], Cents],
+    amount: Optional[Decimal] = None,
+    when: Optional[tuple[str, str]] = None,
+    idempotency_key: Optional[str] = None,
+    fingerprint: str = "",
+) -> tuple[Account, Transaction]:
+    # Read, compute and post: the new balance, its transaction and any idempotency
+    # record are saved by one compare-and-swap write. A concurrent writer that got
+    # in first bumps the version, so re-read and re-validate against its result;
+    # it may have posted this key, so each attempt replays first. The write checks
+    # the key again under the store lock. Without an explicit ``amount`` the
+    # transaction records the balance change.
+    for _ in range(CONFLICT_RETRIES):
+        replayed = _replay(storage, account_id, idempotency_key, fingerprint)
+        if replayed is not None:
+            return replayed.account, replayed.transaction
+        account = storage.get_account(account_id)
+        if not account:
+            raise DomainError("account not found", status_code=404)
+        balance = to_cents(account.balance)
+        new_balance = compute(account, balance)
+        date, time = when or now_date_time()
+        transaction = Transaction(
+            transaction_id=new_transaction_id(),
+            account_id=account_id,
+            transaction_type=transaction_type,
+            amount=amount if amount is not None else from_cents(new_balance - balance),
+            date=date,
+            time=time,
+        )
+        try:
+            return storage.apply_transaction(
+                transaction, from_cents(new_balance), account.version, idempotency_key, fingerprint
+            )
+        except VersionConflictError:
+            continue
+        except IdempotencyKeyReusedError:
+            raise DomainError(KEY_REUSED, status_code=422) from None
+        except KeyError:
+            raise DomainError("account not found", status_code=404) from None
+    raise DomainError("account is being updated concurrently, retry", status_code=409)
+
+
+def _replay(
+    storage: Storage,
+    account_id: str,
+    key: Optional[str],
+    fingerprint: str,
+) -> Optional[IdempotencyRecord]:
+    if key is None:
+        return None
+    record = storage.get_idempotency_record(account_id, key)
+    if record is not None and record.fingerprint != fingerprint:
+        raise DomainError(KEY_REUSED, status_code=422)
+    return record
+
+
 def create_account(storage: Storage, payload: AccountCreate) -> tuple[Account, bool]:
     account = Account(
         account_id=payload.account_id,
@@ -43,11 +119,15 @@ def create_account(storage: Storage, payload: AccountCreate) -> tuple[Account, b
         account_type=payload.account_type,
     )
     exists = storage.get_account(account.account_id) is not None
-    storage.upsert_account(account)
-    return account, exists
+    return storage.upsert_account(account), exists
 
 
-def update_account(storage: Storage, account_id: str, payload: AccountUpdate) -> Account:
+def update_account(
+    storage: Storage,
+    account_id: str,
+    payload: AccountUpdate,
+    expected_version: Optional[int] = None,
+) -> Account:
     existing = storage.get_account(account_id)
     if not existing:
         raise DomainError("account not found", status_code=404)
@@ -57,8 +137,10 @@ def update_account(storage: Storage, account_id: str, payload: AccountUpdate) ->
         balance=payload.balance,
         account_type=payload.account_type,
     )
-    storage.upsert_account(updated)
-    return updated
+    try:
+        return storage.upsert_account(updated, expected_version=expected_version)
+    except VersionConflictError as exc:
+        raise DomainError(f"account version is {exc.actual}, not {exc.expected}", status_code=412) from None
 
 
 def delete_account(storage: Storage, account_id: str) -> None:
@@ -66,145 +148,269 @@ def delete_account(storage: Storage, account_id: str) -> None:
         raise DomainError("account not found", status_code=404)
 
 
-def deposit(storage: Storage, account_id: str, amount: Decimal) -> tuple[Account, Transaction]:
-    account = storage.get_account(account_id)
-    if not account:
-        raise DomainError("account not found", status_code=404)
-    new_balance = quantize_money(account.balance + amount)
-    updated = storage.update_account_balance(account_id, new_balance)
-    date, time = now_date_time()
-    transaction = Transaction(
-        transaction_id=str(uuid.uuid4()),
-        account_id=account_id,
-        transaction_type="D",
+def deposit(
+    storage: Storage,
+    account_id: str,
+    amount: Decimal,
+    idempotency_key: Optional[str] = None,
+) -> tuple[Account, Transaction]:
+    fingerprint = f"D:{amount}"
+    amount_cents = to_cents(amount)
+    updated, transaction = _post_transaction(
+        storage,
+        account_id,
+        "D",
+        lambda account, balance: balance + amount_cents,
         amount=amount,
-        date=date,
-        time=time,
+        idempotency_key=idempotency_key,
+        fingerprint=fingerprint,
     )
-    storage.append_transaction(transaction)
     return updated, transaction
 
 
-def withdraw(storage: Storage, account_id: str, amount: Decimal) -> tuple[Account, Transaction]:
-    account = storage.get_account(account_id)
-    if not account:
-        raise DomainError("account not found", status_code=404)
-    if account.balance < amount:
-        raise DomainError("insufficient funds", status_code=400)
-    new_balance = quantize_money(account.balance - amount)
-    updated = storage.update_account_balance(account_id, new_balance)
-    date, time = now_date_time()
-    transaction = Transaction(
-        transaction_id=str(uuid.uuid4()),
-        account_id=account_id,
-        transaction_type="W",
+def withdraw(
+    storage: Storage,
+    account_id: str,
+    amount: Decimal,
+    idempotency_key: Optional[str] = None,
+) -> tuple[Account, Transaction]:
+    fingerprint = f"W:{amount}"
+    amount_cents = to_cents(amount)
+
+    def compute(account: Account, balance: Cents) -> Cents:
+        if balance < amount_cents:
+            raise DomainError("insufficient funds", status_code=400)
+        return balance - amount_cents
+
+    updated, transaction = _post_transaction(
+        storage,
+        account_id,
+        "W",
+        compute,
         amount=amount,
-        date=date,
-        time=time,
+        idempotency_key=idempotency_key,
+        fingerprint=fingerprint,
     )
-    storage.append_transaction(transaction)
     return updated, transaction
 
 
 def apply_interest_for_account(storage: Storage, account_id: str) -> ApplyInterestResult:
-    account = storage.get_account(account_id)
-    if not account:
-        raise DomainError("account not found", status_code=404)
-    if account.account_type != "S":
-        raise DomainError("interest applies only to savings accounts", status_code=400)
-    interest_amount = quantize_money(account.balance * INTEREST_RATE)
-    new_balance = quantize_money(account.balance + interest_amount)
-    storage.update_account_balance(account_id, new_balance)
-    date, time = now_date_time()
-    transaction = Transaction(
-        transaction_id=str(uuid.uuid4()),
-        account_id=account_id,
-        transaction_type="I",
-        amount=interest_amount,
-        date=date,
-        time=time,
-    )
-    storage.append_transaction(transaction)
+    def compute(account: Account, balance: Cents) -> Cents:
+        if account.account_type != "S":
+            raise DomainError("interest applies only to savings accounts", status_code=400)
+        return balance + apply_rate(balance, _INTEREST_RATIO)
+
+    updated, transaction = _post_transaction(storage, account_id, "I", compute)
     return ApplyInterestResult(
         account_id=account_id,
-        interest_amount=interest_amount,
-        new_balance=new_balance,
+        interest_amount=transaction.amount,
+        new_balance=updated.balance,
     )
 
 
 def apply_interest_all(storage: Storage) -> ApplyInterestBatchResult:
     accounts = storage.list_accounts()
     results: list[ApplyInterestResult] = []
-    total_interest = Decimal("0.00")
+    total_interest = 0
     for account in accounts:
         if account.account_type != "S":
             continue
-        interest_amount = quantize_money(account.balance * INTEREST_RATE)
-        new_balance = quantize_money(account.balance + interest_amount)
-        storage.update_account_balance(account.account_id, new_balance)
-        date, time = now_date_time()
-        transaction = Transaction(
-            transaction_id=str(uuid.uuid4()),
-            account_id=account.account_id,
-            transaction_type="I",
-            amount=interest_amount,
-            date=date,
-            time=time,
-        )
-        storage.append_transaction(transaction)
+        try:
+            updated, transaction = _post_transaction(
+                storage,
+                account.account_id,
+                "I",
+                lambda current, balance: balance + apply_rate(balance, _INTEREST_RATIO),
+            )
+        except DomainError as exc:
+            if exc.status_code == 404:
+                continue
+            raise
         results.append(
             ApplyInterestResult(
                 account_id=account.account_id,
-                interest_amount=interest_amount,
-                new_balance=new_balance,
+                interest_amount=transaction.amount,
+                new_balance=updated.balance,
             )
         )
-        total_interest += interest_amount
+        total_interest += to_cents(transaction.amount)
     return ApplyInterestBatchResult(
         applied_count=len(results),
-        total_interest=quantize_money(total_interest),
+        total_interest=from_cents(total_interest),
+        results=results,
+    )
+
+
+def combine_interest_batches(batches: list[ApplyInterestBatchResult]) -> ApplyInterestBatchResult:
+    results = [result for batch in batches for result in batch.results]
+    return ApplyInterestBatchResult(
+        applied_count=sum(batch.applied_count for batch in batches),
+        total_interest=from_cents(sum(to_cents(batch.total_interest) for batch in batches)),
         results=results,
     )
 
 
-def list_statement(storage: Storage, account_id: str) -> list[Transaction]:
-    transactions = storage.list_transactions(account_id=account_id)
-    return transactions[:STATEMENT_LIMIT]
+def dashboard_summary(storage: Storage, month: Optional[str] = None) -> SummaryResponse:
+    summary = storage.summary()
+    month = month or datetime.now().strftime("%Y/%m")
+    account_count = sum(summary.accounts_by_type.values())
+    total_balance = sum(summary.balance_by_type.values())
+    average = apply_rate(total_balance, Fraction(1, account_count)) if account_count else 0
+    return SummaryResponse(
+        account_count=account_count,
+        total_balance=from_cents(total_balance),
+        average_balance=from_cents(average),
+        accounts_by_type={
+            account_type: AccountTypeSummary(
+                count=count,
+                total_balance=from_cents(summary.balance_by_type.get(account_type, 0)),
+            )
+            for account_type, count in sorted(summary.accounts_by_type.items())
+        },
+        transaction_count=sum(summary.transactions_by_type.values()),
+        transactions_by_type={
+            transaction_type: TransactionTypeSummary(
+                count=count,
+                total_amount=from_cents(summary.amount_by_type.get(transaction_type, 0)),
+            )
+            for transaction_type, count in sorted(summary.transactions_by_type.items())
+        },
+        month=month,
+        interest_this_month=from_cents(summary.interest_by_month.get(month, 0)),
+    )
+
+
+def parse_fields(value: Optional[str], allowed: Sequence[str]) -> Optional[list[str]]:
+    # "account_id,balance" selects those columns; no value means all of them.
+    if not value:
+        return None
+    names = [name.strip() for name in value.split(",") if name.strip()]
+    unknown = [name for name in names if name not in allowed]
+    if unknown:
+        raise DomainError(f"unknown field: {', '.join(unknown)}", status_code=422)
+    return names
+
+
+def parse_sort(value: Optional[str], allowed: Sequence[str]) -> list[tuple[str, bool]]:
+    # "-balance,name" sorts by balance descending, then by name.
+    order: list[tuple[str, bool]] = []
+    for item in (value or "").split(","):
+        item = item.strip()
+        if not item:
+            continue
+        descending = item.startswith("-")
+        name = item[1:] if descending else item
+        if name not in allowed:
+            raise DomainError(f"unknown sort field: {name}", status_code=422)
+        order.append((name, descending))
+    return order
+
+
+def _sort_key(name: str) -> Callable[[Any], tuple]:
+    def key(record: Any) -> tuple:
+        value = getattr(record, name)
+        return (value is None, value if value is not None else "")
+
+    return key
 
 
-def create_transaction(storage: Storage, payload: TransactionCreate) -> Transaction:
-    account = storage.get_account(payload.account_id)
-    if not account:
+def sort_records(records: list[Record], order: Sequence[tuple[str, bool]]) -> list[Record]:
+    # Stable sorts from the last key to the first give a multi-key sort with
+    # per-key direction.
+    for name, descending in reversed(order):
+        records.sort(key=_sort_key(name), reverse=descending)
+    return records
+
+
+def find_accounts(
+    storage: Storage,
+    account_type: Optional[str] = None,
+    min_balance: Optional[Decimal] = None,
+    max_balance: Optional[Decimal] = None,
+    order: Sequence[tuple[str, bool]] = (),
+    limit: Optional[int] = None,
+) -> list[Account]:
+    accounts = storage.list_accounts(account_type, min_balance, max_balance)
+    return sort_records(accounts, order)[:limit]
+
+
+def find_transactions(
+    storage: Storage,
+    account_id: Optional[str] = None,
+    transaction_type: Optional[str] = None,
+    start: Optional[str] = None,
+    end: Optional[str] = None,
+    min_amount: Optional[Decimal] = None,
+    max_amount: Optional[Decimal] = None,
+    order: Sequence[tuple[str, bool]] = (),
+    limit: Optional[int] = None,
+) -> list[Transaction]:
+    transactions = storage.list_transactions(account_id, transaction_type, start, end)
+    if min_amount is not None or max_amount is not None:
+        transactions = [
+            txn
+            for txn in transactions
+            if (min_amount is None or txn.amount >= min_amount) and (max_amount is None or txn.amount <= max_amount)
+        ]
+    return sort_records(transactions, order)[:limit]
+
+
+def list_statement(
+    storage: Storage,
+    account_id: str,
+    limit: int = STATEMENT_LIMIT,
+    recent: bool = False,
+) -> list[Transaction]:
+    # Oldest first by date and time (ties in store order); ``recent`` returns the
+    # latest ``limit``, newest first.
+    return storage.transactions_for_account(account_id, limit=limit, newest_first=recent)
+
+
+def balance_as_of(storage: Storage, account_id: str, as_of: str) -> BalanceAsOfResponse:
+    if storage.get_account(account_id) is None:
         raise DomainError("account not found", status_code=404)
+    replay = storage.balance_as_of(account_id, as_of)
+    if replay is None:
+        raise DomainError(f"account was opened after {as_of}", status_code=404)
+    return BalanceAsOfResponse(
+        account_id=account_id,
+        as_of=as_of,
+        balance=replay.balance,
+        checkpoint=replay.checkpoint.as_of if replay.checkpoint else None,
+        replayed=replay.replayed,
+    )
 
-    date = payload.date
-    time = payload.time
-    if not date or not time:
-        date, time = now_date_time()
 
-    if payload.transaction_type == "D":
-        updated = quantize_money(account.balance + payload.amount)
-        storage.update_account_balance(account.account_id, updated)
-    elif payload.transaction_type == "W":
-        if account.balance < payload.amount:
-            raise DomainError("insufficient funds", status_code=400)
-        updated = quantize_money(account.balance - payload.amount)
-        storage.update_account_balance(account.account_id, updated)
-    elif payload.transaction_type == "I":
-        if account.account_type != "S":
-            raise DomainError("interest applies only to savings accounts", status_code=400)
-        updated = quantize_money(account.balance + payload.amount)
-        storage.update_account_balance(account.account_id, updated)
-    else:
+def create_transaction(
+    storage: Storage,
+    payload: TransactionCreate,
+    idempotency_key: Optional[str] = None,
+) -> Transaction:
+    fingerprint = f"{payload.transaction_type}:{payload.amount}:{payload.date}:{payload.time}"
+    when = (payload.date, payload.time) if payload.date and payload.time else None
+    amount_cents = to_cents(payload.amount)
+
+    def compute(account: Account, balance: Cents) -> Cents:
+        if payload.transaction_type == "D":
+            return balance + amount_cents
+        if payload.transaction_type == "W":
+            if balance < amount_cents:
+                raise DomainError("insufficient funds", status_code=400)
+            return balance - amount_cents
+        if payload.transaction_type == "I":
+            if account.account_type != "S":
+                raise DomainError("interest applies only to savings accounts", status_code=400)
+            return balance + amount_cents
         raise DomainError("invalid transaction type", status_code=400)
 
-    transaction = Transaction(
-        transaction_id=str(uuid.uuid4()),
-        account_id=payload.account_id,
-        transaction_type=payload.transaction_type,
+    _, transaction = _post_transaction(
+        storage,
+        payload.account_id,
+        payload.transaction_type,
+        compute,
         amount=payload.amount,
-        date=date,
-        time=time,
+        when=when,
+        idempotency_key=idempotency_key,
+        fingerprint=fingerprint,
     )
-    storage.append_transaction(transaction)
     return transaction
@@ -0,0 +1,317 @@
+from __future__ import annotations
+
+import argparse
+import heapq
+import json
+import os
+import sys
+import tempfile
+import zlib
+from decimal import Decimal
+from pathlib import Path
+from typing import Iterable, Iterator, Optional
+
+from .models import Account, BalanceCheckpoint, IdempotencyRecord, ScheduledTask, ScheduledTaskExecution, Transaction
+from .search import search_rank
+from .storage import SEARCH_LIMIT, BalanceReplay, Storage, StoreData, transaction_time_key
+from .summary import StoreSummary
+
+MANIFEST_NAME = "shards.json"
+META_STORE_NAME = "meta.json"
+DEFAULT_SHARD_COUNT = 4
+
+
+def shard_index(account_id: str, shard_count: int) -> int:
+    # crc32 is stable across processes and Python versions, unlike hash().
+    return zlib.crc32(account_id.encode("utf-8")) % shard_count
+
+
+def _shard_path(root: Path, generation: int, index: int) -> Path:
+    return root / f"shard-g{generation:03d}-{index:03d}.json"
+
+
+def _read_manifest(root: Path) -> Optional[dict]:
+    try:
+        return json.loads((root / MANIFEST_NAME).read_text(encoding="utf-8"))
+    except FileNotFoundError:
+        return None
+
+
+def _write_manifest(root: Path, shard_count: int, generation: int) -> None:
+    root.mkdir(parents=True, exist_ok=True)
+    with tempfile.NamedTemporaryFile("w", delete=False, dir=root, encoding="utf-8") as handle:
+        json.dump({"shard_count": shard_count, "generation": generation}, handle, sort_keys=True)
+        handle.flush()
+        os.fsync(handle.fileno())
+        temp_name = handle.name
+    os.replace(temp_name, root / MANIFEST_NAME)
+
+
+class ShardedStorage:
+    # Accounts and their transactions are spread over ``shard_count`` independent
+    # stores keyed by a hash of ``account_id``; each shard has its own file, lock
+    # and transaction log. Scheduled tasks and executions live in a separate meta
+    # store. Exposes the same methods as Storage.
+    def __init__(self, root: Path, shard_count: int = DEFAULT_SHARD_COUNT) -> None:
+        self.root = root
+        manifest = _read_manifest(root)
+        if manifest is None:
+            _write_manifest(root, shard_count, 1)
+            manifest = {"shard_count": shard_count, "generation": 1}
+        self.shard_count: int = manifest["shard_count"]
+        self.generation: int = manifest["generation"]
+        self.meta = Storage(root / META_STORE_NAME)
+        self._shards = [Storage(_shard_path(root, self.generation, index)) for index in range(self.shard_count)]
+
+    def shards(self) -> list[Storage]:
+        return list(self._shards)
+
+    def shard_for(self, account_id: str) -> Storage:
+        return self._shards[shard_index(account_id, self.shard_count)]
+
+    def change_feeds(self) -> list[Storage]:
+        # Every store file keeps its own change log and offsets.
+        return [self.meta, *self._shards]
+
+    def is_cached(self) -> bool:
+        return self.meta.is_cached() and all(shard.is_cached() for shard in self._shards)
+
+    def load(self) -> StoreData:
+        meta = self.meta.load()
+        accounts: list[Account] = []
+        transactions: list[Transaction] = []
+        idempotency: dict[tuple[str, str], IdempotencyRecord] = {}
+        checkpoints: dict[str, list[BalanceCheckpoint]] = {}
+        summary = StoreSummary()
+        for shard in self._shards:
+            data = shard.load()
+            accounts.extend(data.accounts)
+            transactions.extend(data.transactions)
+            idempotency.update(data.idempotency)
+            checkpoints.update(data.checkpoints)
+            summary.merge(data.summary)
+        return StoreData(
+            accounts=accounts,
+            transactions=transactions,
+            scheduled_tasks=meta.scheduled_tasks,
+            task_executions=meta.task_executions,
+            idempotency=idempotency,
+            summary=summary,
+            checkpoints=checkpoints,
+        )
+
+    def save(self, store: StoreData) -> None:
+        # Each shard is saved atomically on its own; there is no cross-shard commit.
+        parts = [StoreData(accounts=[], transactions=[], scheduled_tasks=[], task_executions=[]) for _ in self._shards]
+        for account in store.accounts:
+            parts[shard_index(account.account_id, self.shard_count)].accounts.append(account)
+        for txn in store.transactions:
+            parts[shard_index(txn.account_id, self.shard_count)].transactions.append(txn)
+        for scope, record in store.idempotency.items():
+            parts[shard_index(scope[0], self.shard_count)].idempotency[scope] = record
+        for account_id, items in store.checkpoints.items():
+            parts[shard_index(account_id, self.shard_count)].checkpoints[account_id] = items
+        for shard, part in zip(self._shards, parts):
+            shard.save(part)
+        self.meta.save(
+            StoreData(
+                accounts=[],
+                transactions=[],
+                scheduled_tasks=store.scheduled_tasks,
+                task_executions=store.task_executions,
+            )
+        )
+
+    def summary(self) -> StoreSummary:
+        summary = StoreSummary()
+        for shard in self._shards:
+            summary.merge(shard.summary())
+        return summary
+
+    def list_accounts(
+        self,
+        account_type: Optional[str] = None,
+        min_balance: Optional[Decimal] = None,
+        max_balance: Optional[Decimal] = None,
+    ) -> list[Account]:
+        per_shard = [shard.list_accounts(account_type, min_balance, max_balance) for shard in self._shards]
+        if account_type or min_balance is not None or max_balance is not None:
+            return list(heapq.merge(*per_shard, key=lambda account: (account.balance, account.account_id)))
+        return [account for accounts in per_shard for account in accounts]
+
+    def get_account(self, account_id: str) -> Optional[Account]:
+        return self.shard_for(account_id).get_account(account_id)
+
+    def search_accounts(self, query: str, limit: int = SEARCH_LIMIT) -> list[Account]:
+        matches = [account for shard in self._shards for account in shard.search_accounts(query, limit)]
+        needle = query.strip().lower()
+        matches.sort(key=lambda account: search_rank(needle, account.account_id.lower(), account.name.lower()))
+        return matches[:limit]
+
+    def upsert_account(self, account: Account, expected_version: Optional[int] = None) -> Account:
+        return self.shard_for(account.account_id).upsert_account(account, expected_version)
+
+    def delete_account(self, account_id: str) -> bool:
+        return self.shard_for(account_id).delete_account(account_id)
+
+    def update_account_balance(
+        self,
+        account_id: str,
+        new_balance: Decimal,
+        expected_version: Optional[int] = None,
+    ) -> Account:
+        return self.shard_for(account_id).update_account_balance(account_id, new_balance, expected_version)
+
+    def append_transaction(
+        self,
+        transaction: Transaction,
+        idempotency: Optional[IdempotencyRecord] = None,
+    ) -> Transaction:
+        return self.shard_for(transaction.account_id).append_transaction(transaction, idempotency)
+
+    def apply_transaction(
+        self,
+        transaction: Transaction,
+        new_balance: Decimal,
+        expected_version: int,
+        idempotency_key: Optional[str] = None,
+        fingerprint: str = "",
+    ) -> tuple[Account, Transaction]:
+        return self.shard_for(transaction.account_id).apply_transaction(
+            transaction, new_balance, expected_version, idempotency_key, fingerprint
+        )
+
+    def get_idempotency_record(self, account_id: str, key: str) -> Optional[IdempotencyRecord]:
+        return self.shard_for(account_id).get_idempotency_record(account_id, key)
+
+    def list_transactions(
+        self,
+        account_id: Optional[str] = None,
+        transaction_type: Optional[str] = None,
+        start: Optional[str] = None,
+        end: Optional[str] = None,
+    ) -> list[Transaction]:
+        if account_id:
+            return self.shard_for(account_id).list_transactions(account_id, transaction_type, start, end)
+        per_shard = [shard.list_transactions(None, transaction_type, start, end) for shard in self._shards]
+        if start or end:
+            return list(heapq.merge(*per_shard, key=transaction_time_key))
+        return [txn for transactions in per_shard for txn in transactions]
+
+    def transactions_for_account(
+        self,
+        account_id: str,
+        limit: Optional[int] = None,
+        newest_first: bool = False,
+    ) -> list[Transaction]:
+        return self.shard_for(account_id).transactions_for_account(account_id, limit, newest_first)
+
+    def record_checkpoints(self, as_of: Optional[str] = None) -> int:
+        return sum(shard.record_checkpoints(as_of) for shard in self._shards)
+
+    def balance_as_of(self, account_id: str, as_of: str) -> Optional[BalanceReplay]:
+        return self.shard_for(account_id).balance_as_of(account_id, as_of)
+
+    def period_activity(
+        self,
+        account_ids: Iterable[str],
+        start: str,
+        end: str,
+    ) -> Iterator[tuple[Account, BalanceReplay, list[Transaction]]]:
+        # One batch per shard, yielded back in the order asked for.
+        ordered = list(account_ids)
+        by_shard: dict[int, list[str]] = {}
+        for account_id in ordered:
+            by_shard.setdefault(shard_index(account_id, self.shard_count), []).append(account_id)
+        found = {}
+        for index, shard_ids in by_shard.items():
+            for item in self._shards[index].period_activity(shard_ids, start, end):
+                found[item[0].account_id] = item
+        for account_id in ordered:
+            if account_id in found:
+                yield found[account_id]
+
+    def list_scheduled_tasks(self) -> list[ScheduledTask]:
+        return self.meta.list_scheduled_tasks()
+
+    def get_scheduled_task(self, task_id: str) -> Optional[ScheduledTask]:
+        return self.meta.get_scheduled_task(task_id)
+
+    def upsert_scheduled_task(self, task: ScheduledTask) -> ScheduledTask:
+        return self.meta.upsert_scheduled_task(task)
+
+    def delete_scheduled_task(self, task_id: str) -> bool:
+        return self.meta.delete_scheduled_task(task_id)
+
+    def list_task_executions(self, task_id: Optional[str] = None) -> list[ScheduledTaskExecution]:
+        return self.meta.list_task_executions(task_id)
+
+    def get_task_execution(self, task_id: str, execution_id: str) -> Optional[ScheduledTaskExecution]:
+        return self.meta.get_task_execution(task_id, execution_id)
+
+    def append_task_execution(self, execution: ScheduledTaskExecution) -> ScheduledTaskExecution:
+        return self.meta.append_task_execution(execution)
+
+    def upsert_task_execution(self, execution: ScheduledTaskExecution) -> ScheduledTaskExecution:
+        return self.meta.upsert_task_execution(execution)
+
+    def prune_task_executions(self, task_id: str, keep: int = 50) -> list[ScheduledTaskExecution]:
+        return self.meta.prune_task_executions(task_id, keep)
+
+
+def rebalance(root: Path, shard_count: int, source: Optional[Path] = None) -> ShardedStorage:
+    # Offline tool: the server must be stopped. New shards are written under the
+    # next generation and only become live when the manifest is replaced, so an
+    # interrupted run leaves the previous layout intact.
+    if shard_count < 1:
+        raise ValueError("shard_count must be at least 1")
+    manifest = _read_manifest(root)
+    if source is not None:
+        data = Storage(source).load()
+    elif manifest is not None:
+        data = ShardedStorage(root).load()
+    else:
+        raise FileNotFoundError(f"no shard manifest in {root} and no source store given")
+    generation = (manifest["generation"] if manifest else 0) + 1
+    old_paths = list(root.glob("shard-g*.json"))
+
+    parts = [StoreData(accounts=[], transactions=[], scheduled_tasks=[], task_executions=[]) for _ in range(shard_count)]
+    for account in data.accounts:
+        parts[shard_index(account.account_id, shard_count)].accounts.append(account)
+    for txn in data.transactions:
+        parts[shard_index(txn.account_id, shard_count)].transactions.append(txn)
+    for scope, record in data.idempotency.items():
+        parts[shard_index(scope[0], shard_count)].idempotency[scope] = record
+    for account_id, items in data.checkpoints.items():
+        parts[shard_index(account_id, shard_count)].checkpoints[account_id] = items
+    for index, part in enumerate(parts):
+        Storage(_shard_path(root, generation, index)).save(part)
+    if source is not None:
+        Storage(root / META_STORE_NAME).save(
+            StoreData(
+                accounts=[],
+                transactions=[],
+                scheduled_tasks=data.scheduled_tasks,
+                task_executions=data.task_executions,
+            )
+        )
+    _write_manifest(root, shard_count, generation)
+    for path in old_paths:
+        path.unlink(missing_ok=True)
+    return ShardedStorage(root)
+
+
+def main(argv: Optional[list[str]] = None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m app.sharding", description="Create or rebalance a sharded store.")
+    parser.add_argument("--root", type=Path, required=True, help="sharded store directory")
+    parser.add_argument("--shards", type=int, required=True, help="target shard count")
+    parser.add_argument("--from", dest="source", type=Path, help="import from a single store.json")
+    args = parser.parse_args(argv)
+    storage = rebalance(args.root, args.shards, args.source)
+    counts = [len(shard.list_accounts()) for shard in storage.shards()]
+    print(f"{args.root}: {storage.shard_count} shards (generation {storage.generation}), accounts per shard {counts}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
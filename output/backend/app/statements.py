@@ -0,0 +1,222 @@
+from __future__ import annotations
+
+import json
+import os
+import tempfile
+import time
+from bisect import bisect_right
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from dataclasses import dataclass
+from datetime import date, datetime, timedelta
+from decimal import Decimal
+from pathlib import Path
+from typing import TYPE_CHECKING, Callable, Optional, Union
+
+from .models import TRANSACTION_SIGNS, Account, Transaction
+from .storage import Storage
+
+if TYPE_CHECKING:
+    from .sharding import ShardedStorage
+
+# Accounts rendered into one part file; also the unit of work and of resume.
+STATEMENT_CHUNK_SIZE = 1000
+STATEMENT_WORKERS = 4
+# Seconds between progress lines in the task log.
+STATEMENT_LOG_SECONDS = 5.0
+PROGRESS_NAME = "progress.json"
+
+TYPE_LABELS = {"D": "DEP ", "W": "WTH ", "I": "INT "}
+
+
+@dataclass(frozen=True)
+class StatementPeriod:
+    month: str
+    # Inclusive bounds in transaction_time_key form.
+    start: str
+    end: str
+
+    @classmethod
+    def of(cls, month: str) -> "StatementPeriod":
+        first = datetime.strptime(month, "%Y/%m").date()
+        last = (first + timedelta(days=32)).replace(day=1) - timedelta(days=1)
+        return cls(month=month, start=f"{first:%Y/%m/%d} 00:00:00", end=f"{last:%Y/%m/%d} 23:59:59")
+
+    @classmethod
+    def closed_before(cls, today: date) -> "StatementPeriod":
+        # The last full month before ``today``.
+        return cls.of(f"{today.replace(day=1) - timedelta(days=1):%Y/%m}")
+
+
+@dataclass(frozen=True)
+class StatementRun:
+    month: str
+    directory: Path
+    accounts: int
+    # Accounts already covered by an earlier, interrupted run of the same month.
+    resumed: int
+    statements: int
+    parts: int
+    seconds: float
+
+    @property
+    def accounts_per_second(self) -> float:
+        done = self.accounts - self.resumed
+        return done / self.seconds if self.seconds > 0 else float(done)
+
+
+def _money(value: Decimal) -> str:
+    return f"${value:>12,.2f}"
+
+
+def render_statement(account: Account, period: StatementPeriod, closing: Decimal, transactions: list[Transaction]) -> str:
+    # Laid out like the BANKACCT mini statement, with the month's opening and
+    # closing balances around it.
+    effect = sum(txn.amount * TRANSACTION_SIGNS.get(txn.transaction_type, 0) for txn in transactions)
+    lines = [
+        f"STATEMENT FOR ACCOUNT: {account.account_id:<10}  {account.name}",
+        f"PERIOD: {period.start[:10]} - {period.end[:10]}   TYPE: {account.account_type}",
+        f"OPENING BALANCE:             {_money(closing - effect)}",
+        "Date       | Time     | Type | Amount",
+        "-----------|----------|------|--------------",
+    ]
+    for txn in transactions:
+        label = TYPE_LABELS.get(txn.transaction_type, f"{txn.transaction_type:<4}")
+        lines.append(f"{txn.date} | {txn.time} | {label} | {_money(txn.amount)}")
+    if not transactions:
+        lines.append("No transactions this period.")
+    lines.append(f"CLOSING BALANCE:             {_money(closing)}")
+    return "\n".join(lines) + "\n\n"
+
+
+def _write_atomic(path: Path, payload: bytes, durable: bool = True) -> None:
+    with tempfile.NamedTemporaryFile("wb", delete=False, dir=path.parent) as handle:
+        handle.write(payload)
+        if durable:
+            handle.flush()
+            os.fsync(handle.fileno())
+        temp_name = handle.name
+    os.replace(temp_name, path)
+
+
+def _render_part(
+    storage: Union[Storage, "ShardedStorage"],
+    period: StatementPeriod,
+    account_ids: list[str],
+    path: Path,
+) -> int:
+    # One bulk write per part. Only this chunk's text is held, so memory stays
+    # bounded by chunk size times the number of workers. Accounts opened after
+    # the month closed get no statement.
+    chunks = [
+        render_statement(account, period, closing.balance, transactions)
+        for account, closing, transactions in storage.period_activity(account_ids, period.start, period.end)
+    ]
+    _write_atomic(path, "".join(chunks).encode("utf-8"))
+    return len(chunks)
+
+
+class _Progress:
+    # Which account id ranges are already written, kept in ``progress.json`` next to
+    # the parts. Parts are only listed once written, so a rerun skips finished
+    # ranges and discards anything a crash left half done.
+    def __init__(self, directory: Path, month: str) -> None:
+        self.path = directory / PROGRESS_NAME
+        self.month = month
+        self.parts: list[dict] = []
+        if self.path.exists():
+            data = json.loads(self.path.read_text(encoding="utf-8"))
+            if data.get("month") == month:
+                self.parts = data["parts"]
+        listed = {part["file"] for part in self.parts}
+        for stray in directory.glob("part-*.txt"):
+            if stray.name not in listed:
+                stray.unlink()
+        ranges = sorted((part["first"], part["last"]) for part in self.parts)
+        self._firsts = [first for first, _ in ranges]
+        self._lasts = [last for _, last in ranges]
+
+    def done(self, account_id: str) -> bool:
+        position = bisect_right(self._firsts, account_id)
+        return position > 0 and self._lasts[position - 1] >= account_id
+
+    def next_number(self) -> int:
+        return max((part["number"] for part in self.parts), default=-1) + 1
+
+    def add(self, number: int, name: str, account_ids: list[str], statements: int) -> None:
+        self.parts.append(
+            {
+                "number": number,
+                "file": name,
+                "first": account_ids[0],
+                "last": account_ids[-1],
+                "statements": statements,
+            }
+        )
+        # Not synced: parts are synced before they are listed, and a progress file
+        # lost in a crash only means rewriting those parts.
+        payload = json.dumps({"month": self.month, "parts": self.parts}, indent=2).encode("utf-8")
+        _write_atomic(self.path, payload, durable=False)
+
+
+def generate_statements(
+    storage: Union[Storage, "ShardedStorage"],
+    output_dir: Path,
+    period: StatementPeriod,
+    workers: int = STATEMENT_WORKERS,
+    chunk_size: int = STATEMENT_CHUNK_SIZE,
+    log: Optional[Callable[[str], None]] = None,
+) -> StatementRun:
+    # Writes every account's statement for ``period`` under output_dir/YYYY-MM as
+    # numbered part files of ``chunk_size`` accounts, in account id order. Each
+    # account's transactions come from the time index and its closing balance from
+    # the nearest checkpoint, so nothing scans the whole transaction list. Workers
+    # are threads: rendering holds the GIL, but it overlaps with the part writes
+    # and fsyncs, and handing records to processes costs more than rendering them.
+    directory = output_dir / period.month.replace("/", "-")
+    directory.mkdir(parents=True, exist_ok=True)
+    progress = _Progress(directory, period.month)
+    account_ids = sorted(account.account_id for account in storage.list_accounts())
+    pending = [account_id for account_id in account_ids if not progress.done(account_id)]
+    resumed = len(account_ids) - len(pending)
+    if resumed and log:
+        log(f"Resuming {period.month}: {resumed} accounts already done.")
+
+    started = time.perf_counter()
+    last_report = started
+    written = statements = 0
+    number = progress.next_number()
+    chunks = (pending[offset : offset + chunk_size] for offset in range(0, len(pending), chunk_size))
+    in_flight: dict[Future, tuple[int, str, list[str]]] = {}
+    with ThreadPoolExecutor(max_workers=max(workers, 1), thread_name_prefix="statements") as pool:
+        while True:
+            # At most two chunks per worker are queued, so pending text never piles up.
+            while len(in_flight) < 2 * max(workers, 1):
+                chunk = next(chunks, None)
+                if chunk is None:
+                    break
+                name = f"part-{number:05d}.txt"
+                in_flight[pool.submit(_render_part, storage, period, chunk, directory / name)] = (number, name, chunk)
+                number += 1
+            if not in_flight:
+                break
+            finished, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+            for future in finished:
+                part_number, name, chunk = in_flight.pop(future)
+                count = future.result()
+                progress.add(part_number, name, chunk, count)
+                written += len(chunk)
+                statements += count
+            now = time.perf_counter()
+            if log and now - last_report >= STATEMENT_LOG_SECONDS:
+                last_report = now
+                log(f"{resumed + written}/{len(account_ids)} accounts, {written / (now - started):.0f} accounts/sec")
+
+    return StatementRun(
+        month=period.month,
+        directory=directory,
+        accounts=len(account_ids),
+        resumed=resumed,
+        statements=statements,
+        parts=len(progress.parts),
+        seconds=time.perf_counter() - started,
+    )
@@ -2,34 +2,216 @@ from __future__ import annotations
 
 import json
 import os
+from bisect import bisect_left, bisect_right, insort
 import tempfile
+import threading
 import time
-from dataclasses import dataclass
+from contextlib import contextmanager
+from dataclasses import dataclass, field
 from decimal import Decimal
 from pathlib import Path
-from typing import Iterable, Optional
+from typing import Iterable, Iterator, Optional
 
+from pydantic import BaseModel
+
+from .instrumentation import record_bytes, timed
 from .models import (
+    TRANSACTION_SIGNS,
     Account,
+    BalanceCheckpoint,
+    ChangeEvent,
+    IdempotencyRecord,
     ScheduledTask,
     ScheduledTaskExecution,
     Transaction,
     quantize_money,
 )
+from .search import SearchIndex
+from .summary import StoreSummary
 
 SCHEMA_VERSION = 1
+IDEMPOTENCY_TTL_SECONDS = 24 * 60 * 60
+IDEMPOTENCY_MAX_KEYS = 10_000
+CHANGE_LOG_LIMIT = 256
+SEARCH_LIMIT = 20
 
 
 class LockTimeoutError(RuntimeError):
     pass
 
 
+class VersionConflictError(RuntimeError):
+    def __init__(self, account_id: str, expected: int, actual: Optional[int]) -> None:
+        super().__init__(f"account {account_id} is at version {actual}, expected {expected}")
+        self.account_id = account_id
+        self.expected = expected
+        self.actual = actual
+
+
+class IdempotencyKeyReusedError(RuntimeError):
+    def __init__(self, account_id: str, key: str) -> None:
+        super().__init__(f"idempotency key {key} was already used on account {account_id} for a different request")
+        self.account_id = account_id
+        self.key = key
+
+
+def transaction_time_key(txn: Transaction) -> str:
+    # "YYYY/MM/DD HH:MM:SS" sorts lexicographically in time order.
+    return f"{txn.date or ''} {txn.time or ''}"
+
+
+def _now_key() -> str:
+    return time.strftime("%Y/%m/%d %H:%M:%S")
+
+
+def _checkpoint_time(checkpoint: BalanceCheckpoint) -> str:
+    return checkpoint.as_of
+
+
+def _balance_effect(transactions: Iterable[Transaction]) -> Decimal:
+    return sum((txn.amount * TRANSACTION_SIGNS.get(txn.transaction_type, 0) for txn in transactions), Decimal("0"))
+
+
+@dataclass(frozen=True)
+class TransactionIndex:
+    # Transactions sorted by date and time, overall and per account. Equal times
+    # keep append order. Never mutated: adding a transaction returns a new index
+    # that shares the untouched per-account lists.
+    ordered: list[Transaction]
+    by_account: dict[str, list[Transaction]]
+
+    @classmethod
+    def build(cls, transactions: Iterable[Transaction]) -> "TransactionIndex":
+        ordered = sorted(transactions, key=transaction_time_key)
+        by_account: dict[str, list[Transaction]] = {}
+        for txn in ordered:
+            by_account.setdefault(txn.account_id, []).append(txn)
+        return cls(ordered=ordered, by_account=by_account)
+
+    def with_transaction(self, txn: Transaction) -> "TransactionIndex":
+        ordered = list(self.ordered)
+        insort(ordered, txn, key=transaction_time_key)
+        account = list(self.by_account.get(txn.account_id, []))
+        insort(account, txn, key=transaction_time_key)
+        return TransactionIndex(ordered=ordered, by_account={**self.by_account, txn.account_id: account})
+
+    def between(self, start: Optional[str], end: Optional[str], account_id: Optional[str] = None) -> list[Transaction]:
+        # Inclusive bounds in transaction_time_key form; either may be omitted.
+        items = self.by_account.get(account_id, []) if account_id else self.ordered
+        low = bisect_left(items, start, key=transaction_time_key) if start else 0
+        high = bisect_right(items, end, key=transaction_time_key) if end else len(items)
+        return items[low:high]
+
+
+def _balance_key(account: Account) -> tuple[Decimal, str]:
+    return (account.balance, account.account_id)
+
+
+def _balance_only(account: Account) -> Decimal:
+    return account.balance
+
+
+def _replace_sorted(items: list[Account], old: Optional[Account], new: Optional[Account]) -> list[Account]:
+    items = list(items)
+    if old is not None:
+        position = bisect_left(items, _balance_key(old), key=_balance_key)
+        if position < len(items) and items[position].account_id == old.account_id:
+            del items[position]
+    if new is not None:
+        insort(items, new, key=_balance_key)
+    return items
+
+
+@dataclass(frozen=True)
+class AccountIndex:
+    # Accounts sorted by balance (then id), overall and per account type. Like
+    # TransactionIndex, each account write returns a new index.
+    ordered: list[Account]
+    by_type: dict[str, list[Account]]
+
+    @classmethod
+    def build(cls, accounts: Iterable[Account]) -> "AccountIndex":
+        ordered = sorted(accounts, key=_balance_key)
+        by_type: dict[str, list[Account]] = {}
+        for account in ordered:
+            by_type.setdefault(account.account_type, []).append(account)
+        return cls(ordered=ordered, by_type=by_type)
+
+    def with_account(self, old: Optional[Account], new: Optional[Account]) -> "AccountIndex":
+        by_type = dict(self.by_type)
+        for account_type in {account.account_type for account in (old, new) if account is not None}:
+            by_type[account_type] = _replace_sorted(
+                by_type.get(account_type, []),
+                old if old is not None and old.account_type == account_type else None,
+                new if new is not None and new.account_type == account_type else None,
+            )
+        return AccountIndex(ordered=_replace_sorted(self.ordered, old, new), by_type=by_type)
+
+    def between(
+        self,
+        min_balance: Optional[Decimal],
+        max_balance: Optional[Decimal],
+        account_type: Optional[str] = None,
+    ) -> list[Account]:
+        items = self.by_type.get(account_type, []) if account_type else self.ordered
+        low = bisect_left(items, min_balance, key=_balance_only) if min_balance is not None else 0
+        high = bisect_right(items, max_balance, key=_balance_only) if max_balance is not None else len(items)
+        return items[low:high]
+
+
+@dataclass(frozen=True)
+class BalanceReplay:
+    balance: Decimal
+    # The checkpoint replayed from; None when worked back from the current balance.
+    checkpoint: Optional[BalanceCheckpoint]
+    replayed: int
+
+
 @dataclass
 class StoreData:
     accounts: list[Account]
     transactions: list[Transaction]
     scheduled_tasks: list[ScheduledTask]
     task_executions: list[ScheduledTaskExecution]
+    # Keyed by (account_id, key), oldest first.
+    idempotency: dict[tuple[str, str], IdempotencyRecord] = field(default_factory=dict)
+    summary: StoreSummary = field(default_factory=StoreSummary)
+    # The most recent mutations, oldest first; offsets keep counting past trimmed entries.
+    changes: list[ChangeEvent] = field(default_factory=list)
+    next_change_offset: int = 1
+    # account_id -> balance checkpoints, oldest first. Lists are replaced, never edited.
+    checkpoints: dict[str, list[BalanceCheckpoint]] = field(default_factory=dict)
+    # Derived from ``transactions`` on first use and carried forward by appends; not saved.
+    index: Optional[TransactionIndex] = None
+    account_index: Optional[AccountIndex] = None
+    search_index: Optional[SearchIndex] = None
+    # account_id -> position in ``accounts``.
+    account_positions: Optional[dict[str, int]] = None
+
+    def copy(self) -> "StoreData":
+        return StoreData(
+            accounts=list(self.accounts),
+            transactions=list(self.transactions),
+            scheduled_tasks=list(self.scheduled_tasks),
+            task_executions=list(self.task_executions),
+            idempotency=dict(self.idempotency),
+            summary=self.summary.copy(),
+            changes=list(self.changes),
+            next_change_offset=self.next_change_offset,
+            checkpoints=dict(self.checkpoints),
+            index=self.index,
+            account_index=self.account_index,
+            search_index=self.search_index,
+            account_positions=self.account_positions,
+        )
+
+
+FileStamp = tuple[int, int, int]
+
+
+def _stamp(fd: int) -> FileStamp:
+    stat = os.fstat(fd)
+    return (stat.st_ino, stat.st_size, stat.st_mtime_ns)
 
 
 class FileLock:
@@ -40,14 +222,15 @@ class FileLock:
 
     def __enter__(self) -> "FileLock":
         start = time.time()
-        while True:
-            try:
-                self._fd = os.open(self.lock_path, os.O_CREAT | os.O_EXCL | os.O_RDWR)
-                return self
-            except FileExistsError:
-                if time.time() - start > self.timeout_seconds:
-                    raise LockTimeoutError(f"Timed out waiting for lock {self.lock_path}")
-                time.sleep(0.05)
+        with timed("lock_wait"):
+            while True:
+                try:
+                    self._fd = os.open(self.lock_path, os.O_CREAT | os.O_EXCL | os.O_RDWR)
+                    return self
+                except FileExistsError:
+                    if time.time() - start > self.timeout_seconds:
+                        raise LockTimeoutError(f"Timed out waiting for lock {self.lock_path}")
+                    time.sleep(0.05)
 
     def __exit__(self, exc_type, exc, tb) -> None:
         if self._fd is not None:
@@ -66,6 +249,14 @@ class Storage:
     def __init__(self, path: Path) -> None:
         self.path = path
         self.lock_path = path.with_suffix(path.suffix + ".lock")
+        # The last loaded or saved store, keyed by the file identity it matches.
+        # Writers replace the file atomically, so a changed inode, size or mtime
+        # means someone else (possibly another process) has written since.
+        self._cache: Optional[tuple[FileStamp, StoreData]] = None
+        self._cache_lock = threading.Lock()
+        self._held = threading.local()
+        self.idempotency_ttl_seconds = IDEMPOTENCY_TTL_SECONDS
+        self.idempotency_max_keys = IDEMPOTENCY_MAX_KEYS
         if not self.path.exists():
             self._write_raw(
                 {
@@ -77,19 +268,69 @@ class Storage:
                 }
             )
 
-    def _read_raw(self) -> dict:
-        with self.path.open("r", encoding="utf-8") as handle:
-            return json.load(handle)
+    def _read_raw(self) -> tuple[FileStamp, dict]:
+        with timed("json_load"):
+            with self.path.open("rb") as handle:
+                stamp = _stamp(handle.fileno())
+                payload = handle.read()
+            record_bytes(read=len(payload))
+            return stamp, json.loads(payload)
+
+    def _current_stamp(self) -> Optional[FileStamp]:
+        try:
+            stat = self.path.stat()
+        except FileNotFoundError:
+            return None
+        return (stat.st_ino, stat.st_size, stat.st_mtime_ns)
+
+    def is_cached(self) -> bool:
+        cached = self._cache
+        return cached is not None and cached[0] == self._current_stamp()
+
+    def shards(self) -> list["Storage"]:
+        return [self]
+
+    def shard_for(self, account_id: str) -> "Storage":
+        return self
+
+    def change_feeds(self) -> list["Storage"]:
+        return [self]
+
+    @contextmanager
+    def _exclusive(self) -> Iterator[None]:
+        # Re-entrant per thread: a mutation holds the file lock across its load,
+        # checks and save, and the save inside it must not try to take it again.
+        depth = getattr(self._held, "depth", 0)
+        if depth:
+            self._held.depth = depth + 1
+            try:
+                yield
+            finally:
+                self._held.depth -= 1
+            return
+        with FileLock(self.lock_path):
+            self._held.depth = 1
+            try:
+                yield
+            finally:
+                self._held.depth = 0
 
-    def _write_raw(self, data: dict) -> None:
+    def _write_raw(self, data: dict) -> FileStamp:
         self.path.parent.mkdir(parents=True, exist_ok=True)
-        with FileLock(self.lock_path):
-            with tempfile.NamedTemporaryFile("w", delete=False, dir=self.path.parent, encoding="utf-8") as handle:
-                json.dump(data, handle, indent=2, sort_keys=True)
-                handle.flush()
-                os.fsync(handle.fileno())
+        with timed("json_dump"):
+            payload = json.dumps(data, indent=2, sort_keys=True).encode("utf-8")
+        with self._exclusive():
+            with tempfile.NamedTemporaryFile("wb", delete=False, dir=self.path.parent) as handle:
+                with timed("write"):
+                    handle.write(payload)
+                    handle.flush()
+                with timed("fsync"):
+                    os.fsync(handle.fileno())
+                stamp = _stamp(handle.fileno())
                 temp_name = handle.name
             os.replace(temp_name, self.path)
+        record_bytes(written=len(payload))
+        return stamp
 
     def _deserialize(self, raw: dict) -> StoreData:
         accounts = [Account(
@@ -97,6 +338,7 @@ class Storage:
             name=item["name"],
             balance=_decimal_from_store(item["balance"]),
             account_type=item["account_type"],
+            version=item.get("version", 0),
         ) for item in raw.get("accounts", [])]
         transactions = [Transaction(
             transaction_id=item["transaction_id"],
@@ -125,16 +367,47 @@ class Storage:
                 task_id=item["task_id"],
                 status=item["status"],
                 started_at=item["started_at"],
-                finished_at=item["finished_at"],
+                finished_at=item.get("finished_at"),
                 log_path=item["log_path"],
+                trigger=item.get("trigger"),
+                scheduled_at=item.get("scheduled_at"),
+                fire_lag_ms=item.get("fire_lag_ms"),
+                queue_wait_ms=item.get("queue_wait_ms"),
+                duration_ms=item.get("duration_ms"),
             )
             for item in raw.get("task_executions", [])
         ]
+        idempotency = {}
+        for item in raw.get("idempotency", []):
+            record = IdempotencyRecord.model_validate(item)
+            idempotency[(record.account.account_id, record.key)] = record
+        checkpoints = {
+            account_id: [
+                BalanceCheckpoint(
+                    as_of=item["as_of"],
+                    balance=_decimal_from_store(item["balance"]),
+                    transactions=item["transactions"],
+                    adjusted=item.get("adjusted", False),
+                )
+                for item in items
+            ]
+            for account_id, items in raw.get("checkpoints", {}).items()
+        }
+        if "summary" in raw:
+            summary = StoreSummary.from_dict(raw["summary"])
+        else:
+            # Stores written before the summary existed get it built once here.
+            summary = StoreSummary.build(accounts, transactions)
         return StoreData(
             accounts=accounts,
             transactions=transactions,
             scheduled_tasks=scheduled_tasks,
             task_executions=task_executions,
+            idempotency=idempotency,
+            summary=summary,
+            changes=[ChangeEvent.model_validate(item) for item in raw.get("changes", [])],
+            next_change_offset=raw.get("next_change_offset", 1),
+            checkpoints=checkpoints,
         )
 
     def _serialize(self, store: StoreData) -> dict:
@@ -146,6 +419,7 @@ class Storage:
                     "name": account.name,
                     "balance": str(account.balance),
                     "account_type": account.account_type,
+                    "version": account.version,
                 }
                 for account in store.accounts
             ],
@@ -181,141 +455,546 @@ class Storage:
                     "started_at": execution.started_at,
                     "finished_at": execution.finished_at,
                     "log_path": execution.log_path,
+                    "trigger": execution.trigger,
+                    "scheduled_at": execution.scheduled_at,
+                    "fire_lag_ms": execution.fire_lag_ms,
+                    "queue_wait_ms": execution.queue_wait_ms,
+                    "duration_ms": execution.duration_ms,
                 }
                 for execution in store.task_executions
             ],
+            "idempotency": [record.model_dump(mode="json") for record in store.idempotency.values()],
+            "summary": store.summary.to_dict(),
+            "changes": [change.model_dump(mode="json") for change in store.changes],
+            "next_change_offset": store.next_change_offset,
+            "checkpoints": {
+                account_id: [
+                    {
+                        "as_of": checkpoint.as_of,
+                        "balance": str(checkpoint.balance),
+                        "transactions": checkpoint.transactions,
+                        "adjusted": checkpoint.adjusted,
+                    }
+                    for checkpoint in items
+                ]
+                for account_id, items in store.checkpoints.items()
+            },
         }
 
+    def _snapshot(self) -> StoreData:
+        # Shared, read-only view of the store; callers that modify it must use load().
+        cached = self._cache
+        if cached is not None and cached[0] == self._current_stamp():
+            return cached[1]
+        stamp, raw = self._read_raw()
+        with timed("deserialize"):
+            store = self._deserialize(raw)
+        with self._cache_lock:
+            self._cache = (stamp, store)
+        return store
+
     def load(self) -> StoreData:
-        raw = self._read_raw()
-        return self._deserialize(raw)
+        return self._snapshot().copy()
 
     def save(self, store: StoreData) -> None:
-        self._write_raw(self._serialize(store))
-
-    def list_accounts(self) -> list[Account]:
-        return list(self.load().accounts)
+        # Callers saving a whole store may have edited the lists directly, so the
+        # summary is rebuilt; the mutation methods below keep it current instead.
+        store.summary = StoreSummary.build(store.accounts, store.transactions)
+        store.index = None
+        store.account_index = None
+        store.search_index = None
+        store.account_positions = None
+        self._record_change(store, "store", "reset", str(self.path.name))
+        self._commit(store)
+
+    def _record_change(
+        self,
+        store: StoreData,
+        entity: str,
+        op: str,
+        key: str,
+        data: Optional[BaseModel] = None,
+    ) -> None:
+        store.changes.append(
+            ChangeEvent(
+                offset=store.next_change_offset,
+                entity=entity,
+                op=op,
+                key=key,
+                data=data.model_dump(mode="json") if data is not None else None,
+            )
+        )
+        store.next_change_offset += 1
+        if len(store.changes) > CHANGE_LOG_LIMIT:
+            del store.changes[: len(store.changes) - CHANGE_LOG_LIMIT]
+
+    def change_offset(self) -> int:
+        # Offset of the latest change; a feed read from here returns only newer ones.
+        return self._snapshot().next_change_offset - 1
+
+    def changes_since(self, offset: int) -> tuple[list[ChangeEvent], bool]:
+        # Changes after ``offset`` and whether they are complete; False means some
+        # were already trimmed and the reader has to start over from a full fetch.
+        store = self._snapshot()
+        if offset >= store.next_change_offset - 1:
+            return [], offset < store.next_change_offset
+        first = store.changes[0].offset if store.changes else store.next_change_offset
+        start = max(offset + 1 - first, 0)
+        return store.changes[start:], offset + 1 >= first
+
+    def _commit(self, store: StoreData) -> None:
+        with timed("serialize"):
+            raw = self._serialize(store)
+        stamp = self._write_raw(raw)
+        with self._cache_lock:
+            self._cache = (stamp, store.copy())
+
+    def summary(self) -> StoreSummary:
+        return self._snapshot().summary
+
+    def _account_index(self) -> AccountIndex:
+        store = self._snapshot()
+        if store.account_index is None:
+            store.account_index = AccountIndex.build(store.accounts)
+        return store.account_index
+
+    def list_accounts(
+        self,
+        account_type: Optional[str] = None,
+        min_balance: Optional[Decimal] = None,
+        max_balance: Optional[Decimal] = None,
+    ) -> list[Account]:
+        # Unfiltered listings keep the store order; filtered ones come in balance order.
+        if account_type or min_balance is not None or max_balance is not None:
+            return list(self._account_index().between(min_balance, max_balance, account_type))
+        return list(self._snapshot().accounts)
+
+    @staticmethod
+    def _account_in(store: StoreData, account_id: str) -> Optional[Account]:
+        if store.account_positions is None:
+            store.account_positions = {account.account_id: idx for idx, account in enumerate(store.accounts)}
+        position = store.account_positions.get(account_id)
+        return store.accounts[position] if position is not None else None
 
     def get_account(self, account_id: str) -> Optional[Account]:
-        for account in self.load().accounts:
-            if account.account_id == account_id:
-                return account
-        return None
-
-    def upsert_account(self, account: Account) -> Account:
-        store = self.load()
-        updated = False
-        for idx, existing in enumerate(store.accounts):
-            if existing.account_id == account.account_id:
-                store.accounts[idx] = account
-                updated = True
-                break
-        if not updated:
-            store.accounts.append(account)
-        self.save(store)
-        return account
+        return self._account_in(self._snapshot(), account_id)
+
+    def search_accounts(self, query: str, limit: int = SEARCH_LIMIT) -> list[Account]:
+        # Ranked matches on account id and name; see SearchIndex.search.
+        store = self._snapshot()
+        if store.search_index is None:
+            store.search_index = SearchIndex.build(store.accounts)
+        return [self._account_in(store, account_id) for account_id in store.search_index.search(query, limit)]
+
+    def upsert_account(self, account: Account, expected_version: Optional[int] = None) -> Account:
+        with self._exclusive():
+            store = self.load()
+            for idx, existing in enumerate(store.accounts):
+                if existing.account_id == account.account_id:
+                    if expected_version is not None and existing.version != expected_version:
+                        raise VersionConflictError(account.account_id, expected_version, existing.version)
+                    stored = account.model_copy(update={"version": existing.version + 1})
+                    store.accounts[idx] = stored
+                    store.summary.replace_account(existing, stored)
+                    if stored.balance != existing.balance:
+                        self._checkpoint_adjustment(store, existing, stored)
+                    break
+            else:
+                if expected_version is not None:
+                    raise VersionConflictError(account.account_id, expected_version, None)
+                existing = None
+                stored = account.model_copy(update={"version": 1})
+                store.accounts.append(stored)
+                store.summary.add_account(stored)
+                self._checkpoint_adjustment(store, None, stored)
+                if store.account_positions is not None:
+                    store.account_positions = {**store.account_positions, stored.account_id: len(store.accounts) - 1}
+            if store.account_index is not None:
+                store.account_index = store.account_index.with_account(existing, stored)
+            if store.search_index is not None:
+                store.search_index = store.search_index.with_account(existing, stored)
+            self._record_change(store, "account", "upsert", stored.account_id, stored)
+            self._commit(store)
+        return stored
 
     def delete_account(self, account_id: str) -> bool:
-        store = self.load()
-        before = len(store.accounts)
-        store.accounts = [acct for acct in store.accounts if acct.account_id != account_id]
-        if len(store.accounts) == before:
-            return False
-        self.save(store)
+        with self._exclusive():
+            store = self.load()
+            removed = [acct for acct in store.accounts if acct.account_id == account_id]
+            if not removed:
+                return False
+            store.accounts = [acct for acct in store.accounts if acct.account_id != account_id]
+            # Rebuilt here on the writer so the next inline get_account stays a lookup.
+            store.account_positions = {account.account_id: idx for idx, account in enumerate(store.accounts)}
+            store.checkpoints.pop(account_id, None)
+            for account in removed:
+                store.summary.remove_account(account)
+                if store.account_index is not None:
+                    store.account_index = store.account_index.with_account(account, None)
+                if store.search_index is not None:
+                    store.search_index = store.search_index.with_account(account, None)
+            self._record_change(store, "account", "delete", account_id)
+            self._commit(store)
         return True
 
-    def update_account_balance(self, account_id: str, new_balance: Decimal) -> Account:
-        store = self.load()
-        for idx, account in enumerate(store.accounts):
-            if account.account_id == account_id:
-                updated = Account(
-                    account_id=account.account_id,
-                    name=account.name,
-                    balance=quantize_money(new_balance),
-                    account_type=account.account_type,
-                )
-                store.accounts[idx] = updated
-                self.save(store)
-                return updated
+    def _set_balance(self, store: StoreData, position: int, new_balance: Decimal) -> Account:
+        account = store.accounts[position]
+        updated = Account(
+            account_id=account.account_id,
+            name=account.name,
+            balance=quantize_money(new_balance),
+            account_type=account.account_type,
+            version=account.version + 1,
+        )
+        store.accounts[position] = updated
+        store.summary.replace_account(account, updated)
+        if store.account_index is not None:
+            store.account_index = store.account_index.with_account(account, updated)
+        self._record_change(store, "account", "upsert", account.account_id, updated)
+        return updated
+
+    def update_account_balance(
+        self,
+        account_id: str,
+        new_balance: Decimal,
+        expected_version: Optional[int] = None,
+    ) -> Account:
+        with self._exclusive():
+            store = self.load()
+            for idx, account in enumerate(store.accounts):
+                if account.account_id == account_id:
+                    if expected_version is not None and account.version != expected_version:
+                        raise VersionConflictError(account_id, expected_version, account.version)
+                    updated = self._set_balance(store, idx, new_balance)
+                    self._commit(store)
+                    return updated
         raise KeyError(account_id)
 
-    def append_transaction(self, transaction: Transaction) -> Transaction:
-        store = self.load()
+    def _add_transaction(
+        self,
+        store: StoreData,
+        transaction: Transaction,
+        idempotency: Optional[IdempotencyRecord] = None,
+    ) -> None:
+        self._checkpoint_backdated(store, transaction)
         store.transactions.append(transaction)
-        self.save(store)
+        if store.index is not None:
+            store.index = store.index.with_transaction(transaction)
+        store.summary.add_transaction(transaction)
+        self._record_change(store, "transaction", "upsert", transaction.transaction_id, transaction)
+        if idempotency is not None:
+            store.idempotency[(transaction.account_id, idempotency.key)] = idempotency
+            self._evict_idempotency(store.idempotency, idempotency.created_at)
+
+    def append_transaction(
+        self,
+        transaction: Transaction,
+        idempotency: Optional[IdempotencyRecord] = None,
+    ) -> Transaction:
+        # The idempotency record is saved in the same write as the transaction, so a
+        # retry can only ever see both or neither.
+        with self._exclusive():
+            store = self.load()
+            self._add_transaction(store, transaction, idempotency)
+            self._commit(store)
         return transaction
 
+    def apply_transaction(
+        self,
+        transaction: Transaction,
+        new_balance: Decimal,
+        expected_version: int,
+        idempotency_key: Optional[str] = None,
+        fingerprint: str = "",
+    ) -> tuple[Account, Transaction]:
+        # Compare-and-swaps the balance, appends the transaction that moved it and
+        # keeps the idempotency record, all in one write. Nothing (a crash, a retry,
+        # a checkpoint run in another process) can see the new balance without its
+        # transaction. Returns the updated account and the posted transaction, or
+        # what the key already posted: the key is checked under the same lock, so
+        # concurrent retries with one key post once.
+        with self._exclusive():
+            store = self.load()
+            if idempotency_key is not None:
+                recorded = self._idempotency_in(store, transaction.account_id, idempotency_key)
+                if recorded is not None:
+                    if recorded.fingerprint != fingerprint:
+                        raise IdempotencyKeyReusedError(transaction.account_id, idempotency_key)
+                    return recorded.account, recorded.transaction
+            account = self._account_in(store, transaction.account_id)
+            if account is None:
+                raise KeyError(transaction.account_id)
+            if account.version != expected_version:
+                raise VersionConflictError(account.account_id, expected_version, account.version)
+            updated = self._set_balance(store, store.account_positions[account.account_id], new_balance)
+            idempotency = None
+            if idempotency_key is not None:
+                idempotency = IdempotencyRecord(
+                    key=idempotency_key,
+                    fingerprint=fingerprint,
+                    created_at=time.time(),
+                    account=updated,
+                    transaction=transaction,
+                )
+            self._add_transaction(store, transaction, idempotency)
+            self._commit(store)
+        return updated, transaction
+
+    def _checkpoint(self, store: StoreData, account: Account, as_of: str, adjusted: bool = False) -> BalanceCheckpoint:
+        # A checkpoint includes exactly the account's transactions dated up to
+        # ``as_of``: the first ``transactions`` of them in time order.
+        history = self._indexed(store).by_account.get(account.account_id, [])
+        included = bisect_right(history, as_of, key=transaction_time_key)
+        return BalanceCheckpoint(
+            as_of=as_of,
+            balance=account.balance - _balance_effect(history[included:]),
+            transactions=included,
+            adjusted=adjusted,
+        )
+
+    def _checkpoint_adjustment(self, store: StoreData, old: Optional[Account], new: Account) -> None:
+        # A balance written directly has no transaction to replay, so it is pinned
+        # here. The first edit of an account also keeps the balance it replaced.
+        now = _now_key()
+        checkpoints = store.checkpoints.get(new.account_id, [])
+        if old is not None and not checkpoints:
+            checkpoints = [self._checkpoint(store, old, now)]
+        store.checkpoints[new.account_id] = [*checkpoints, self._checkpoint(store, new, now, adjusted=True)]
+
+    def _checkpoint_backdated(self, store: StoreData, transaction: Transaction) -> None:
+        # A posting dated at or before a checkpoint belongs in it.
+        checkpoints = store.checkpoints.get(transaction.account_id)
+        if not checkpoints:
+            return
+        first = bisect_left(checkpoints, transaction_time_key(transaction), key=_checkpoint_time)
+        if first == len(checkpoints):
+            return
+        effect = _balance_effect([transaction])
+        store.checkpoints[transaction.account_id] = checkpoints[:first] + [
+            checkpoint.model_copy(
+                update={"balance": checkpoint.balance + effect, "transactions": checkpoint.transactions + 1}
+            )
+            for checkpoint in checkpoints[first:]
+        ]
+
+    def record_checkpoints(self, as_of: Optional[str] = None) -> int:
+        # Checkpoints every account whose balance or history moved since its last
+        # one, in a single write; returns how many were added.
+        as_of = as_of or _now_key()
+        with self._exclusive():
+            store = self.load()
+            added = 0
+            for account in store.accounts:
+                checkpoints = store.checkpoints.get(account.account_id, [])
+                # Checkpoints are only ever appended.
+                if checkpoints and checkpoints[-1].as_of > as_of:
+                    continue
+                checkpoint = self._checkpoint(store, account, as_of)
+                if checkpoints and (checkpoints[-1].balance, checkpoints[-1].transactions) == (
+                    checkpoint.balance,
+                    checkpoint.transactions,
+                ):
+                    continue
+                store.checkpoints[account.account_id] = [*checkpoints, checkpoint]
+                added += 1
+            if added:
+                self._commit(store)
+        return added
+
+    def balance_as_of(self, account_id: str, as_of: str) -> Optional[BalanceReplay]:
+        # The balance after every transaction dated up to and including ``as_of``.
+        # Both lookups are binary searches: the latest checkpoint at or before
+        # ``as_of`` (else the earliest one), then ``as_of`` in the account's
+        # time-ordered transactions; only those in between are replayed. None when
+        # the account is unknown or was opened later with nothing posted by then.
+        store = self._snapshot()
+        account = self._account_in(store, account_id)
+        if account is None:
+            return None
+        return self._replay(store, account, as_of)
+
+    def _replay(self, store: StoreData, account: Account, as_of: str) -> Optional[BalanceReplay]:
+        history = self._indexed(store).by_account.get(account.account_id, [])
+        position = bisect_right(history, as_of, key=transaction_time_key)
+        checkpoints = store.checkpoints.get(account.account_id, [])
+        found = bisect_right(checkpoints, as_of, key=_checkpoint_time)
+        checkpoint: Optional[BalanceCheckpoint] = None
+        if found:
+            checkpoint = checkpoints[found - 1]
+        elif checkpoints:
+            checkpoint = checkpoints[0]
+            if checkpoint.adjusted and position == 0:
+                return None
+        if checkpoint is not None:
+            balance, included = checkpoint.balance, checkpoint.transactions
+        else:
+            balance, included = account.balance, len(history)
+        if position >= included:
+            balance += _balance_effect(history[included:position])
+        else:
+            balance -= _balance_effect(history[position:included])
+        return BalanceReplay(
+            balance=quantize_money(balance),
+            checkpoint=checkpoint,
+            replayed=abs(position - included),
+        )
+
+    def period_activity(
+        self,
+        account_ids: Iterable[str],
+        start: str,
+        end: str,
+    ) -> Iterator[tuple[Account, BalanceReplay, list[Transaction]]]:
+        # Each account that existed by ``end``, with its balance as of ``end`` and
+        # its transactions from ``start`` to ``end``, all read from one snapshot.
+        # Batch jobs use this instead of a balance_as_of and list_transactions pair
+        # per account.
+        store = self._snapshot()
+        index = self._indexed(store)
+        for account_id in account_ids:
+            account = self._account_in(store, account_id)
+            replay = self._replay(store, account, end) if account is not None else None
+            if replay is not None:
+                yield account, replay, index.between(start, end, account_id)
+
+    def _evict_idempotency(self, records: dict[tuple[str, str], IdempotencyRecord], now: float) -> None:
+        cutoff = now - self.idempotency_ttl_seconds
+        while records:
+            oldest_key = next(iter(records))
+            if len(records) <= self.idempotency_max_keys and records[oldest_key].created_at >= cutoff:
+                break
+            del records[oldest_key]
+
+    def _idempotency_in(self, store: StoreData, account_id: str, key: str) -> Optional[IdempotencyRecord]:
+        record = store.idempotency.get((account_id, key))
+        if record is None or record.created_at < time.time() - self.idempotency_ttl_seconds:
+            return None
+        return record
+
+    def get_idempotency_record(self, account_id: str, key: str) -> Optional[IdempotencyRecord]:
+        return self._idempotency_in(self._snapshot(), account_id, key)
+
+    @staticmethod
+    def _indexed(store: StoreData) -> TransactionIndex:
+        if store.index is None:
+            store.index = TransactionIndex.build(store.transactions)
+        return store.index
+
+    def _index(self) -> TransactionIndex:
+        return self._indexed(self._snapshot())
+
     def list_transactions(
         self,
         account_id: Optional[str] = None,
         transaction_type: Optional[str] = None,
+        start: Optional[str] = None,
+        end: Optional[str] = None,
     ) -> list[Transaction]:
-        transactions = self.load().transactions
-        results: Iterable[Transaction] = transactions
-        if account_id:
-            results = [txn for txn in results if txn.account_id == account_id]
+        # Without a range the store order is kept; with one, results are in time order.
+        if start or end:
+            results: Iterable[Transaction] = self._index().between(start, end, account_id)
+        else:
+            results = self._snapshot().transactions
+            if account_id:
+                results = [txn for txn in results if txn.account_id == account_id]
         if transaction_type:
             results = [txn for txn in results if txn.transaction_type == transaction_type]
         return list(results)
 
+    def transactions_for_account(
+        self,
+        account_id: str,
+        limit: Optional[int] = None,
+        newest_first: bool = False,
+    ) -> list[Transaction]:
+        items = self._index().by_account.get(account_id, [])
+        if newest_first:
+            tail = items if limit is None else items[max(len(items) - limit, 0) :]
+            return tail[::-1]
+        return items[:limit]
+
     def list_scheduled_tasks(self) -> list[ScheduledTask]:
-        return list(self.load().scheduled_tasks)
+        return list(self._snapshot().scheduled_tasks)
 
     def get_scheduled_task(self, task_id: str) -> Optional[ScheduledTask]:
-        for task in self.load().scheduled_tasks:
+        for task in self._snapshot().scheduled_tasks:
             if task.id == task_id:
                 return task
         return None
 
     def upsert_scheduled_task(self, task: ScheduledTask) -> ScheduledTask:
-        store = self.load()
-        updated = False
-        for idx, existing in enumerate(store.scheduled_tasks):
-            if existing.id == task.id:
-                store.scheduled_tasks[idx] = task
-                updated = True
-                break
-        if not updated:
-            store.scheduled_tasks.append(task)
-        self.save(store)
-        return task
+        with self._exclusive():
+            store = self.load()
+            updated = False
+            for idx, existing in enumerate(store.scheduled_tasks):
+                if existing.id == task.id:
+                    store.scheduled_tasks[idx] = task
+                    updated = True
+                    break
+            if not updated:
+                store.scheduled_tasks.append(task)
+            self._record_change(store, "scheduled_task", "upsert", task.id, task)
+            self._commit(store)
+            return task
 
     def delete_scheduled_task(self, task_id: str) -> bool:
-        store = self.load()
-        before = len(store.scheduled_tasks)
-        store.scheduled_tasks = [task for task in store.scheduled_tasks if task.id != task_id]
-        if len(store.scheduled_tasks) == before:
-            return False
-        store.task_executions = [execution for execution in store.task_executions if execution.task_id != task_id]
-        self.save(store)
-        return True
+        with self._exclusive():
+            store = self.load()
+            before = len(store.scheduled_tasks)
+            store.scheduled_tasks = [task for task in store.scheduled_tasks if task.id != task_id]
+            if len(store.scheduled_tasks) == before:
+                return False
+            store.task_executions = [execution for execution in store.task_executions if execution.task_id != task_id]
+            self._record_change(store, "scheduled_task", "delete", task_id)
+            self._commit(store)
+            return True
 
     def list_task_executions(self, task_id: Optional[str] = None) -> list[ScheduledTaskExecution]:
-        executions = self.load().task_executions
+        executions = self._snapshot().task_executions
         if task_id:
             executions = [execution for execution in executions if execution.task_id == task_id]
         return list(executions)
 
     def get_task_execution(self, task_id: str, execution_id: str) -> Optional[ScheduledTaskExecution]:
-        for execution in self.load().task_executions:
+        for execution in self._snapshot().task_executions:
             if execution.task_id == task_id and execution.id == execution_id:
                 return execution
         return None
 
     def append_task_execution(self, execution: ScheduledTaskExecution) -> ScheduledTaskExecution:
-        store = self.load()
-        store.task_executions.append(execution)
-        self.save(store)
-        return execution
+        with self._exclusive():
+            store = self.load()
+            store.task_executions.append(execution)
+            self._record_change(store, "task_execution", "upsert", execution.id, execution)
+            self._commit(store)
+            return execution
+
+    def upsert_task_execution(self, execution: ScheduledTaskExecution) -> ScheduledTaskExecution:
+        with self._exclusive():
+            store = self.load()
+            updated = False
+            for idx, existing in enumerate(store.task_executions):
+                if existing.id == execution.id:
+                    store.task_executions[idx] = execution
+                    updated = True
+                    break
+            if not updated:
+                store.task_executions.append(execution)
+            self._record_change(store, "task_execution", "upsert", execution.id, execution)
+            self._commit(store)
+            return execution
 
     def prune_task_executions(self, task_id: str, keep: int = 50) -> list[ScheduledTaskExecution]:
-        store = self.load()
-        executions = [execution for execution in store.task_executions if execution.task_id == task_id]
-        other = [execution for execution in store.task_executions if execution.task_id != task_id]
-        executions.sort(key=lambda item: item.started_at, reverse=True)
-        kept = executions[:keep]
-        removed = executions[keep:]
-        store.task_executions = other + kept
-        if removed:
-            self.save(store)
-        return removed
+        with self._exclusive():
+            store = self.load()
+            executions = [execution for execution in store.task_executions if execution.task_id == task_id]
+            other = [execution for execution in store.task_executions if execution.task_id != task_id]
+            executions.sort(key=lambda item: item.started_at, reverse=True)
+            kept = executions[:keep]
+            removed = executions[keep:]
+            store.task_executions = other + kept
+            if removed:
+                for execution in removed:
+                    self._record_change(store, "task_execution", "delete", execution.id)
+                self._commit(store)
+            return removed
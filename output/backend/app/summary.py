@@ -0,0 +1,74 @@
+from __future__ import annotations
+
+from dataclasses import dataclass, field
+from typing import Iterable, Optional
+
+from .models import Account, Transaction
+from .money import Cents, to_cents
+
+
+@dataclass
+class StoreSummary:
+    # Running aggregates over one store file, all money in cents. Storage applies
+    # each mutation's delta, so reading them never scans accounts or transactions.
+    accounts_by_type: dict[str, int] = field(default_factory=dict)
+    balance_by_type: dict[str, Cents] = field(default_factory=dict)
+    transactions_by_type: dict[str, int] = field(default_factory=dict)
+    amount_by_type: dict[str, Cents] = field(default_factory=dict)
+    # "YYYY/MM" -> interest posted in that month.
+    interest_by_month: dict[str, Cents] = field(default_factory=dict)
+
+    @classmethod
+    def build(cls, accounts: Iterable[Account], transactions: Iterable[Transaction]) -> "StoreSummary":
+        summary = cls()
+        for account in accounts:
+            summary.add_account(account)
+        for txn in transactions:
+            summary.add_transaction(txn)
+        return summary
+
+    @classmethod
+    def from_dict(cls, raw: dict) -> "StoreSummary":
+        return cls(**{name: dict(raw.get(name, {})) for name in cls.__dataclass_fields__})
+
+    def to_dict(self) -> dict:
+        return {name: dict(getattr(self, name)) for name in self.__dataclass_fields__}
+
+    def copy(self) -> "StoreSummary":
+        return StoreSummary.from_dict(self.to_dict())
+
+    def merge(self, other: "StoreSummary") -> None:
+        for name in self.__dataclass_fields__:
+            _add_all(getattr(self, name), getattr(other, name))
+
+    def add_account(self, account: Account, sign: int = 1) -> None:
+        _add(self.accounts_by_type, account.account_type, sign)
+        _add(self.balance_by_type, account.account_type, sign * to_cents(account.balance))
+
+    def remove_account(self, account: Account) -> None:
+        self.add_account(account, sign=-1)
+
+    def replace_account(self, old: Optional[Account], new: Account) -> None:
+        if old is not None:
+            self.remove_account(old)
+        self.add_account(new)
+
+    def add_transaction(self, txn: Transaction) -> None:
+        amount = to_cents(txn.amount)
+        _add(self.transactions_by_type, txn.transaction_type, 1)
+        _add(self.amount_by_type, txn.transaction_type, amount)
+        if txn.transaction_type == "I" and txn.date:
+            _add(self.interest_by_month, txn.date[:7], amount)
+
+
+def _add(counters: dict[str, int], key: str, delta: int) -> None:
+    value = counters.get(key, 0) + delta
+    if value:
+        counters[key] = value
+    else:
+        counters.pop(key, None)
+
+
+def _add_all(counters: dict[str, int], other: dict[str, int]) -> None:
+    for key, delta in other.items():
+        _add(counters, key, delta)
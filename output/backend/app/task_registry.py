@@ -0,0 +1,62 @@
+from __future__ import annotations
+
+from dataclasses import dataclass
+from typing import TYPE_CHECKING, Callable, Optional
+
+from .services import DomainError
+
+if TYPE_CHECKING:
+    from .scheduled_tasks import ScheduledTaskManager
+
+TaskLog = Callable[[str], None]
+TaskHandler = Callable[["ScheduledTaskManager", TaskLog], None]
+
+
+@dataclass(frozen=True)
+class TaskFunction:
+    name: str
+    handler: TaskHandler
+    max_instances: int = 1
+    coalesce: bool = True
+    misfire_grace_time: Optional[int] = 60
+    timeout_seconds: Optional[float] = None
+
+
+TASK_FUNCTIONS: dict[str, TaskFunction] = {}
+
+
+def register_task_function(
+    name: str,
+    *,
+    max_instances: int = 1,
+    coalesce: bool = True,
+    misfire_grace_time: Optional[int] = 60,
+    timeout_seconds: Optional[float] = None,
+) -> Callable[[TaskHandler], TaskHandler]:
+    if max_instances < 1:
+        raise ValueError("max_instances must be at least 1")
+
+    def decorator(handler: TaskHandler) -> TaskHandler:
+        TASK_FUNCTIONS[name] = TaskFunction(
+            name=name,
+            handler=handler,
+            max_instances=max_instances,
+            coalesce=coalesce,
+            misfire_grace_time=misfire_grace_time,
+            timeout_seconds=timeout_seconds,
+        )
+        return handler
+
+    return decorator
+
+
+def get_task_function(name: str) -> Optional[TaskFunction]:
+    return TASK_FUNCTIONS.get(name)
+
+
+def validate_function_name(name: str) -> TaskFunction:
+    function = get_task_function(name)
+    if function is None:
+        known = ", ".join(sorted(TASK_FUNCTIONS))
+        raise DomainError(f"unknown function '{name}' (expected one of: {known})", status_code=400)
+    return function
@@ -0,0 +1,72 @@
+from __future__ import annotations
+
+import argparse
+import json
+import sys
+from pathlib import Path
+
+from .harness import compare
+from .runner import DEFAULT_ITERATIONS, DEFAULT_MAX_SECONDS, DEFAULT_SIZES, run_suite
+
+
+def _format_bytes(value) -> str:
+    if value is None:
+        return "-"
+    for unit in ("B", "KiB", "MiB"):
+        if value < 1024:
+            return f"{value:.0f}{unit}" if unit == "B" else f"{value:.1f}{unit}"
+        value /= 1024
+    return f"{value:.1f}GiB"
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m benchmarks", description="Storage and service benchmarks.")
+    parser.add_argument("--sizes", type=int, nargs="+", default=list(DEFAULT_SIZES), help="account counts to generate")
+    parser.add_argument("--cases", nargs="+", help="glob patterns selecting cases, e.g. 'storage.*'")
+    parser.add_argument("--iterations", type=int, default=DEFAULT_ITERATIONS)
+    parser.add_argument("--max-seconds", type=float, default=DEFAULT_MAX_SECONDS, help="time budget per case")
+    parser.add_argument("--transactions-per-account", type=int, default=5)
+    parser.add_argument("--shards", type=int, default=0, help="benchmark a sharded store with this many shards")
+    parser.add_argument("--no-limits", action="store_true", help="run batch cases at every size")
+    parser.add_argument("--workdir", type=Path, help="where synthetic stores are generated")
+    parser.add_argument("--output", type=Path, help="write results as JSON")
+    parser.add_argument("--baseline", type=Path, help="compare against a previous results file")
+    parser.add_argument("--threshold", type=float, default=0.2, help="allowed relative slowdown before flagging")
+    args = parser.parse_args(argv)
+
+    report = run_suite(
+        sizes=tuple(args.sizes),
+        workdir=args.workdir,
+        cases=args.cases,
+        iterations=args.iterations,
+        max_seconds=args.max_seconds,
+        transactions_per_account=args.transactions_per_account,
+        no_limits=args.no_limits,
+        shards=args.shards,
+    )
+    print(f"{'case':40} {'accounts':>9} {'n':>4} {'p50 ms':>10} {'p95 ms':>10} {'p99 ms':>10} {'ops/s':>9} {'written/op':>12} {'peak rss':>10}")
+    for item in report["results"]:
+        print(
+            f"{item['case']:40} {item['accounts']:>9} {item['iterations']:>4} {item['p50_ms']:>10.3f} "
+            f"{item['p95_ms']:>10.3f} {item['p99_ms']:>10.3f} {item['throughput_ops']:>9.2f} "
+            f"{_format_bytes(item['bytes_written_per_op']):>12} {_format_bytes(item['peak_rss_bytes']):>10}"
+        )
+    if args.output:
+        args.output.parent.mkdir(parents=True, exist_ok=True)
+        args.output.write_text(json.dumps(report, indent=2, sort_keys=True), encoding="utf-8")
+
+    if args.baseline:
+        regressions = compare(report, json.loads(args.baseline.read_text(encoding="utf-8")), args.threshold)
+        for item in regressions:
+            print(
+                f"REGRESSION {item.case} @ {item.accounts}: {item.metric} "
+                f"{item.baseline:g} -> {item.current:g} ({item.change:+.0%})",
+                file=sys.stderr,
+            )
+        if regressions:
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
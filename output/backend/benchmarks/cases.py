@@ -0,0 +1,260 @@
+from __future__ import annotations
+
+import random
+from dataclasses import dataclass, field
+from decimal import Decimal
+from pathlib import Path
+from typing import Any, Callable, Optional, Union
+
+from app import services
+from app.models import Account, ScheduledTask, ScheduledTaskExecution, Transaction
+from app.scheduled_tasks import ScheduledTaskManager, now_iso
+from app.sharding import ShardedStorage, rebalance
+from app.statements import StatementPeriod, generate_statements
+from app.storage import Storage, StoreData
+
+from .synthetic import SyntheticStore
+
+FUNDING_ACCOUNT_ID = "B000000000"
+HEARTBEAT_TASK_ID = "bench-heartbeat"
+MONTHEND_TASK_ID = "bench-monthend"
+SEEDED_EXECUTIONS = 20
+
+# Batch cases rewrite the whole store once per savings account, so by default they
+# only run against small stores; ``--no-limits`` lifts the cap.
+BATCH_CASE_MAX_ACCOUNTS = 1_000
+
+
+@dataclass
+class BenchContext:
+    store: SyntheticStore
+    storage: Union[Storage, ShardedStorage]
+    manager: ScheduledTaskManager
+    rng: random.Random
+    snapshot: Optional[StoreData] = None
+    scratch: dict[str, Any] = field(default_factory=dict)
+
+    def sample_account(self) -> str:
+        return self.store.account_id(self.rng.randrange(self.store.accounts))
+
+
+@dataclass(frozen=True)
+class BenchCase:
+    name: str
+    run: Callable[[BenchContext, int], Any]
+    setup: Optional[Callable[[BenchContext, int], None]] = None
+    max_accounts: Optional[int] = None
+
+
+def _task(task_id: str, function_name: str) -> ScheduledTask:
+    return ScheduledTask(
+        id=task_id,
+        display_name=function_name,
+        function_name=function_name,
+        cron="0 0 1 1 *",
+        enabled=True,
+        created_at=now_iso(),
+        updated_at=now_iso(),
+        last_run=None,
+    )
+
+
+def _execution(task_id: str, execution_id: str, status: str = "success") -> ScheduledTaskExecution:
+    return ScheduledTaskExecution(
+        id=execution_id,
+        task_id=task_id,
+        status=status,
+        started_at=now_iso(),
+        finished_at=now_iso(),
+        log_path="",
+        trigger="manual",
+    )
+
+
+def _transaction(account_id: str, index: int) -> Transaction:
+    return Transaction(
+        transaction_id=f"bench-{index}",
+        account_id=account_id,
+        transaction_type="D",
+        amount=Decimal("1.00"),
+        date="2025/01/01",
+        time="00:00:00",
+    )
+
+
+def prepare(store: SyntheticStore, logs_dir: Path, seed: int = 0, shards: int = 0) -> BenchContext:
+    if shards:
+        storage: Union[Storage, ShardedStorage] = rebalance(store.path.parent / "shards", shards, source=store.path)
+    else:
+        storage = Storage(store.path)
+    data = storage.load()
+    data.accounts.append(
+        Account(account_id=FUNDING_ACCOUNT_ID, name="Benchmark funding", balance=Decimal("1000000000.00"), account_type="C")
+    )
+    data.scheduled_tasks.extend([_task(HEARTBEAT_TASK_ID, "heartbeat"), _task(MONTHEND_TASK_ID, "monthend_interest")])
+    data.task_executions.extend(
+        _execution(HEARTBEAT_TASK_ID, f"seed-{index}") for index in range(SEEDED_EXECUTIONS)
+    )
+    storage.save(data)
+    return BenchContext(
+        store=store,
+        storage=storage,
+        manager=ScheduledTaskManager(storage, logs_dir),
+        rng=random.Random(seed),
+    )
+
+
+def _save(ctx: BenchContext, index: int) -> None:
+    if ctx.snapshot is None:
+        ctx.snapshot = ctx.storage.load()
+    ctx.storage.save(ctx.snapshot)
+
+
+def _upsert_account(ctx: BenchContext, index: int) -> None:
+    account_id = ctx.sample_account()
+    ctx.storage.upsert_account(
+        Account(account_id=account_id, name=f"Renamed {index}", balance=Decimal("10.00"), account_type="C")
+    )
+
+
+def _stage_account(ctx: BenchContext, index: int) -> None:
+    ctx.scratch["account_id"] = f"D{index:09d}"
+    ctx.storage.upsert_account(
+        Account(account_id=ctx.scratch["account_id"], name="Disposable", balance=Decimal("0.00"), account_type="C")
+    )
+
+
+def _stage_balance(ctx: BenchContext, index: int) -> None:
+    # Moves one balance so the next checkpoint run has an account to record.
+    ctx.storage.update_account_balance(ctx.sample_account(), Decimal(index % 1000) + Decimal("0.50"))
+
+
+def _apply_transaction(ctx: BenchContext, index: int) -> None:
+    account = ctx.storage.get_account(ctx.sample_account())
+    ctx.storage.apply_transaction(
+        _transaction(account.account_id, index),
+        account.balance + Decimal("1.00"),
+        account.version,
+        f"bench-{index}",
+        "D:1.00",
+    )
+
+
+def _stage_task(ctx: BenchContext, index: int) -> None:
+    ctx.scratch["task_id"] = f"bench-disposable-{index}"
+    ctx.storage.upsert_scheduled_task(_task(ctx.scratch["task_id"], "heartbeat"))
+
+
+CASES: tuple[BenchCase, ...] = (
+    BenchCase("storage.load", lambda ctx, i: ctx.storage.load()),
+    BenchCase("storage.save", _save),
+    BenchCase("storage.is_cached", lambda ctx, i: ctx.storage.is_cached()),
+    BenchCase("storage.summary", lambda ctx, i: ctx.storage.summary()),
+    BenchCase("storage.list_accounts", lambda ctx, i: ctx.storage.list_accounts()),
+    BenchCase("storage.get_account", lambda ctx, i: ctx.storage.get_account(ctx.sample_account())),
+    BenchCase(
+        "storage.search_accounts",
+        lambda ctx, i: ctx.storage.search_accounts(f"customer {ctx.rng.randrange(ctx.store.accounts)}"),
+    ),
+    BenchCase("storage.upsert_account", _upsert_account),
+    BenchCase(
+        "storage.delete_account",
+        lambda ctx, i: ctx.storage.delete_account(ctx.scratch["account_id"]),
+        setup=_stage_account,
+    ),
+    BenchCase(
+        "storage.update_account_balance",
+        lambda ctx, i: ctx.storage.update_account_balance(ctx.sample_account(), Decimal("25.00")),
+    ),
+    BenchCase(
+        "storage.append_transaction",
+        lambda ctx, i: ctx.storage.append_transaction(_transaction(ctx.sample_account(), i)),
+    ),
+    BenchCase("storage.apply_transaction", _apply_transaction),
+    BenchCase(
+        "storage.get_idempotency_record",
+        lambda ctx, i: ctx.storage.get_idempotency_record(ctx.sample_account(), f"bench-{i}"),
+    ),
+    BenchCase("storage.change_offset", lambda ctx, i: ctx.storage.change_feeds()[0].change_offset()),
+    BenchCase("storage.changes_since", lambda ctx, i: ctx.storage.change_feeds()[0].changes_since(0)),
+    BenchCase(
+        "storage.list_transactions",
+        lambda ctx, i: ctx.storage.list_transactions(account_id=ctx.sample_account()),
+    ),
+    BenchCase(
+        "storage.transactions_for_account",
+        lambda ctx, i: ctx.storage.transactions_for_account(ctx.sample_account(), limit=5, newest_first=True),
+    ),
+    BenchCase("storage.record_checkpoints", lambda ctx, i: ctx.storage.record_checkpoints(), setup=_stage_balance),
+    BenchCase(
+        "storage.balance_as_of",
+        lambda ctx, i: ctx.storage.balance_as_of(ctx.sample_account(), "2025/01/01 12:00:00"),
+    ),
+    BenchCase(
+        "storage.period_activity",
+        lambda ctx, i: list(
+            ctx.storage.period_activity([ctx.sample_account()], "2024/06/01 00:00:00", "2024/06/30 23:59:59")
+        ),
+    ),
+    BenchCase("storage.list_scheduled_tasks", lambda ctx, i: ctx.storage.list_scheduled_tasks()),
+    BenchCase("storage.get_scheduled_task", lambda ctx, i: ctx.storage.get_scheduled_task(HEARTBEAT_TASK_ID)),
+    BenchCase(
+        "storage.upsert_scheduled_task",
+        lambda ctx, i: ctx.storage.upsert_scheduled_task(_task(HEARTBEAT_TASK_ID, "heartbeat")),
+    ),
+    BenchCase(
+        "storage.delete_scheduled_task",
+        lambda ctx, i: ctx.storage.delete_scheduled_task(ctx.scratch["task_id"]),
+        setup=_stage_task,
+    ),
+    BenchCase(
+        "storage.list_task_executions",
+        lambda ctx, i: ctx.storage.list_task_executions(HEARTBEAT_TASK_ID),
+    ),
+    BenchCase(
+        "storage.get_task_execution",
+        lambda ctx, i: ctx.storage.get_task_execution(HEARTBEAT_TASK_ID, f"seed-{i % SEEDED_EXECUTIONS}"),
+    ),
+    BenchCase(
+        "storage.append_task_execution",
+        lambda ctx, i: ctx.storage.append_task_execution(_execution(HEARTBEAT_TASK_ID, f"append-{i}")),
+    ),
+    BenchCase(
+        "storage.upsert_task_execution",
+        lambda ctx, i: ctx.storage.upsert_task_execution(_execution(HEARTBEAT_TASK_ID, f"seed-{i % SEEDED_EXECUTIONS}")),
+    ),
+    BenchCase(
+        "storage.prune_task_executions",
+        lambda ctx, i: ctx.storage.prune_task_executions(HEARTBEAT_TASK_ID, keep=50),
+    ),
+    BenchCase(
+        "services.deposit",
+        lambda ctx, i: services.deposit(ctx.storage, ctx.sample_account(), Decimal("1.00")),
+    ),
+    BenchCase(
+        "services.withdraw",
+        lambda ctx, i: services.withdraw(ctx.storage, FUNDING_ACCOUNT_ID, Decimal("1.00")),
+    ),
+    BenchCase(
+        "services.list_statement",
+        lambda ctx, i: services.list_statement(ctx.storage, ctx.sample_account()),
+    ),
+    BenchCase(
+        "services.apply_interest_all",
+        lambda ctx, i: services.apply_interest_all(ctx.storage),
+        max_accounts=BATCH_CASE_MAX_ACCOUNTS,
+    ),
+    BenchCase(
+        "statements.generate",
+        lambda ctx, i: generate_statements(ctx.storage, ctx.manager.statements_dir / str(i), StatementPeriod.of("2024/06")),
+    ),
+    BenchCase(
+        "scheduler.run_task.heartbeat",
+        lambda ctx, i: ctx.manager.run_task(HEARTBEAT_TASK_ID),
+    ),
+    BenchCase(
+        "scheduler.run_task.monthend_interest",
+        lambda ctx, i: ctx.manager.run_task(MONTHEND_TASK_ID),
+        max_accounts=BATCH_CASE_MAX_ACCOUNTS,
+    ),
+)
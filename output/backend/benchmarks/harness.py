@@ -0,0 +1,125 @@
+from __future__ import annotations
+
+import math
+import sys
+import time
+from dataclasses import asdict, dataclass
+from typing import Any, Callable, Optional
+
+from app.instrumentation import collect_timings
+
+try:
+    import resource
+except ImportError:  # pragma: no cover - not available on Windows
+    resource = None  # type: ignore[assignment]
+
+
+@dataclass
+class CaseResult:
+    case: str
+    accounts: int
+    iterations: int
+    p50_ms: float
+    p95_ms: float
+    p99_ms: float
+    mean_ms: float
+    max_ms: float
+    throughput_ops: float
+    bytes_read_per_op: int
+    bytes_written_per_op: int
+    peak_rss_bytes: Optional[int]
+
+    def to_dict(self) -> dict:
+        return asdict(self)
+
+
+def percentile(samples: list[float], pct: float) -> float:
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    rank = max(math.ceil(pct / 100 * len(ordered)) - 1, 0)
+    return ordered[rank]
+
+
+def peak_rss_bytes() -> Optional[int]:
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, macOS reports bytes.
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+def measure(
+    case: str,
+    accounts: int,
+    func: Callable[[int], Any],
+    iterations: int,
+    max_seconds: float,
+    setup: Optional[Callable[[int], None]] = None,
+) -> CaseResult:
+    # ``setup`` runs outside the timed section and its storage traffic is not counted.
+    samples: list[float] = []
+    bytes_read = 0
+    bytes_written = 0
+    deadline = time.perf_counter() + max_seconds
+    for index in range(iterations):
+        if setup is not None:
+            setup(index)
+        with collect_timings() as timings:
+            start = time.perf_counter()
+            func(index)
+            samples.append(time.perf_counter() - start)
+        bytes_read += timings.bytes_read
+        bytes_written += timings.bytes_written
+        if time.perf_counter() >= deadline:
+            break
+    count = len(samples)
+    total = sum(samples)
+    return CaseResult(
+        case=case,
+        accounts=accounts,
+        iterations=count,
+        p50_ms=round(percentile(samples, 50) * 1000, 3),
+        p95_ms=round(percentile(samples, 95) * 1000, 3),
+        p99_ms=round(percentile(samples, 99) * 1000, 3),
+        mean_ms=round(total / count * 1000, 3),
+        max_ms=round(max(samples) * 1000, 3),
+        throughput_ops=round(count / total, 3) if total else 0.0,
+        bytes_read_per_op=bytes_read // count,
+        bytes_written_per_op=bytes_written // count,
+        peak_rss_bytes=peak_rss_bytes(),
+    )
+
+
+@dataclass(frozen=True)
+class Regression:
+    case: str
+    accounts: int
+    metric: str
+    baseline: float
+    current: float
+
+    @property
+    def change(self) -> float:
+        return (self.current - self.baseline) / self.baseline if self.baseline else math.inf
+
+
+COMPARED_METRICS = ("p50_ms", "p95_ms", "bytes_written_per_op")
+
+
+def compare(current: dict, baseline: dict, threshold: float = 0.2) -> list[Regression]:
+    previous = {(item["case"], item["accounts"]): item for item in baseline.get("results", [])}
+    regressions: list[Regression] = []
+    for item in current.get("results", []):
+        before = previous.get((item["case"], item["accounts"]))
+        if before is None:
+            continue
+        for metric in COMPARED_METRICS:
+            old, new = before.get(metric), item.get(metric)
+            if old is None or new is None:
+                continue
+            if new > old * (1 + threshold):
+                regressions.append(
+                    Regression(case=item["case"], accounts=item["accounts"], metric=metric, baseline=old, current=new)
+                )
+    return regressions
@@ -0,0 +1,280 @@
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import random
+import sys
+import tempfile
+import time
+from dataclasses import dataclass, field
+from datetime import datetime
+from pathlib import Path
+from typing import Callable, Optional
+from urllib.parse import urlparse
+
+import httpx
+
+from .harness import percentile
+from .synthetic import generate_store
+
+LOCAL_HOSTS = {"localhost", "127.0.0.1", "::1"}
+INTEREST_ROUTE = "POST /accounts/apply-interest"
+
+
+@dataclass(frozen=True)
+class Operation:
+    route: str
+    weight: int
+    build: Callable[[random.Random, list[str]], tuple[str, str, Optional[dict]]]
+
+
+def _amount(rng: random.Random) -> str:
+    return f"{rng.randint(1, 200)}.{rng.randint(0, 99):02d}"
+
+
+WORKLOAD: tuple[Operation, ...] = (
+    Operation("GET /accounts", 10, lambda rng, ids: ("GET", "/accounts", None)),
+    Operation(
+        "GET /accounts/{account_id}/statement",
+        25,
+        lambda rng, ids: ("GET", f"/accounts/{rng.choice(ids)}/statement", None),
+    ),
+    Operation(
+        "GET /transactions",
+        15,
+        lambda rng, ids: ("GET", f"/transactions?account_id={rng.choice(ids)}", None),
+    ),
+    Operation(
+        "POST /accounts/{account_id}/deposit",
+        20,
+        lambda rng, ids: ("POST", f"/accounts/{rng.choice(ids)}/deposit", {"amount": _amount(rng)}),
+    ),
+    Operation(
+        "POST /accounts/{account_id}/withdraw",
+        15,
+        lambda rng, ids: ("POST", f"/accounts/{rng.choice(ids)}/withdraw", {"amount": _amount(rng)}),
+    ),
+    Operation(
+        "POST /transactions",
+        15,
+        lambda rng, ids: (
+            "POST",
+            "/transactions",
+            {"account_id": rng.choice(ids), "transaction_type": "D", "amount": _amount(rng)},
+        ),
+    ),
+)
+
+
+@dataclass
+class RouteStats:
+    latencies: list[float] = field(default_factory=list)
+    statuses: dict[int, int] = field(default_factory=dict)
+    exceptions: int = 0
+
+    def record(self, seconds: float, status: Optional[int]) -> None:
+        self.latencies.append(seconds)
+        if status is None:
+            self.exceptions += 1
+        else:
+            self.statuses[status] = self.statuses.get(status, 0) + 1
+
+    def summary(self, elapsed: float) -> dict:
+        total = len(self.latencies)
+        server_errors = sum(count for status, count in self.statuses.items() if status >= 500)
+        client_errors = sum(count for status, count in self.statuses.items() if 400 <= status < 500)
+        return {
+            "requests": total,
+            "throughput_rps": round(total / elapsed, 3) if elapsed else 0.0,
+            "p50_ms": round(percentile(self.latencies, 50) * 1000, 3),
+            "p95_ms": round(percentile(self.latencies, 95) * 1000, 3),
+            "p99_ms": round(percentile(self.latencies, 99) * 1000, 3),
+            "max_ms": round(max(self.latencies, default=0.0) * 1000, 3),
+            "client_errors": client_errors,
+            "server_errors": server_errors,
+            "exceptions": self.exceptions,
+            "error_rate": round((server_errors + self.exceptions) / total, 4) if total else 0.0,
+            "statuses": {str(status): count for status, count in sorted(self.statuses.items())},
+        }
+
+
+class LoadTest:
+    def __init__(
+        self,
+        client: httpx.AsyncClient,
+        account_ids: list[str],
+        concurrency: int = 16,
+        duration: float = 30.0,
+        max_requests: Optional[int] = None,
+        interest_interval: Optional[float] = 10.0,
+        seed: int = 0,
+    ) -> None:
+        self.client = client
+        self.account_ids = account_ids
+        self.concurrency = concurrency
+        self.duration = duration
+        self.max_requests = max_requests
+        self.interest_interval = interest_interval
+        self.rng = random.Random(seed)
+        self.stats: dict[str, RouteStats] = {}
+        self._issued = 0
+        self._weights = [operation.weight for operation in WORKLOAD]
+
+    async def _send(self, route: str, method: str, path: str, body: Optional[dict]) -> None:
+        start = time.perf_counter()
+        status: Optional[int] = None
+        try:
+            response = await self.client.request(method, path, json=body)
+            status = response.status_code
+        except httpx.HTTPError:
+            pass
+        self.stats.setdefault(route, RouteStats()).record(time.perf_counter() - start, status)
+
+    def _claim(self, deadline: float) -> bool:
+        if time.perf_counter() >= deadline:
+            return False
+        if self.max_requests is not None:
+            if self._issued >= self.max_requests:
+                return False
+            self._issued += 1
+        return True
+
+    async def _worker(self, deadline: float) -> None:
+        while self._claim(deadline):
+            operation = self.rng.choices(WORKLOAD, weights=self._weights)[0]
+            method, path, body = operation.build(self.rng, self.account_ids)
+            await self._send(operation.route, method, path, body)
+
+    async def _interest(self, stop: asyncio.Event) -> None:
+        while True:
+            try:
+                await asyncio.wait_for(stop.wait(), timeout=self.interest_interval)
+                return
+            except asyncio.TimeoutError:
+                pass
+            await self._send(INTEREST_ROUTE, "POST", "/accounts/apply-interest", None)
+
+    async def run(self) -> dict:
+        start = time.perf_counter()
+        deadline = start + self.duration
+        workers = [asyncio.create_task(self._worker(deadline)) for _ in range(self.concurrency)]
+        stop = asyncio.Event()
+        interest = asyncio.create_task(self._interest(stop)) if self.interest_interval else None
+        await asyncio.gather(*workers)
+        stop.set()
+        if interest is not None:
+            # An interest batch already in flight is allowed to finish and is counted.
+            await interest
+        elapsed = time.perf_counter() - start
+        overall = RouteStats()
+        for stats in self.stats.values():
+            overall.latencies.extend(stats.latencies)
+            overall.exceptions += stats.exceptions
+            for status, count in stats.statuses.items():
+                overall.statuses[status] = overall.statuses.get(status, 0) + count
+        return {
+            "meta": {
+                "created_at": datetime.now().isoformat(timespec="seconds"),
+                "concurrency": self.concurrency,
+                "accounts": len(self.account_ids),
+                "elapsed_seconds": round(elapsed, 3),
+            },
+            "total": overall.summary(elapsed),
+            "routes": {route: stats.summary(elapsed) for route, stats in sorted(self.stats.items())},
+        }
+
+
+def ensure_local(url: str) -> None:
+    host = urlparse(url).hostname
+    if host not in LOCAL_HOSTS:
+        raise SystemExit(f"refusing to load-test non-local host {host!r}; use localhost or 127.0.0.1")
+
+
+async def _account_ids(client: httpx.AsyncClient) -> list[str]:
+    response = await client.get("/accounts")
+    response.raise_for_status()
+    return [item["account_id"] for item in response.json()["accounts"]]
+
+
+async def run_in_process(
+    workdir: Path,
+    accounts: int,
+    transactions_per_account: int = 5,
+    shards: int = 0,
+    **options,
+) -> dict:
+    from app import main
+    from app.sharding import rebalance
+
+    store = generate_store(workdir / "store.json", accounts, transactions_per_account)
+    previous = main.app.state.storage
+    main.app.state.storage = rebalance(workdir / "shards", shards, source=store.path) if shards else main.Storage(store.path)
+    # Unhandled errors such as LockTimeoutError must come back as 500s, the way a
+    # real server reports them, rather than being raised into the load generator.
+    transport = httpx.ASGITransport(app=main.app, raise_app_exceptions=False)
+    try:
+        async with httpx.AsyncClient(transport=transport, base_url="http://loadtest", timeout=None) as client:
+            ids = [store.account_id(index) for index in range(accounts)]
+            return await LoadTest(client, ids, **options).run()
+    finally:
+        main.app.state.storage = previous
+
+
+async def run_against(url: str, **options) -> dict:
+    ensure_local(url)
+    async with httpx.AsyncClient(base_url=url, timeout=60.0) as client:
+        ids = await _account_ids(client)
+        if not ids:
+            raise SystemExit("the target server has no accounts to exercise")
+        return await LoadTest(client, ids, **options).run()
+
+
+def _print_report(report: dict) -> None:
+    print(f"{'route':40} {'n':>7} {'rps':>8} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'4xx':>6} {'5xx':>6} {'exc':>5} {'err%':>6}")
+    rows = list(report["routes"].items()) + [("TOTAL", report["total"])]
+    for route, item in rows:
+        print(
+            f"{route:40} {item['requests']:>7} {item['throughput_rps']:>8.1f} {item['p50_ms']:>9.2f} "
+            f"{item['p95_ms']:>9.2f} {item['p99_ms']:>9.2f} {item['client_errors']:>6} "
+            f"{item['server_errors']:>6} {item['exceptions']:>5} {item['error_rate'] * 100:>5.1f}%"
+        )
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.loadtest", description="Mixed-workload HTTP load test.")
+    parser.add_argument("--url", help="local server to target, e.g. http://127.0.0.1:8000 (default: in process)")
+    parser.add_argument("--accounts", type=int, default=1_000, help="synthetic accounts for in-process runs")
+    parser.add_argument("--transactions-per-account", type=int, default=5)
+    parser.add_argument("--shards", type=int, default=0, help="shard the in-process store")
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--duration", type=float, default=30.0, help="seconds to run")
+    parser.add_argument("--requests", type=int, help="stop after this many requests")
+    parser.add_argument("--interest-interval", type=float, default=10.0, help="seconds between batch interest runs; 0 disables")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", type=Path, help="write the report as JSON")
+    args = parser.parse_args(argv)
+
+    options = {
+        "concurrency": args.concurrency,
+        "duration": args.duration,
+        "max_requests": args.requests,
+        "interest_interval": args.interest_interval or None,
+        "seed": args.seed,
+    }
+    if args.url:
+        report = asyncio.run(run_against(args.url, **options))
+    else:
+        with tempfile.TemporaryDirectory(prefix="bankacct-load-") as scratch:
+            report = asyncio.run(
+                run_in_process(Path(scratch), args.accounts, args.transactions_per_account, args.shards, **options)
+            )
+    _print_report(report)
+    if args.output:
+        args.output.parent.mkdir(parents=True, exist_ok=True)
+        args.output.write_text(json.dumps(report, indent=2, sort_keys=True), encoding="utf-8")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,90 @@
+from __future__ import annotations
+
+import argparse
+import json
+import sys
+import tempfile
+from pathlib import Path
+from typing import Any, Callable
+
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+from pydantic import BaseModel
+
+from app.compression import compress, supported_encodings
+from app.models import AccountsResponse, TransactionsResponse
+from app.responses import ModelResponse
+from app.storage import Storage
+
+from .harness import measure
+from .synthetic import generate_store
+
+
+def default_render(model: BaseModel) -> bytes:
+    # What FastAPI does with a returned model and a response_model: dump it, validate
+    # the dump against the response model, run jsonable_encoder, then json.dumps.
+    validated = type(model).model_validate(model.model_dump())
+    return JSONResponse(jsonable_encoder(validated)).body
+
+
+def direct_render(model: BaseModel) -> bytes:
+    return ModelResponse(model).body
+
+
+def payloads(storage: Storage) -> dict[str, BaseModel]:
+    return {
+        "accounts": AccountsResponse.model_construct(accounts=storage.list_accounts()),
+        "transactions": TransactionsResponse.model_construct(transactions=storage.list_transactions()),
+    }
+
+
+def run_payloads(accounts: int, workdir: Path, transactions_per_account: int = 5, iterations: int = 10, max_seconds: float = 30.0) -> list[dict]:
+    store = generate_store(workdir / "store.json", accounts, transactions_per_account)
+    results: list[dict] = []
+    for name, model in payloads(Storage(store.path)).items():
+        body = direct_render(model)
+        assert default_render(model) == body
+        steps: dict[str, Callable[[int], Any]] = {
+            "default": lambda index, model=model: default_render(model),
+            "direct": lambda index, model=model: direct_render(model),
+        }
+        for encoding in supported_encodings():
+            steps[encoding] = lambda index, encoding=encoding: compress(body, encoding)
+        for step, func in steps.items():
+            result = measure(f"payload.{name}.{step}", accounts, func, iterations=iterations, max_seconds=max_seconds)
+            wire = len(body) if step in ("default", "direct") else len(compress(body, step))
+            results.append({**result.to_dict(), "wire_bytes": wire})
+    return results
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(
+        prog="python -m benchmarks.payloads", description="Response serialization and compression benchmarks."
+    )
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1_000, 10_000], help="account counts to generate")
+    parser.add_argument("--transactions-per-account", type=int, default=5)
+    parser.add_argument("--iterations", type=int, default=10)
+    parser.add_argument("--max-seconds", type=float, default=30.0, help="time budget per case")
+    parser.add_argument("--output", type=Path, help="write results as JSON")
+    args = parser.parse_args(argv)
+
+    results: list[dict] = []
+    with tempfile.TemporaryDirectory(prefix="bankacct-payloads-") as scratch:
+        for accounts in args.sizes:
+            results.extend(
+                run_payloads(accounts, Path(scratch) / str(accounts), args.transactions_per_account, args.iterations, args.max_seconds)
+            )
+    print(f"{'case':32} {'accounts':>9} {'n':>4} {'p50 ms':>10} {'p95 ms':>10} {'wire bytes':>12}")
+    for item in results:
+        print(
+            f"{item['case']:32} {item['accounts']:>9} {item['iterations']:>4} {item['p50_ms']:>10.3f} "
+            f"{item['p95_ms']:>10.3f} {item['wire_bytes']:>12}"
+        )
+    if args.output:
+        args.output.parent.mkdir(parents=True, exist_ok=True)
+        args.output.write_text(json.dumps({"results": results}, indent=2, sort_keys=True), encoding="utf-8")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,91 @@
+from __future__ import annotations
+
+import contextlib
+import fnmatch
+import multiprocessing
+import os
+import platform
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from pathlib import Path
+from typing import Optional
+
+from .cases import CASES, BenchCase, prepare
+from .harness import measure
+from .synthetic import generate_store
+
+DEFAULT_SIZES = (10_000, 100_000)
+DEFAULT_ITERATIONS = 20
+DEFAULT_MAX_SECONDS = 30.0
+
+
+def select_cases(patterns: Optional[list[str]] = None) -> list[BenchCase]:
+    if not patterns:
+        return list(CASES)
+    return [case for case in CASES if any(fnmatch.fnmatch(case.name, pattern) for pattern in patterns)]
+
+
+def run_size(
+    accounts: int,
+    workdir: Path,
+    cases: Optional[list[str]] = None,
+    iterations: int = DEFAULT_ITERATIONS,
+    max_seconds: float = DEFAULT_MAX_SECONDS,
+    transactions_per_account: int = 5,
+    no_limits: bool = False,
+    seed: int = 0,
+    shards: int = 0,
+) -> list[dict]:
+    results: list[dict] = []
+    for case in select_cases(cases):
+        if case.max_accounts is not None and accounts > case.max_accounts and not no_limits:
+            continue
+        # Every case starts from a freshly generated store so writes from one case
+        # do not skew the next.
+        case_dir = workdir / f"{accounts}" / case.name
+        store = generate_store(case_dir / "store.json", accounts, transactions_per_account, seed=seed)
+        ctx = prepare(store, case_dir / "logs", seed=seed, shards=shards)
+        setup = (lambda index, case=case: case.setup(ctx, index)) if case.setup else None
+        # Task runs echo their log lines to stdout; keep them out of the report.
+        with open(os.devnull, "w") as sink, contextlib.redirect_stdout(sink):
+            result = measure(
+                case.name,
+                accounts,
+                lambda index, case=case: case.run(ctx, index),
+                iterations=iterations,
+                max_seconds=max_seconds,
+                setup=setup,
+            )
+        results.append(result.to_dict())
+        ctx.manager.reclaimer.stop()
+    return results
+
+
+def run_suite(
+    sizes: tuple[int, ...] = DEFAULT_SIZES,
+    workdir: Optional[Path] = None,
+    isolate: bool = True,
+    **options,
+) -> dict:
+    # Each size runs in its own process so peak RSS reflects that store size rather
+    # than the largest one measured earlier in the run.
+    results: list[dict] = []
+    with tempfile.TemporaryDirectory(prefix="bankacct-bench-", dir=workdir) as scratch:
+        for accounts in sizes:
+            if isolate:
+                context = multiprocessing.get_context("spawn")
+                with ProcessPoolExecutor(max_workers=1, mp_context=context) as pool:
+                    results.extend(pool.submit(run_size, accounts, Path(scratch), **options).result())
+            else:
+                results.extend(run_size(accounts, Path(scratch), **options))
+    return {
+        "meta": {
+            "created_at": datetime.now().isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "sizes": list(sizes),
+            "options": {key: value for key, value in options.items()},
+        },
+        "results": results,
+    }
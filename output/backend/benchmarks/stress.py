@@ -0,0 +1,231 @@
+from __future__ import annotations
+
+import argparse
+import json
+import multiprocessing
+import random
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import asdict, dataclass, field
+from decimal import Decimal
+from pathlib import Path
+from typing import Optional
+
+from app import services
+from app.models import TRANSACTION_SIGNS, quantize_money
+from app.storage import LockTimeoutError, Storage
+
+from .synthetic import generate_store
+
+
+@dataclass
+class WorkerStats:
+    succeeded: int = 0
+    rejected: int = 0
+    lock_timeouts: int = 0
+    errors: int = 0
+    # Net balance change per account from operations that reported success.
+    acknowledged: dict[str, Decimal] = field(default_factory=dict)
+
+    def merge(self, other: "WorkerStats") -> None:
+        self.succeeded += other.succeeded
+        self.rejected += other.rejected
+        self.lock_timeouts += other.lock_timeouts
+        self.errors += other.errors
+        for account_id, delta in other.acknowledged.items():
+            self.acknowledged[account_id] = self.acknowledged.get(account_id, Decimal("0")) + delta
+
+
+@dataclass(frozen=True)
+class Divergence:
+    # ``ledger``: balance disagrees with the account's transaction log.
+    # ``acknowledged``: balance disagrees with the operations callers were told succeeded.
+    source: str
+    account_id: str
+    expected: str
+    actual: str
+    difference: str
+
+
+@dataclass
+class StressReport:
+    workers: int
+    processes: int
+    operations: int
+    elapsed_seconds: float
+    throughput_ops: float
+    stats: WorkerStats
+    transactions_expected: int
+    transactions_recorded: int
+    divergences: list[Divergence] = field(default_factory=list)
+
+    @property
+    def consistent(self) -> bool:
+        return not self.divergences and self.transactions_expected == self.transactions_recorded
+
+    def to_dict(self) -> dict:
+        payload = asdict(self)
+        payload["stats"]["acknowledged"] = {key: str(value) for key, value in self.stats.acknowledged.items()}
+        return {**payload, "consistent": self.consistent}
+
+
+def _run_operations(store_path: str, account_ids: list[str], operations: int, seed: int) -> WorkerStats:
+    storage = Storage(Path(store_path))
+    rng = random.Random(seed)
+    stats = WorkerStats()
+    for _ in range(operations):
+        account_id = rng.choice(account_ids)
+        amount = Decimal(f"{rng.randint(1, 50)}.00")
+        is_deposit = rng.random() < 0.6
+        operation = services.deposit if is_deposit else services.withdraw
+        try:
+            operation(storage, account_id, amount)
+            stats.succeeded += 1
+            delta = amount if is_deposit else -amount
+            stats.acknowledged[account_id] = stats.acknowledged.get(account_id, Decimal("0")) + delta
+        except services.DomainError:
+            stats.rejected += 1
+        except LockTimeoutError:
+            stats.lock_timeouts += 1
+        except Exception:
+            stats.errors += 1
+    return stats
+
+
+def _run_threads(store_path: str, account_ids: list[str], threads: int, operations: int, seed: int) -> WorkerStats:
+    results = [WorkerStats() for _ in range(threads)]
+
+    def target(index: int) -> None:
+        results[index] = _run_operations(store_path, account_ids, operations, seed * 1000 + index)
+
+    workers = [threading.Thread(target=target, args=(index,)) for index in range(threads)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    total = WorkerStats()
+    for item in results:
+        total.merge(item)
+    return total
+
+
+def reconcile(
+    storage: Storage,
+    opening: dict[str, Decimal],
+    known_transactions: set[str],
+    acknowledged: Optional[dict[str, Decimal]] = None,
+) -> tuple[list[Divergence], int]:
+    data = storage.load()
+    ledger = dict(opening)
+    recorded = 0
+    for txn in data.transactions:
+        if txn.transaction_id in known_transactions or txn.account_id not in ledger:
+            continue
+        recorded += 1
+        ledger[txn.account_id] += TRANSACTION_SIGNS.get(txn.transaction_type, 0) * txn.amount
+    expectations = {"ledger": ledger}
+    if acknowledged is not None:
+        expectations["acknowledged"] = {
+            account_id: balance + acknowledged.get(account_id, Decimal("0")) for account_id, balance in opening.items()
+        }
+    divergences: list[Divergence] = []
+    for account in data.accounts:
+        for source, expected in expectations.items():
+            if account.account_id not in expected:
+                continue
+            want = quantize_money(expected[account.account_id])
+            if want != account.balance:
+                divergences.append(
+                    Divergence(
+                        source=source,
+                        account_id=account.account_id,
+                        expected=str(want),
+                        actual=str(account.balance),
+                        difference=str(account.balance - want),
+                    )
+                )
+    return divergences, recorded
+
+
+def run_stress(
+    store_path: Path,
+    account_ids: list[str],
+    threads: int = 8,
+    processes: int = 1,
+    operations: int = 50,
+    seed: int = 0,
+) -> StressReport:
+    # ``operations`` is per worker; with more than one process every process runs
+    # ``threads`` workers of its own against the same store file.
+    storage = Storage(store_path)
+    data = storage.load()
+    opening = {account.account_id: account.balance for account in data.accounts if account.account_id in set(account_ids)}
+    known = {txn.transaction_id for txn in data.transactions}
+    stats = WorkerStats()
+    start = time.perf_counter()
+    if processes <= 1:
+        stats.merge(_run_threads(str(store_path), account_ids, threads, operations, seed))
+    else:
+        context = multiprocessing.get_context("spawn")
+        with ProcessPoolExecutor(max_workers=processes, mp_context=context) as pool:
+            futures = [
+                pool.submit(_run_threads, str(store_path), account_ids, threads, operations, seed * 100 + index)
+                for index in range(processes)
+            ]
+            for future in futures:
+                stats.merge(future.result())
+    elapsed = time.perf_counter() - start
+    divergences, recorded = reconcile(storage, opening, known, stats.acknowledged)
+    attempted = stats.succeeded + stats.rejected + stats.lock_timeouts + stats.errors
+    return StressReport(
+        workers=threads * max(processes, 1),
+        processes=max(processes, 1),
+        operations=attempted,
+        elapsed_seconds=round(elapsed, 3),
+        throughput_ops=round(stats.succeeded / elapsed, 3) if elapsed else 0.0,
+        stats=stats,
+        transactions_expected=stats.succeeded,
+        transactions_recorded=recorded,
+        divergences=divergences,
+    )
+
+
+def main(argv: Optional[list[str]] = None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.stress", description="Concurrent deposit/withdraw stress test.")
+    parser.add_argument("--accounts", type=int, default=200, help="accounts in the synthetic store")
+    parser.add_argument("--hot-accounts", type=int, default=5, help="accounts the workers contend on")
+    parser.add_argument("--threads", type=int, default=8, help="threads per process")
+    parser.add_argument("--processes", type=int, default=1)
+    parser.add_argument("--operations", type=int, default=50, help="operations per thread")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", type=Path, help="write the report as JSON")
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory(prefix="bankacct-stress-") as scratch:
+        store = generate_store(Path(scratch) / "store.json", args.accounts, transactions_per_account=1, seed=args.seed)
+        hot = [store.account_id(index) for index in range(min(args.hot_accounts, args.accounts))]
+        report = run_stress(store.path, hot, args.threads, args.processes, args.operations, args.seed)
+
+    stats = report.stats
+    print(
+        f"{report.workers} workers in {report.processes} process(es): {report.operations} operations in "
+        f"{report.elapsed_seconds:.2f}s ({report.throughput_ops:.1f} committed ops/s)"
+    )
+    print(
+        f"succeeded={stats.succeeded} rejected={stats.rejected} lock_timeouts={stats.lock_timeouts} errors={stats.errors}"
+    )
+    print(f"transactions expected={report.transactions_expected} recorded={report.transactions_recorded}")
+    for item in report.divergences:
+        print(f"DIVERGED ({item.source}) {item.account_id}: expected {item.expected} actual {item.actual} ({item.difference})")
+    if args.output:
+        args.output.parent.mkdir(parents=True, exist_ok=True)
+        args.output.write_text(json.dumps(report.to_dict(), indent=2, sort_keys=True), encoding="utf-8")
+    print("consistent" if report.consistent else "INCONSISTENT")
+    return 0 if report.consistent else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,82 @@
+from __future__ import annotations
+
+import json
+import random
+import uuid
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from pathlib import Path
+
+from app.storage import SCHEMA_VERSION
+
+TRANSACTION_TYPES = ("D", "W", "I")
+
+
+@dataclass(frozen=True)
+class SyntheticStore:
+    path: Path
+    accounts: int
+    transactions: int
+    savings: int
+    size_bytes: int
+
+    def account_id(self, index: int) -> str:
+        return account_id(index)
+
+
+def account_id(index: int) -> str:
+    return f"{index:010d}"
+
+
+def _amount(rng: random.Random, low: int, high: int) -> str:
+    return f"{rng.randint(low, high)}.{rng.randint(0, 99):02d}"
+
+
+def generate_store(
+    path: Path,
+    accounts: int,
+    transactions_per_account: int = 5,
+    savings_ratio: float = 0.5,
+    seed: int = 0,
+) -> SyntheticStore:
+    # Records are streamed one per line so a million-account store never has to be
+    # materialised in memory by the generator itself.
+    rng = random.Random(seed)
+    start = datetime(2024, 1, 1)
+    savings = 0
+    transactions = 0
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with path.open("w", encoding="utf-8") as handle:
+        handle.write('{"schema_version": %d,\n"accounts": [\n' % SCHEMA_VERSION)
+        for index in range(accounts):
+            account_type = "S" if rng.random() < savings_ratio else "C"
+            savings += account_type == "S"
+            record = {
+                "account_id": account_id(index),
+                "name": f"Customer {index}",
+                "balance": _amount(rng, 0, 50_000),
+                "account_type": account_type,
+            }
+            handle.write(("," if index else "") + json.dumps(record, sort_keys=True) + "\n")
+        handle.write('],\n"transactions": [\n')
+        for index in range(accounts):
+            for _ in range(transactions_per_account):
+                moment = start + timedelta(seconds=rng.randint(0, 365 * 24 * 3600))
+                record = {
+                    "transaction_id": str(uuid.UUID(int=rng.getrandbits(128), version=4)),
+                    "account_id": account_id(index),
+                    "transaction_type": rng.choice(TRANSACTION_TYPES),
+                    "amount": _amount(rng, 1, 2_000),
+                    "date": moment.strftime("%Y/%m/%d"),
+                    "time": moment.strftime("%H:%M:%S"),
+                }
+                handle.write(("," if transactions else "") + json.dumps(record, sort_keys=True) + "\n")
+                transactions += 1
+        handle.write('],\n"scheduled_tasks": [],\n"task_executions": []}\n')
+    return SyntheticStore(
+        path=path,
+        accounts=accounts,
+        transactions=transactions,
+        savings=savings,
+        size_bytes=path.stat().st_size,
+    )
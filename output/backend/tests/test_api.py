@@ -1,9 +1,16 @@
+import json
+import pstats
 from decimal import Decimal
 
 from fastapi.testclient import TestClient
 
+from app import main
+from app.async_storage import AsyncStorage
+from app.compression import choose_encoding, supported_encodings
 from app.main import app
+from app.profiling import ProfileStore
 from app.storage import Storage
+from app.summary import StoreSummary
 
 
 def make_client(tmp_path):
@@ -62,6 +69,232 @@ def test_insufficient_funds_block_withdrawal(tmp_path):
     assert "insufficient" in resp.json()["detail"].lower()
 
 
+def test_account_etag_and_if_match(tmp_path):
+    client = make_client(tmp_path)
+    client.post(
+        "/accounts",
+        json={"account_id": "etag1", "name": "Tagged", "balance": "10.00", "account_type": "C"},
+    )
+    resp = client.get("/accounts/etag1")
+    etag = resp.headers["etag"]
+    assert etag == '"%d"' % resp.json()["version"]
+
+    client.post("/accounts/etag1/deposit", json={"amount": "5.00"})
+    update = {"name": "Stale", "balance": "0.00", "account_type": "C"}
+    resp = client.put("/accounts/etag1", json=update, headers={"If-Match": etag})
+    assert resp.status_code == 412
+    assert client.get("/accounts/etag1").json()["balance"] == "15.00"
+
+    current = client.get("/accounts/etag1").headers["etag"]
+    resp = client.put("/accounts/etag1", json={**update, "name": "Fresh"}, headers={"If-Match": f"W/{current}"})
+    assert resp.status_code == 200
+    assert resp.headers["etag"] != current
+    assert client.put("/accounts/etag1", json=update, headers={"If-Match": "*"}).status_code == 200
+
+
+def test_idempotency_key_replays_postings(tmp_path):
+    client = make_client(tmp_path)
+    client.post(
+        "/accounts",
+        json={"account_id": "idem1", "name": "Retrier", "balance": "10.00", "account_type": "C"},
+    )
+    headers = {"Idempotency-Key": "retry-1"}
+    first = client.post("/accounts/idem1/deposit", json={"amount": "5.00"}, headers=headers)
+    retry = client.post("/accounts/idem1/deposit", json={"amount": "5.00"}, headers=headers)
+    assert retry.status_code == 200
+    assert retry.json() == first.json()
+    assert client.get("/accounts/idem1").json()["balance"] == "15.00"
+
+    resp = client.post("/accounts/idem1/withdraw", json={"amount": "5.00"}, headers=headers)
+    assert resp.status_code == 422
+
+    body = {"account_id": "idem1", "transaction_type": "W", "amount": "2.00"}
+    first = client.post("/transactions", json=body, headers={"Idempotency-Key": "retry-2"})
+    retry = client.post("/transactions", json=body, headers={"Idempotency-Key": "retry-2"})
+    assert retry.json()["transaction_id"] == first.json()["transaction_id"]
+    assert client.get("/accounts/idem1").json()["balance"] == "13.00"
+    assert len(client.get("/transactions", params={"account_id": "idem1"}).json()["transactions"]) == 2
+
+
+def test_summary_tracks_mutations(tmp_path):
+    client = make_client(tmp_path)
+    for account_id, balance, account_type in (("sum1", "100.00", "S"), ("sum2", "50.00", "C"), ("sum3", "25.01", "C")):
+        client.post(
+            "/accounts",
+            json={"account_id": account_id, "name": "Summed", "balance": balance, "account_type": account_type},
+        )
+    client.post("/accounts/sum2/deposit", json={"amount": "10.00"})
+    client.post("/accounts/sum2/withdraw", json={"amount": "4.00"})
+    client.post("/accounts/sum1/apply-interest")
+    client.put("/accounts/sum3", json={"name": "Moved", "balance": "30.00", "account_type": "S"})
+    client.delete("/accounts/sum2")
+
+    summary = client.get("/summary").json()
+    assert summary["account_count"] == 2
+    assert summary["total_balance"] == "132.00"
+    assert summary["average_balance"] == "66.00"
+    assert summary["accounts_by_type"] == {"S": {"count": 2, "total_balance": "132.00"}}
+    assert summary["transaction_count"] == 3
+    assert summary["transactions_by_type"]["D"] == {"count": 1, "total_amount": "10.00"}
+    assert summary["interest_this_month"] == "2.00"
+
+    storage = Storage(tmp_path / "store.json")
+    data = storage.load()
+    assert storage.summary() == StoreSummary.build(data.accounts, data.transactions)
+
+
+def read_events(body):
+    events = []
+    for block in body.strip().split("\n\n"):
+        fields = {}
+        for line in block.splitlines():
+            name, _, value = line.partition(":")
+            fields[name] = value.strip()
+        events.append((fields["id"], fields["event"], json.loads(fields["data"]) if fields["data"] else None))
+    return events
+
+
+def test_change_feed_streams_mutations(tmp_path):
+    client = make_client(tmp_path)
+    client.post(
+        "/accounts",
+        json={"account_id": "feed1", "name": "Fed", "balance": "10.00", "account_type": "C"},
+    )
+    client.post("/accounts/feed1/deposit", json={"amount": "5.00"})
+
+    events = read_events(client.get("/events", params={"offset": "0", "follow": "false"}).text)
+    assert events[0] == ("0", "ready", None)
+    changes = [data for _, kind, data in events if kind == "change"]
+    assert [(item["offset"], item["entity"], item["op"]) for item in changes] == [
+        (1, "account", "upsert"),
+        (2, "account", "upsert"),
+        (3, "transaction", "upsert"),
+    ]
+    assert changes[1]["data"]["balance"] == "15.00"
+    cursor = events[-1][0]
+
+    client.delete("/accounts/feed1")
+    resumed = read_events(client.get("/events", params={"follow": "false"}, headers={"Last-Event-ID": cursor}).text)
+    assert [(kind, data and data["op"]) for _, kind, data in resumed] == [("ready", None), ("change", "delete")]
+    assert read_events(client.get("/events", params={"offset": "junk", "follow": "false"}).text)[0][1] == "reset"
+
+
+def test_transactions_date_range_and_recent_statement(tmp_path):
+    client = make_client(tmp_path)
+    client.post(
+        "/accounts",
+        json={"account_id": "range1", "name": "Ranged", "balance": "0.00", "account_type": "C"},
+    )
+    for date, time in [("2025/03/02", "09:00:00"), ("2025/01/15", "12:00:00"), ("2025/02/01", "00:00:00")]:
+        client.post(
+            "/transactions",
+            json={"account_id": "range1", "transaction_type": "D", "amount": "1.00", "date": date, "time": time},
+        )
+
+    def dates(**params):
+        resp = client.get("/transactions", params=params)
+        assert resp.status_code == 200
+        return [txn["date"] for txn in resp.json()["transactions"]]
+
+    assert dates(**{"from": "2025-01-01", "to": "2025/02/01"}) == ["2025/01/15", "2025/02/01"]
+    assert dates(**{"from": "2025/02/01 00:00:01"}) == ["2025/03/02"]
+    assert dates(to="2025/01/15 11:59", account_id="range1") == []
+    assert client.get("/transactions", params={"from": "yesterday"}).status_code == 422
+
+    statement = client.get("/accounts/range1/statement", params={"recent": "true", "limit": 2}).json()
+    assert [txn["date"] for txn in statement["transactions"]] == ["2025/03/02", "2025/02/01"]
+    # The default statement is the oldest transactions by date and time, not by posting order.
+    statement = client.get("/accounts/range1/statement").json()
+    assert [txn["date"] for txn in statement["transactions"]] == ["2025/01/15", "2025/02/01", "2025/03/02"]
+
+
+def test_balance_as_of(tmp_path):
+    client = make_client(tmp_path)
+    client.post("/accounts", json={"account_id": "asof1", "name": "Audited", "balance": "0.00", "account_type": "C"})
+    for date, amount in [("2025/01/15", "4.00"), ("2025/03/02", "1.50")]:
+        client.post(
+            "/transactions",
+            json={"account_id": "asof1", "transaction_type": "D", "amount": amount, "date": date, "time": "12:00:00"},
+        )
+
+    resp = client.get("/accounts/asof1/balance", params={"as_of": "2025-02-01"})
+    assert resp.status_code == 200
+    assert resp.json()["balance"] == "4.00"
+    assert resp.json()["as_of"] == "2025/02/01 23:59:59"
+    assert client.get("/accounts/asof1/balance", params={"as_of": "2025/03/02 12:00"}).json()["balance"] == "5.50"
+    assert client.get("/accounts/asof1/balance", params={"as_of": "2024/12/31"}).status_code == 404
+    assert client.get("/accounts/nope/balance", params={"as_of": "2025/01/01"}).status_code == 404
+    assert client.get("/accounts/asof1/balance", params={"as_of": "last week"}).status_code == 422
+    assert client.get("/accounts/asof1/balance").status_code == 422
+
+
+def test_list_filters_sort_and_fields(tmp_path):
+    client = make_client(tmp_path)
+    for account_id, balance, account_type in [("f1", "50.00", "S"), ("f2", "500.00", "C"), ("f3", "5.00", "S"), ("f4", "75.00", "S")]:
+        client.post(
+            "/accounts",
+            json={"account_id": account_id, "name": f"Filter {account_id}", "balance": balance, "account_type": account_type},
+        )
+    client.post("/accounts/f4/deposit", json={"amount": "100.00"})
+    client.post("/accounts/f1/withdraw", json={"amount": "20.00"})
+
+    resp = client.get(
+        "/accounts",
+        params={"account_type": "s", "min_balance": "10", "sort": "-balance", "fields": "account_id,balance"},
+    )
+    assert resp.json() == {
+        "accounts": [{"balance": "175.00", "account_id": "f4"}, {"balance": "30.00", "account_id": "f1"}]
+    }
+    ids = [item["account_id"] for item in client.get("/accounts", params={"max_balance": "100", "limit": 2}).json()["accounts"]]
+    assert ids == ["f3", "f1"]
+
+    resp = client.get("/transactions", params={"min_amount": "50", "fields": "account_id,amount", "sort": "account_id"})
+    assert resp.json()["transactions"] == [{"account_id": "f4", "amount": "100.00"}]
+    assert client.get("/accounts", params={"fields": "account_id,pin"}).status_code == 422
+    assert client.get("/transactions", params={"sort": "-when"}).status_code == 422
+
+
+def test_account_search(tmp_path):
+    client = make_client(tmp_path)
+    for account_id, name in [("srch1", "Marta Search"), ("srch2", "Searle Jones")]:
+        client.post("/accounts", json={"account_id": account_id, "name": name, "balance": "1.00", "account_type": "C"})
+
+    found = client.get("/accounts/search", params={"q": "sear"}).json()["accounts"]
+    assert [item["account_id"] for item in found] == ["srch2", "srch1"]
+    assert client.get("/accounts/search", params={"q": "srch", "limit": 1}).json()["accounts"][0]["account_id"] == "srch1"
+    assert client.get("/accounts/search", params={"q": ""}).status_code == 422
+
+
+def test_large_responses_are_compressed(tmp_path):
+    client = make_client(tmp_path)
+    for idx in range(40):
+        client.post(
+            "/accounts",
+            json={"account_id": f"gz{idx:03d}", "name": f"Squeezed {idx}", "balance": "10.00", "account_type": "C"},
+        )
+
+    plain = client.get("/accounts", headers={"Accept-Encoding": "identity"})
+    assert "content-encoding" not in plain.headers
+    assert plain.headers["vary"] == "Accept-Encoding"
+    assert int(plain.headers["content-length"]) == len(plain.content)
+    packed = client.get("/accounts", headers={"Accept-Encoding": "gzip, deflate"})
+    assert packed.headers["content-encoding"] == "gzip"
+    assert packed.headers["vary"] == "Accept-Encoding"
+    assert int(packed.headers["content-length"]) < len(plain.content)
+    assert packed.json() == plain.json()
+    assert plain.json()["accounts"][0]["balance"] == "10.00"
+
+    small = client.get("/accounts/gz000", headers={"Accept-Encoding": "gzip"})
+    assert "content-encoding" not in small.headers
+    assert small.headers["vary"] == "Accept-Encoding"
+    events = client.get("/events", params={"follow": "false"}, headers={"Accept-Encoding": "gzip"})
+    assert "vary" not in events.headers
+
+    assert choose_encoding("gzip;q=0, identity") is None
+    assert choose_encoding("*") == supported_encodings()[0]
+    assert choose_encoding("br;q=0.5, gzip;q=0.8") == "gzip"
+
+
 def test_bad_transaction_type(tmp_path):
     client = make_client(tmp_path)
     client.post(
@@ -82,3 +315,89 @@ def test_bad_transaction_type(tmp_path):
         },
     )
     assert resp.status_code == 422
+
+
+def test_server_timing_and_route_metrics(tmp_path):
+    client = make_client(tmp_path)
+    client.post(
+        "/accounts",
+        json={
+            "account_id": "timed1",
+            "name": "Timer",
+            "balance": "10.00",
+            "account_type": "C",
+        },
+    )
+    resp = client.post("/accounts/timed1/deposit", json={"amount": "5.00"})
+    assert resp.status_code == 200
+    timing = resp.headers["server-timing"]
+    for phase in ("app;dur=", "storage-serialize;dur=", "storage-fsync;dur=", "storage-lock-wait;dur="):
+        assert phase in timing
+    # The store was already in memory from the create call.
+    assert 'storage-bytes;desc="read=0 written=' in timing
+
+    app.state.storage = Storage(tmp_path / "store.json")
+    timing = client.get("/accounts").headers["server-timing"]
+    for phase in ("storage-json-load;dur=", "storage-deserialize;dur="):
+        assert phase in timing
+    assert 'storage-bytes;desc="read=0 ' not in timing
+
+    body = client.get("/metrics").text
+    assert 'http_request_duration_seconds_count{method="POST",route="/accounts/{account_id}/deposit",status="200"}' in body
+    assert 'http_storage_phase_seconds_count{route="/accounts/{account_id}/deposit",phase="fsync"}' in body
+    assert 'http_storage_bytes_written_total{route="/accounts/{account_id}/deposit"}' in body
+
+
+def test_profiling_on_demand(tmp_path):
+    client = make_client(tmp_path)
+    original = (main.PROFILER.enabled, main.PROFILER.store)
+    main.PROFILER.store = ProfileStore(tmp_path / "profiles")
+    try:
+        main.PROFILER.enabled = False
+        resp = client.get("/accounts", headers={"X-Profile": "1"})
+        assert "x-profile-name" not in resp.headers
+        assert client.get("/profiles").json()["profiles"] == []
+
+        main.PROFILER.enabled = True
+        assert "x-profile-name" not in client.get("/accounts").headers
+        resp = client.get("/accounts/missing", params={"profile": "1"})
+        assert resp.status_code == 404
+        name = resp.headers["x-profile-name"]
+        assert name.startswith("GET_accounts_account_id/")
+
+        profiles = client.get("/profiles").json()["profiles"]
+        assert [item["name"] for item in profiles] == [name]
+        download = client.get(f"/profiles/{name}")
+        assert download.status_code == 200
+        stats = pstats.Stats(str(main.PROFILER.store.path_for(name)))
+        assert any(func[2] == "get_account" for func in stats.stats)
+        assert client.get("/profiles/../store.json").status_code == 404
+    finally:
+        main.PROFILER.enabled, main.PROFILER.store = original
+
+
+def test_profiled_write_route_includes_writer_frames(tmp_path):
+    client = make_client(tmp_path)
+    original = (main.PROFILER.enabled, main.PROFILER.store)
+    main.PROFILER.store = ProfileStore(tmp_path / "profiles")
+    main.PROFILER.enabled = True
+    try:
+        client.post("/accounts", json={"account_id": "prof1", "name": "Prof", "balance": "10.00", "account_type": "C"})
+        resp = client.post("/accounts/prof1/deposit", json={"amount": "5.00"}, headers={"X-Profile": "1"})
+        assert resp.status_code == 200
+        stats = pstats.Stats(str(main.PROFILER.store.path_for(resp.headers["x-profile-name"])))
+        names = {func[2] for func in stats.stats}
+        assert {"deposit", "_write_raw"} <= names
+    finally:
+        main.PROFILER.enabled, main.PROFILER.store = original
+
+def test_saturated_writer_returns_503(tmp_path):
+    client = make_client(tmp_path)
+    app.state.async_storage = AsyncStorage(app.state.storage, max_pending=0)
+    resp = client.post(
+        "/accounts",
+        json={"account_id": "busy1", "name": "Busy", "balance": "1.00", "account_type": "C"},
+    )
+    assert resp.status_code == 503
+    assert resp.headers["retry-after"] == "1"
+    assert client.get("/accounts").status_code == 200
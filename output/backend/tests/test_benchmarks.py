@@ -0,0 +1,96 @@
+import asyncio
+import inspect
+import json
+from decimal import Decimal
+
+import pytest
+
+from app.storage import Storage
+from benchmarks.cases import CASES
+from benchmarks.harness import compare
+from benchmarks.loadtest import ensure_local, run_in_process
+from benchmarks.payloads import run_payloads
+from benchmarks.runner import run_size
+from benchmarks.stress import reconcile, run_stress
+from benchmarks.synthetic import generate_store
+
+
+def test_synthetic_store_loads(tmp_path):
+    store = generate_store(tmp_path / "store.json", accounts=25, transactions_per_account=3)
+    data = Storage(store.path).load()
+    assert len(data.accounts) == 25
+    assert len(data.transactions) == store.transactions == 75
+    assert sum(1 for account in data.accounts if account.account_type == "S") == store.savings
+    assert json.loads(store.path.read_text())["schema_version"] == 1
+
+
+def test_every_storage_method_is_benchmarked():
+    routing = {"shards", "shard_for", "change_feeds"}
+    public = {name for name, _ in inspect.getmembers(Storage, inspect.isfunction) if not name.startswith("_")} - routing
+    covered = {case.name.split(".", 1)[1] for case in CASES if case.name.startswith("storage.")}
+    assert public <= covered
+
+
+def test_run_size_reports_and_compares(tmp_path):
+    results = run_size(20, tmp_path, cases=["storage.get_account", "services.deposit"], iterations=2, transactions_per_account=1)
+    by_case = {item["case"]: item for item in results}
+    assert set(by_case) == {"storage.get_account", "services.deposit"}
+    deposit = by_case["services.deposit"]
+    assert deposit["iterations"] == 2
+    assert deposit["bytes_written_per_op"] > 0
+    assert by_case["storage.get_account"]["bytes_written_per_op"] == 0
+    assert deposit["p99_ms"] >= deposit["p50_ms"] > 0
+
+    slower = {"results": [dict(deposit, p50_ms=deposit["p50_ms"] * 2)]}
+    regressions = compare(slower, {"results": results}, threshold=0.2)
+    assert [(item.case, item.metric) for item in regressions] == [("services.deposit", "p50_ms")]
+
+
+def test_payload_benchmark_reports_wire_bytes(tmp_path):
+    results = {item["case"]: item for item in run_payloads(20, tmp_path, transactions_per_account=2, iterations=1)}
+    assert results["payload.transactions.direct"]["wire_bytes"] == results["payload.transactions.default"]["wire_bytes"]
+    assert results["payload.transactions.gzip"]["wire_bytes"] < results["payload.transactions.direct"]["wire_bytes"]
+
+
+def test_load_test_reports_per_route(tmp_path):
+    report = asyncio.run(
+        run_in_process(tmp_path, accounts=10, transactions_per_account=1, concurrency=4, duration=60, max_requests=40, interest_interval=None)
+    )
+    assert report["total"]["requests"] == 40
+    assert sum(item["requests"] for item in report["routes"].values()) == 40
+    assert report["total"]["server_errors"] == 0
+    assert all(route.split(" ", 1)[0] in {"GET", "POST"} for route in report["routes"])
+
+
+def test_load_test_refuses_remote_hosts():
+    ensure_local("http://127.0.0.1:8000")
+    with pytest.raises(SystemExit):
+        ensure_local("http://example.com")
+
+
+def test_stress_single_worker_reconciles(tmp_path):
+    store = generate_store(tmp_path / "store.json", accounts=5, transactions_per_account=1)
+    hot = [store.account_id(0), store.account_id(1)]
+    report = run_stress(store.path, hot, threads=1, operations=15)
+    assert report.operations == 15
+    assert report.consistent
+    assert report.transactions_recorded == report.stats.succeeded
+
+
+def test_stress_concurrent_workers_reconcile(tmp_path):
+    store = generate_store(tmp_path / "store.json", accounts=5, transactions_per_account=1)
+    report = run_stress(store.path, [store.account_id(0), store.account_id(1)], threads=4, operations=10)
+    assert report.stats.errors == 0
+    assert report.consistent, report.divergences
+
+
+def test_reconcile_reports_lost_updates(tmp_path):
+    store = generate_store(tmp_path / "store.json", accounts=2, transactions_per_account=0)
+    storage = Storage(store.path)
+    account = storage.get_account(store.account_id(0))
+    opening = {account.account_id: account.balance}
+    storage.update_account_balance(account.account_id, account.balance + Decimal("5.00"))
+
+    divergences, recorded = reconcile(storage, opening, set(), {account.account_id: Decimal("5.00")})
+    assert recorded == 0
+    assert [(item.source, item.difference) for item in divergences] == [("ledger", "5.00")]
@@ -0,0 +1,76 @@
+from pathlib import Path
+
+from app.log_store import ExecutionLogStore
+
+
+def write_log(store: ExecutionLogStore, task_id: str, execution_id: str, text: str) -> None:
+    path = store.live_path(task_id, execution_id)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(text, encoding="utf-8")
+    store.commit(task_id, execution_id, created_at=f"2025-01-01T00:00:{execution_id[-2:]}")
+
+
+def test_commit_appends_to_segment_and_indexes(tmp_path: Path) -> None:
+    store = ExecutionLogStore(tmp_path)
+    write_log(store, "task", "exec-01", "first\n")
+    write_log(store, "task", "exec-02", "second\n")
+
+    assert not store.live_path("task", "exec-01").exists()
+    assert [record.execution_id for record in store.list("task")] == ["exec-02", "exec-01"]
+    assert store.read("task", "exec-02") == b"second\n"
+    assert store.read("task", "exec-02", 1, 3) == b"eco"
+    assert store.size("task", "exec-01") == len("first\n")
+    assert sorted(path.name for path in (tmp_path / "task").iterdir()) == ["index.jsonl", "segment-000001.log"]
+
+
+def test_rolled_segments_are_compressed_and_readable(tmp_path: Path) -> None:
+    store = ExecutionLogStore(tmp_path, segment_max_bytes=32)
+    for idx in range(6):
+        write_log(store, "task", f"exec-{idx:02d}", f"line {idx} " * 3 + "\n")
+
+    names = sorted(path.name for path in (tmp_path / "task").glob("segment-*"))
+    assert any(name.endswith(".log.gz") for name in names)
+    for idx in range(6):
+        assert store.read("task", f"exec-{idx:02d}") == (f"line {idx} " * 3 + "\n").encode()
+
+    reopened = ExecutionLogStore(tmp_path, segment_max_bytes=32)
+    assert len(reopened.list("task")) == 6
+    assert reopened.read("task", "exec-00") == ("line 0 " * 3 + "\n").encode()
+
+
+def test_delete_drops_index_entries_and_dead_segments(tmp_path: Path) -> None:
+    store = ExecutionLogStore(tmp_path, segment_max_bytes=32)
+    for idx in range(6):
+        write_log(store, "task", f"exec-{idx:02d}", f"line {idx} " * 3 + "\n")
+    first_segment = store.get("task", "exec-00").segment
+
+    removed = store.delete("task", ["exec-00", "exec-01", "missing"])
+    assert removed == 2
+    assert store.get("task", "exec-00") is None
+    assert not list((tmp_path / "task").glob(f"segment-{first_segment:06d}*"))
+    assert ExecutionLogStore(tmp_path).get("task", "exec-01") is None
+
+    store.delete_task("task")
+    assert not (tmp_path / "task").exists()
+    assert store.list("task") == []
+
+
+def test_loose_pre_segment_logs_are_imported_once(tmp_path: Path) -> None:
+    store = ExecutionLogStore(tmp_path)
+    write_log(store, "task", "exec-01", "segmented\n")
+    legacy = tmp_path / "task" / "exec-00.log"
+    legacy.write_text("legacy\n", encoding="utf-8")
+    running = store.live_path("task", "exec-02")
+    running.write_text("still running\n", encoding="utf-8")
+    (tmp_path / ".trash").mkdir()
+    (tmp_path / ".trash" / "gone.log").write_text("trash\n", encoding="utf-8")
+
+    reopened = ExecutionLogStore(tmp_path)
+    assert reopened.import_loose(active={"exec-02"}) == 1
+    assert reopened.import_loose(active={"exec-02"}) == 0
+
+    assert [record.execution_id for record in reopened.list("task")] == ["exec-00", "exec-01"]
+    assert not legacy.exists()
+    assert reopened.read("task", "exec-00") == b"legacy\n"
+    assert running.exists()
+    assert (tmp_path / ".trash" / "gone.log").exists()
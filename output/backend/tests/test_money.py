@@ -0,0 +1,47 @@
+import random
+from decimal import ROUND_HALF_UP, Decimal
+from fractions import Fraction
+
+from app import money
+from app.services import INTEREST_RATE
+
+CENT = Decimal("0.01")
+EDGE_CENTS = [0, 1, -1, 24, 25, 26, 49, 50, 51, 99, 100, 12_345, 10**18 + 75, -(10**12) - 25]
+
+
+def reference_quantize(value: Decimal) -> Decimal:
+    return value.quantize(CENT, rounding=ROUND_HALF_UP)
+
+
+def random_decimals(rng: random.Random, count: int):
+    for _ in range(count):
+        places = rng.randint(0, 6)
+        digits = rng.randint(0, 10 ** rng.randint(1, 16))
+        yield Decimal(digits).scaleb(-places) * rng.choice((1, -1))
+
+
+def test_conversions_match_decimal_quantize():
+    rng = random.Random(42)
+    for value in random_decimals(rng, 5_000):
+        expected = reference_quantize(value)
+        cents = money.to_cents(value)
+        assert money.from_cents(cents) == expected
+        assert money.to_cents(expected) == cents
+    for cents in EDGE_CENTS:
+        assert str(money.from_cents(cents)) == str(reference_quantize(Decimal(cents) / 100))
+
+
+def test_interest_matches_decimal_path():
+    rng = random.Random(7)
+    ratio = Fraction(INTEREST_RATE)
+    balances = EDGE_CENTS + [rng.randint(0, 10**14) for _ in range(5_000)]
+    for cents in balances:
+        balance = money.from_cents(cents)
+        expected = reference_quantize(balance + reference_quantize(balance * INTEREST_RATE))
+        assert money.from_cents(cents + money.apply_rate(cents, ratio)) == expected
+
+    for _ in range(2_000):
+        rate = Decimal(rng.randint(-10_000, 10_000)).scaleb(-rng.randint(1, 6))
+        cents = rng.randint(-(10**12), 10**12)
+        expected = reference_quantize(money.from_cents(cents) * rate)
+        assert money.from_cents(money.apply_rate(cents, Fraction(rate))) == expected
@@ -0,0 +1,43 @@
+from decimal import ROUND_HALF_UP, Decimal
+from fractions import Fraction
+
+from hypothesis import given, strategies as st
+
+from app import money
+from app.services import INTEREST_RATE
+
+# Property-based counterparts of test_money.py.
+
+CENT = Decimal("0.01")
+amounts = st.decimals(min_value=-(10**15), max_value=10**15, allow_nan=False, allow_infinity=False, places=6)
+cents = st.integers(min_value=-(10**15), max_value=10**15)
+rates = st.builds(lambda units, places: Decimal(units).scaleb(-places), st.integers(-(10**6), 10**6), st.integers(0, 6))
+
+
+def reference_quantize(value: Decimal) -> Decimal:
+    return value.quantize(CENT, rounding=ROUND_HALF_UP)
+
+
+@given(amounts)
+def test_to_cents_rounds_like_quantize(value):
+    cents_value = money.to_cents(value)
+    assert money.from_cents(cents_value) == reference_quantize(value)
+    assert money.to_cents(reference_quantize(value)) == cents_value
+
+
+@given(cents)
+def test_cents_round_trip(value):
+    assert money.to_cents(money.from_cents(value)) == value
+
+
+@given(cents, rates)
+def test_apply_rate_matches_decimal(value, rate):
+    expected = reference_quantize(money.from_cents(value) * rate)
+    assert money.from_cents(money.apply_rate(value, Fraction(rate))) == expected
+
+
+@given(st.integers(min_value=0, max_value=10**15))
+def test_interest_matches_decimal_path(value):
+    balance = money.from_cents(value)
+    expected = reference_quantize(balance + reference_quantize(balance * INTEREST_RATE))
+    assert money.from_cents(value + money.apply_rate(value, Fraction(INTEREST_RATE))) == expected
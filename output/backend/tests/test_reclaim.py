@@ -0,0 +1,54 @@
+from pathlib import Path
+
+from app.log_store import ExecutionLogStore
+from app.reclaim import ReclamationQueue
+
+
+def commit_log(store: ExecutionLogStore, task_id: str, execution_id: str) -> None:
+    path = store.live_path(task_id, execution_id)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(f"{execution_id}\n", encoding="utf-8")
+    store.commit(task_id, execution_id, created_at="2025-01-01T00:00:00")
+
+
+def test_queue_survives_restart_and_batches_deletes(tmp_path: Path) -> None:
+    store = ExecutionLogStore(tmp_path / "logs")
+    for idx in range(4):
+        commit_log(store, "task", f"exec-{idx}")
+    queue_path = tmp_path / "logs" / ".reclaim-queue.jsonl"
+    queue = ReclamationQueue(store, queue_path)
+    queue.enqueue_executions("task", ["exec-0", "exec-1"])
+    queue.enqueue_executions("task", ["exec-2"])
+    assert queue.depth() == 2
+
+    restarted = ReclamationQueue(ExecutionLogStore(tmp_path / "logs"), queue_path)
+    assert restarted.depth() == 2
+    assert restarted.drain() == 2
+    assert restarted.depth() == 0
+    assert [record.execution_id for record in restarted.log_store.list("task")] == ["exec-3"]
+    assert ReclamationQueue(store, queue_path).depth() == 0
+
+
+def test_failed_jobs_are_retried_with_backoff(tmp_path: Path) -> None:
+    store = ExecutionLogStore(tmp_path / "logs")
+    queue = ReclamationQueue(store, tmp_path / "queue.jsonl")
+    calls = []
+    original = store.delete
+
+    def flaky_delete(task_id, execution_ids):
+        calls.append(list(execution_ids))
+        if len(calls) == 1:
+            raise PermissionError("busy")
+        return original(task_id, execution_ids)
+
+    store.delete = flaky_delete
+    queue.enqueue_executions("task", ["exec-0"])
+    assert queue.drain() == 0
+    stats = queue.stats()
+    assert stats["pending"] == 1 and stats["retrying"] == 1 and stats["failures"] == 1
+
+    job = next(iter(queue._jobs.values()))
+    job.not_before = 0
+    assert queue.drain() == 1
+    assert queue.depth() == 0
+    assert len(calls) == 2
@@ -1,12 +1,20 @@
+import threading
+from datetime import datetime, timedelta, timezone
 from decimal import Decimal
 from pathlib import Path
 
+import pytest
+from apscheduler.events import EVENT_JOB_MISSED, JobExecutionEvent
+
 from fastapi.testclient import TestClient
 
 from app import main
+from app.execution_logs import LogAppender
 from app.models import Account, ScheduledTaskCreate
-from app.scheduled_tasks import ScheduledTaskManager, create_task
+from app.profiling import ProfileStore
+from app.scheduled_tasks import COALESCED, SYNC_JOB_ID, ScheduledTaskManager, create_task, cron_trigger
 from app.storage import Storage
+from app.task_registry import TASK_FUNCTIONS, get_task_function, register_task_function
 
 
 def make_client(tmp_path: Path) -> TestClient:
@@ -97,9 +105,9 @@ def test_heartbeat_execution_creates_log(tmp_path: Path) -> None:
     manager.shutdown()
 
     assert execution is not None
-    log_path = Path(execution.log_path)
-    assert log_path.exists()
-    assert "Hello Heartbeat" in log_path.read_text(encoding="utf-8")
+    assert manager.log_store.get(task.id, execution.id) is not None
+    assert not Path(execution.log_path).exists()
+    assert "Hello Heartbeat" in manager.log_store.read(task.id, execution.id).decode("utf-8")
 
 
 def test_monthend_execution_creates_cobol_style_log_and_applies_interest(tmp_path: Path) -> None:
@@ -137,11 +145,11 @@ def test_monthend_execution_creates_cobol_style_log_and_applies_interest(tmp_pat
     manager.shutdown()
 
     assert execution is not None
-    log_path = Path(execution.log_path)
-    text = log_path.read_text(encoding="utf-8")
+    text = manager.log_store.read(task.id, execution.id).decode("utf-8")
     assert "MONTHEND INTEREST BATCH START" in text
     assert "Applying 2% annual interest to all savings accounts..." in text
     assert "Interest applied to 1 savings accounts." in text
+    assert "Balance checkpoints recorded for" in text
     assert "MONTHEND INTEREST BATCH COMPLETE" in text
 
     savings = storage.get_account("sav-1")
@@ -151,6 +159,39 @@ def test_monthend_execution_creates_cobol_style_log_and_applies_interest(tmp_pat
     transactions = storage.list_transactions(account_id="sav-1", transaction_type="I")
     assert len(transactions) == 1
     assert transactions[0].amount == Decimal("2.00")
+    assert storage.balance_as_of("sav-1", "9999/12/31 23:59:59").balance == Decimal("102.00")
+
+
+def test_monthend_statements_writes_the_closed_month(tmp_path: Path) -> None:
+    storage = Storage(tmp_path / "store.json")
+    storage.upsert_account(Account(account_id="sav-1", name="Savings One", balance=Decimal("100.00"), account_type="S"))
+    manager = ScheduledTaskManager(storage, tmp_path / "logs", statements_dir=tmp_path / "statements")
+    task = create_task(
+        storage,
+        ScheduledTaskCreate(
+            display_name="Month End Statements",
+            function_name="monthend_statements",
+            cron="0 2 1 * *",
+            enabled=True,
+            task_id="statements-1",
+        ),
+    )
+
+    manager.start()
+    first = manager.run_task(task.id)
+    second = manager.run_task(task.id)
+    manager.shutdown()
+
+    assert first is not None and first.status == "success"
+    text = manager.log_store.read(task.id, first.id).decode("utf-8")
+    assert "MONTHEND STATEMENTS BATCH START" in text
+    assert "accounts/sec." in text
+    assert "MONTHEND STATEMENTS BATCH COMPLETE" in text
+    # The account was opened today, after the closed month, so there is nothing to state.
+    assert "0 statements for 1 accounts in 1 parts" in text
+    assert second is not None
+    assert "Resuming" in manager.log_store.read(task.id, second.id).decode("utf-8")
+    assert len(list((tmp_path / "statements").glob("*/part-*.txt"))) == 1
 
 
 def test_retention_prunes_old_executions(tmp_path: Path) -> None:
@@ -162,11 +203,14 @@ def test_retention_prunes_old_executions(tmp_path: Path) -> None:
     for _ in range(55):
         manager.run_task(task.id)
     manager.shutdown()
+    manager.reclaimer.drain()
 
     executions = storage.list_task_executions(task.id)
     assert len(executions) == 50
-    log_files = list((tmp_path / "logs" / task.id).glob("*.log"))
-    assert len(log_files) <= 50
+    assert {record.execution_id for record in manager.log_store.list(task.id)} == {
+        execution.id for execution in executions
+    }
+    assert not list((tmp_path / "logs" / task.id).glob("*-*-*.log"))
 
 
 def test_log_fetch_endpoint(tmp_path: Path) -> None:
@@ -234,3 +278,299 @@ def test_monthend_task_via_api_run_and_log(tmp_path: Path) -> None:
     acct_resp = client.get("/accounts/sav2")
     assert acct_resp.status_code == 200
     assert acct_resp.json()["balance"] == "204.00"
+
+
+def test_unknown_function_rejected(tmp_path: Path) -> None:
+    client = make_client(tmp_path)
+    resp = client.post(
+        "/scheduled-tasks",
+        json={
+            "display_name": "Mystery",
+            "function_name": "does_not_exist",
+            "cron": "0 9 * * *",
+            "enabled": True,
+        },
+    )
+    assert resp.status_code == 400
+    assert "unknown function" in resp.json()["detail"]
+
+    tasks = client.get("/scheduled-tasks").json()["tasks"]
+    heartbeat = next(task for task in tasks if task["function_name"] == "heartbeat")
+    resp = client.put(
+        f"/scheduled-tasks/{heartbeat['id']}",
+        json={
+            "display_name": "Heartbeat",
+            "function_name": "does_not_exist",
+            "cron": "*/5 * * * *",
+            "enabled": True,
+        },
+    )
+    assert resp.status_code == 400
+
+
+def test_run_rejected_while_function_at_concurrency_limit(tmp_path: Path) -> None:
+    client = make_client(tmp_path)
+    manager = main.app.state.scheduler
+    tasks = client.get("/scheduled-tasks").json()["tasks"]
+    heartbeat = next(task for task in tasks if task["function_name"] == "heartbeat")
+
+    function = get_task_function("heartbeat")
+    manager._acquire_slot(function)
+    try:
+        resp = client.post(f"/scheduled-tasks/{heartbeat['id']}/run")
+        assert resp.status_code == 409
+    finally:
+        manager._release_slot(function)
+
+    resp = client.post(f"/scheduled-tasks/{heartbeat['id']}/run")
+    assert resp.status_code == 200
+    assert manager.running_count("heartbeat") == 0
+
+
+def test_failed_running_record_releases_slot(tmp_path: Path, monkeypatch) -> None:
+    storage = Storage(tmp_path / "store.json")
+    manager = ScheduledTaskManager(storage, tmp_path / "logs")
+    manager.ensure_default_tasks()
+    heartbeat = next(task for task in storage.list_scheduled_tasks() if task.function_name == "heartbeat")
+
+    def fail_append(execution) -> None:
+        raise OSError("disk full")
+
+    with monkeypatch.context() as patch:
+        patch.setattr(storage, "append_task_execution", fail_append)
+        with pytest.raises(OSError):
+            manager.run_task(heartbeat.id)
+
+    assert manager.running_count("heartbeat") == 0
+    assert not manager._active_logs
+    assert not list((tmp_path / "logs").rglob("*.log"))
+    execution = manager.run_task(heartbeat.id)
+    assert execution is not None and execution.status == "success"
+
+
+def test_busy_scheduled_run_is_logged(tmp_path: Path, caplog) -> None:
+    storage = Storage(tmp_path / "store.json")
+    manager = ScheduledTaskManager(storage, tmp_path / "logs")
+    manager.ensure_default_tasks()
+    heartbeat = next(task for task in storage.list_scheduled_tasks() if task.function_name == "heartbeat")
+    function = get_task_function("heartbeat")
+    manager._acquire_slot(function)
+    try:
+        with caplog.at_level("WARNING", logger="app.scheduled_tasks"):
+            manager._run_scheduled(heartbeat.id)
+    finally:
+        manager._release_slot(function)
+    assert f"Skipped scheduled run of {heartbeat.id}" in caplog.text
+
+def test_scheduled_job_uses_registry_options(tmp_path: Path) -> None:
+    storage = Storage(tmp_path / "store.json")
+    manager = ScheduledTaskManager(storage, tmp_path / "logs")
+    task = create_task(
+        storage,
+        ScheduledTaskCreate(
+            display_name="Month End Interest",
+            function_name="monthend_interest",
+            cron="0 0 1 * *",
+            enabled=True,
+            task_id="monthend-opts",
+        ),
+    )
+    manager.start()
+    job = manager.scheduler.get_job(task.id)
+    manager.shutdown()
+
+    function = get_task_function("monthend_interest")
+    assert job.max_instances == function.max_instances
+    assert job.coalesce == function.coalesce
+    assert job.misfire_grace_time == function.misfire_grace_time
+
+
+def test_timed_out_run_is_recorded(tmp_path: Path) -> None:
+    release = threading.Event()
+
+    @register_task_function("test_slow", timeout_seconds=0.05)
+    def run_slow(manager: ScheduledTaskManager, log) -> None:
+        log("slow start")
+        release.wait(5)
+
+    storage = Storage(tmp_path / "store.json")
+    manager = ScheduledTaskManager(storage, tmp_path / "logs")
+    task = create_task(
+        storage,
+        ScheduledTaskCreate(
+            display_name="Slow",
+            function_name="test_slow",
+            cron="0 0 1 * *",
+            enabled=True,
+        ),
+    )
+    try:
+        execution = manager.run_task(task.id)
+        assert execution is not None and execution.status == "timeout"
+        assert manager.running_count("test_slow") == 1
+    finally:
+        release.set()
+        TASK_FUNCTIONS.pop("test_slow", None)
+
+
+def test_sync_jobs_only_touches_changed_tasks(tmp_path: Path) -> None:
+    storage = Storage(tmp_path / "store.json")
+    manager = ScheduledTaskManager(storage, tmp_path / "logs")
+    manager.ensure_default_tasks()
+    for idx in range(3):
+        create_task(
+            storage,
+            ScheduledTaskCreate(
+                display_name=f"Task {idx}",
+                function_name="heartbeat",
+                cron="0 9 * * *",
+                enabled=True,
+                task_id=f"task-{idx}",
+            ),
+        )
+    manager.start()
+    try:
+        untouched = manager.scheduler.get_job("task-0")
+        assert manager.scheduler.get_job("task-1").trigger is untouched.trigger
+
+        changed = storage.get_scheduled_task("task-1")
+        storage.upsert_scheduled_task(changed.model_copy(update={"cron": "*/10 * * * *"}))
+        storage.delete_scheduled_task("task-2")
+        manager.sync_jobs()
+
+        assert manager.scheduler.get_job("task-0") is untouched
+        assert str(manager.scheduler.get_job("task-1").trigger) == str(cron_trigger("*/10 * * * *"))
+        assert manager.scheduler.get_job("task-2") is None
+        assert manager.scheduler.get_job(SYNC_JOB_ID) is not None
+    finally:
+        manager.shutdown()
+
+
+def test_log_appender_flushes_incrementally(tmp_path: Path) -> None:
+    log_path = tmp_path / "exec.log"
+    appender = LogAppender(log_path, flush_bytes=16, flush_interval=60)
+    appender.write_line("short")
+    assert log_path.read_bytes() == b""
+    appender.write_line("long enough to flush")
+    assert log_path.read_bytes() == b"short\nlong enough to flush\n"
+    appender.write_line("tail")
+    appender.close()
+    assert log_path.read_text(encoding="utf-8").endswith("tail\n")
+
+
+def test_log_tail_supports_offsets_ranges_and_follow(tmp_path: Path) -> None:
+    client = make_client(tmp_path)
+    client.post(
+        "/accounts",
+        json={"account_id": "sav3", "name": "Saver", "balance": "10.00", "account_type": "S"},
+    )
+    create_resp = client.post(
+        "/scheduled-tasks",
+        json={
+            "display_name": "Month End",
+            "function_name": "monthend_interest",
+            "cron": "0 0 1 * *",
+            "enabled": True,
+            "task_id": "monthend-tail",
+        },
+    )
+    assert create_resp.status_code == 200
+    execution = client.post("/scheduled-tasks/monthend-tail/run").json()
+    assert execution["status"] == "success"
+    assert execution["finished_at"] is not None
+    url = f"/scheduled-tasks/monthend-tail/executions/{execution['id']}/log/tail"
+    full = client.get(f"/scheduled-tasks/monthend-tail/executions/{execution['id']}/log").text.encode()
+
+    resp = client.get(url, params={"offset": 10})
+    assert resp.status_code == 200
+    assert resp.content == full[10:]
+    assert resp.headers["X-Log-Offset"] == str(len(full))
+    assert resp.headers["X-Log-Complete"] == "true"
+
+    resp = client.get(url, headers={"Range": "bytes=0-7"})
+    assert resp.status_code == 206
+    assert resp.content == full[:8]
+    assert resp.headers["Content-Range"] == f"bytes 0-7/{len(full)}"
+
+    resp = client.get(url, headers={"Range": f"bytes={len(full)}-"})
+    assert resp.status_code == 416
+
+    with client.stream("GET", url, params={"follow": "true"}) as stream:
+        body = "".join(stream.iter_text())
+    assert "data: MONTHEND INTEREST BATCH START" in body
+    assert body.rstrip().endswith("event: end\ndata:")
+
+
+def test_task_delete_defers_log_removal_to_reclaimer(tmp_path: Path) -> None:
+    client = make_client(tmp_path)
+    manager = main.app.state.scheduler
+    tasks = client.get("/scheduled-tasks").json()["tasks"]
+    heartbeat = next(task for task in tasks if task["function_name"] == "heartbeat")
+    client.post(f"/scheduled-tasks/{heartbeat['id']}/run")
+
+    resp = client.delete(f"/scheduled-tasks/{heartbeat['id']}")
+    assert resp.status_code == 200
+    assert not (main.LOGS_DIR / heartbeat["id"]).exists()
+    assert client.get("/maintenance/reclaim").json()["pending"] == 1
+
+    assert manager.reclaimer.drain() == 1
+    assert not list((main.LOGS_DIR / ".trash").iterdir())
+    status = client.get("/maintenance/reclaim").json()
+    assert status["pending"] == 0
+    assert status["reclaimed"] == 1
+
+
+def test_cron_run_records_fire_lag_and_metrics(tmp_path: Path) -> None:
+    client = make_client(tmp_path)
+    manager = main.app.state.scheduler
+    create_task(
+        manager.storage,
+        ScheduledTaskCreate(
+            display_name="Every minute",
+            function_name="heartbeat",
+            cron="* * * * *",
+            enabled=True,
+            task_id="every-minute",
+        ),
+    )
+    manager.start()
+    try:
+        job = manager.scheduler.get_job("every-minute")
+        now = datetime.now(timezone.utc).replace(second=0, microsecond=0)
+        before = COALESCED.value(function="heartbeat")
+        manager._record_submission(job, [now - timedelta(minutes=5)])
+        manager._record_submission(job, [now - timedelta(seconds=60)])
+        assert COALESCED.value(function="heartbeat") == before + 3
+        manager._on_job_event(JobExecutionEvent(EVENT_JOB_MISSED, "every-minute", "default", now - timedelta(minutes=5)))
+        manager._run_scheduled("every-minute")
+    finally:
+        manager.shutdown()
+
+    execution = max(manager.storage.list_task_executions("every-minute"), key=lambda item: item.started_at)
+    assert execution.trigger == "cron"
+    assert execution.scheduled_at == (now - timedelta(seconds=60)).isoformat()
+    assert execution.fire_lag_ms >= 60000
+    assert execution.queue_wait_ms >= 0
+    assert execution.duration_ms >= 0
+
+    body = client.get("/metrics").text
+    assert 'scheduler_runs_total{function="heartbeat",status="success",trigger="cron"}' in body
+    assert 'scheduler_misfires_total{function="heartbeat"}' in body
+    assert "scheduler_fire_lag_seconds_bucket" in body
+
+
+def test_sampled_scheduled_runs_are_profiled(tmp_path: Path) -> None:
+    storage = Storage(tmp_path / "store.json")
+    profiles = ProfileStore(tmp_path / "profiles")
+    manager = ScheduledTaskManager(storage, tmp_path / "logs", profile_store=profiles, profile_sample_rate=1.0)
+    manager.ensure_default_tasks()
+    task = next(task for task in storage.list_scheduled_tasks() if task.function_name == "heartbeat")
+    manager.run_task(task.id)
+
+    items = profiles.list()
+    assert len(items) == 1
+    assert items[0].label == "scheduled_heartbeat"
+
+    manager.profile_sample_rate = 0.0
+    manager.run_task(task.id)
+    assert len(profiles.list()) == 1
@@ -0,0 +1,80 @@
+from decimal import Decimal
+
+from fastapi.testclient import TestClient
+
+from app.main import app
+from app.models import Account, Transaction
+from app.services import deposit
+from app.sharding import ShardedStorage, rebalance, shard_index
+from app.storage import Storage
+
+
+def _account(account_id, account_type="S", balance="100.00"):
+    return Account(account_id=account_id, name=f"Owner {account_id}", balance=Decimal(balance), account_type=account_type)
+
+
+def test_accounts_and_transactions_share_a_shard(tmp_path):
+    storage = ShardedStorage(tmp_path / "shards", shard_count=3)
+    for index in range(12):
+        storage.upsert_account(_account(f"a{index}"))
+    deposit(storage, "a7", Decimal("5.00"))
+
+    assert len(storage.list_accounts()) == 12
+    home = storage.shards()[shard_index("a7", 3)]
+    assert home.get_account("a7").balance == Decimal("105.00")
+    assert [txn.account_id for txn in home.list_transactions()] == ["a7"]
+    assert sum(len(shard.list_accounts()) > 0 for shard in storage.shards()) > 1
+    assert ShardedStorage(tmp_path / "shards", shard_count=8).shard_count == 3
+
+
+def test_rebalance_preserves_data(tmp_path):
+    source = Storage(tmp_path / "store.json")
+    for index in range(20):
+        source.upsert_account(_account(f"r{index}"))
+        source.append_transaction(
+            Transaction(
+                transaction_id=f"t{index}",
+                account_id=f"r{index}",
+                transaction_type="D",
+                amount=Decimal("1.00"),
+                date="2025/01/01",
+                time="00:00:00",
+            )
+        )
+    root = tmp_path / "shards"
+    first = rebalance(root, 2, source=tmp_path / "store.json")
+    second = rebalance(root, 5)
+
+    assert second.generation == first.generation + 1
+    assert len(list(root.glob("shard-g*.json"))) == 5
+    assert sorted(account.account_id for account in second.list_accounts()) == sorted(f"r{index}" for index in range(20))
+    for shard in second.shards():
+        owned = {account.account_id for account in shard.list_accounts()}
+        assert {txn.account_id for txn in shard.list_transactions()} == owned
+
+
+def test_api_on_sharded_store(tmp_path):
+    app.state.storage = ShardedStorage(tmp_path / "shards", shard_count=4)
+    client = TestClient(app)
+    for index in range(8):
+        account_type = "S" if index % 2 == 0 else "C"
+        resp = client.post(
+            "/accounts",
+            json={"account_id": f"s{index}", "name": "Sharded", "balance": "100.00", "account_type": account_type},
+        )
+        assert resp.status_code == 200
+    assert client.post("/accounts/s1/deposit", json={"amount": "10.00"}).json()["account"]["balance"] == "110.00"
+
+    batch = client.post("/accounts/apply-interest").json()
+    assert batch["applied_count"] == 4
+    assert batch["total_interest"] == "8.00"
+    assert len(client.get("/accounts").json()["accounts"]) == 8
+    assert client.get("/accounts/s0/statement").json()["transactions"][0]["transaction_type"] == "I"
+    summary = client.get("/summary").json()
+    assert (summary["account_count"], summary["total_balance"]) == (8, "818.00")
+    assert summary["transactions_by_type"]["I"] == {"count": 4, "total_amount": "8.00"}
+
+    body = client.get("/events", params={"offset": "0.0.0.0.0", "follow": "false"}).text
+    changes = [block for block in body.split("\n\n") if "event: change" in block]
+    assert len(changes) == 8 + 2 + 4 * 2
+    assert body.strip().split("\n\n")[-1].startswith("id: 0.")
@@ -0,0 +1,78 @@
+import json
+from datetime import date
+from decimal import Decimal
+
+from app.models import Account, Transaction
+from app.sharding import ShardedStorage
+from app.statements import PROGRESS_NAME, StatementPeriod, generate_statements
+from app.storage import Storage
+
+
+def seed(storage):
+    # A migrated book: balances as of today, no checkpoints yet.
+    store = storage.load()
+    for account_id, balance in [("a1", "100.00"), ("a2", "50.00"), ("a3", "7.00")]:
+        store.accounts.append(Account(account_id=account_id, name=f"Name {account_id}", balance=Decimal(balance), account_type="S"))
+    for idx, (account_id, kind, amount, stamp) in enumerate(
+        [
+            ("a1", "D", "25.00", "2025/02/10 09:00:00"),
+            ("a1", "W", "5.00", "2025/03/01 00:00:00"),
+            ("a2", "I", "1.50", "2025/02/28 23:59:59"),
+        ]
+    ):
+        date_part, time_part = stamp.split()
+        store.transactions.append(
+            Transaction(
+                transaction_id=f"t{idx}",
+                account_id=account_id,
+                transaction_type=kind,
+                amount=Decimal(amount),
+                date=date_part,
+                time=time_part,
+            )
+        )
+    storage.save(store)
+
+
+def test_statement_period_bounds():
+    assert StatementPeriod.closed_before(date(2025, 1, 15)) == StatementPeriod(
+        month="2024/12", start="2024/12/01 00:00:00", end="2024/12/31 23:59:59"
+    )
+    assert StatementPeriod.of("2024/02").end == "2024/02/29 23:59:59"
+
+
+def test_statements_cover_the_month_and_resume(tmp_path):
+    storage = Storage(tmp_path / "store.json")
+    seed(storage)
+    period = StatementPeriod.of("2025/02")
+    run = generate_statements(storage, tmp_path / "out", period, workers=2, chunk_size=1)
+    assert (run.accounts, run.resumed, run.statements, run.parts) == (3, 0, 3, 3)
+
+    directory = tmp_path / "out" / "2025-02"
+    text = "".join(path.read_text() for path in sorted(directory.glob("part-*.txt")))
+    a1 = text.split("\n\n")[0]
+    # Worked back from today's balance, February closes before the March withdrawal.
+    assert "OPENING BALANCE:             $       80.00" in a1
+    assert "2025/02/10 | 09:00:00 | DEP  | $       25.00" in a1
+    assert "CLOSING BALANCE:             $      105.00" in a1
+    assert "2025/03/01" not in text
+    assert "INT " in text and "No transactions this period." in text
+
+    # Interrupted after two parts: the third was written but never recorded.
+    progress = json.loads((directory / PROGRESS_NAME).read_text())
+    progress["parts"] = [part for part in progress["parts"] if part["first"] != "a3"]
+    (directory / PROGRESS_NAME).write_text(json.dumps(progress))
+    rerun = generate_statements(storage, tmp_path / "out", period, workers=2, chunk_size=1)
+    assert (rerun.resumed, rerun.statements, rerun.parts) == (2, 1, 3)
+    assert len(list(directory.glob("part-*.txt"))) == 3
+    assert "".join(path.read_text() for path in sorted(directory.glob("part-*.txt"))) == text
+
+
+def test_statements_on_sharded_store(tmp_path):
+    storage = ShardedStorage(tmp_path / "shards", shard_count=3)
+    seed(storage)
+    period = StatementPeriod.of("2025/02")
+    run = generate_statements(storage, tmp_path / "out", period)
+    assert (run.accounts, run.statements, run.parts) == (3, 3, 1)
+    text = (tmp_path / "out" / "2025-02" / "part-00000.txt").read_text()
+    assert [line.split()[3] for line in text.splitlines() if line.startswith("STATEMENT")] == ["a1", "a2", "a3"]
@@ -1,8 +1,16 @@
+import asyncio
+import threading
 from decimal import Decimal
 
-from app.services import apply_interest_for_account, list_statement
-from app.storage import Storage
-from app.models import Account, Transaction
+import pytest
+
+from app.async_storage import AsyncStorage, WriteQueueFullError
+from app.services import DomainError, apply_interest_for_account, create_transaction, deposit, list_statement
+from app import storage as storage_module
+from app.ids import uuid7
+from app.search import SearchIndex
+from app.storage import Storage, VersionConflictError
+from app.models import Account, IdempotencyRecord, Transaction, TransactionCreate
 
 
 def test_interest_only_savings(tmp_path):
@@ -37,3 +45,371 @@ def test_statement_limit(tmp_path):
     statement = list_statement(storage, "acct")
     assert len(statement) == 5
     assert statement[0].transaction_id == "t0"
+
+
+def test_store_cache_tracks_external_writes(tmp_path):
+    storage = Storage(tmp_path / "store.json")
+    storage.upsert_account(Account(account_id="a1", name="First", balance=Decimal("1.00"), account_type="C"))
+    assert storage.is_cached()
+
+    other = Storage(tmp_path / "store.json")
+    other.upsert_account(Account(account_id="a2", name="Second", balance=Decimal("2.00"), account_type="C"))
+    assert not storage.is_cached()
+    assert [account.account_id for account in storage.list_accounts()] == ["a1", "a2"]
+
+    loaded = storage.load()
+    loaded.accounts.clear()
+    assert len(storage.list_accounts()) == 2
+
+
+def test_async_writes_are_serialized(tmp_path):
+    storage = Storage(tmp_path / "store.json")
+    storage.upsert_account(Account(account_id="hot", name="Hot", balance=Decimal("0.00"), account_type="C"))
+    async_storage = AsyncStorage(storage, idle_seconds=0.1)
+
+    async def hammer():
+        await asyncio.gather(*(async_storage.write(deposit, "hot", Decimal("1.00")) for _ in range(25)))
+        return await async_storage.read(Storage.get_account, "hot")
+
+    account = asyncio.run(hammer())
+    assert account.balance == Decimal("25.00")
+    assert len(storage.list_transactions(account_id="hot")) == 25
+
+
+def test_only_inline_reads_run_on_the_event_loop(tmp_path):
+    storage = Storage(tmp_path / "store.json")
+    storage.list_accounts()
+    async_storage = AsyncStorage(storage)
+
+    async def threads():
+        loop_thread = threading.get_ident()
+        here = lambda storage: threading.get_ident() == loop_thread
+        return await async_storage.read(here), await async_storage.read(here, inline=True)
+
+    assert asyncio.run(threads()) == (False, True)
+
+
+def test_writer_queue_is_bounded(tmp_path):
+    storage = Storage(tmp_path / "store.json")
+    writer = AsyncStorage(storage, idle_seconds=0.1, max_pending=1)
+    release = threading.Event()
+    blocked = writer.submit(lambda storage: release.wait(5))
+    with pytest.raises(WriteQueueFullError) as excinfo:
+        writer.submit(Storage.list_accounts)
+    assert excinfo.value.retry_after >= 1
+
+    # Background work is never refused, and commands issued from the writer run inline.
+    nested = writer.submit(lambda storage: writer.call(Storage.list_accounts), bounded=False)
+    release.set()
+    assert blocked.result(timeout=5) is True
+    assert nested.result(timeout=5) == []
+
+
+def test_balance_updates_compare_and_swap(tmp_path):
+    storage = Storage(tmp_path / "store.json")
+    created = storage.upsert_account(Account(account_id="v1", name="Versioned", balance=Decimal("10.00"), account_type="C"))
+    assert created.version == 1
+
+    updated = storage.update_account_balance("v1", Decimal("15.00"), expected_version=1)
+    assert updated.version == 2
+    with pytest.raises(VersionConflictError) as excinfo:
+        storage.update_account_balance("v1", Decimal("99.00"), expected_version=1)
+    assert (excinfo.value.expected, excinfo.value.actual) == (1, 2)
+    assert Storage(tmp_path / "store.json").get_account("v1").balance == Decimal("15.00")
+
+    # A deposit that races with another writer re-reads and applies on top of it.
+    other = Storage(tmp_path / "store.json")
+    original = storage.apply_transaction
+    calls = []
+
+    def racing_apply(transaction, new_balance, expected_version, *args):
+        if not calls:
+            other.update_account_balance(transaction.account_id, Decimal("20.00"))
+        calls.append(expected_version)
+        return original(transaction, new_balance, expected_version, *args)
+
+    storage.apply_transaction = racing_apply
+    account, _ = deposit(storage, "v1", Decimal("1.00"))
+    assert calls == [2, 3]
+    assert (account.balance, account.version) == (Decimal("21.00"), 4)
+    assert len(storage.list_transactions(account_id="v1")) == 1
+
+
+def test_failed_posting_leaves_balance_and_key_untouched(tmp_path, monkeypatch):
+    storage = Storage(tmp_path / "store.json")
+    storage.upsert_account(Account(account_id="once", name="Once", balance=Decimal("10.00"), account_type="C"))
+
+    def crash(self, store, transaction, idempotency=None):
+        raise OSError("crashed before the transaction was appended")
+
+    with monkeypatch.context() as patch:
+        patch.setattr(Storage, "_add_transaction", crash)
+        with pytest.raises(OSError):
+            deposit(storage, "once", Decimal("5.00"), idempotency_key="k")
+
+    reopened = Storage(tmp_path / "store.json")
+    assert reopened.get_account("once").balance == Decimal("10.00")
+    assert reopened.list_transactions(account_id="once") == []
+    assert reopened.get_idempotency_record("once", "k") is None
+
+    # The client retries with the same key: applied once, then replayed.
+    first, txn = deposit(storage, "once", Decimal("5.00"), idempotency_key="k")
+    again, replayed = deposit(storage, "once", Decimal("5.00"), idempotency_key="k")
+    assert first.balance == again.balance == Decimal("15.00")
+    assert replayed.transaction_id == txn.transaction_id
+    assert len(storage.list_transactions(account_id="once")) == 1
+
+
+def test_same_key_from_two_storages_posts_once(tmp_path):
+    Storage(tmp_path / "store.json").upsert_account(
+        Account(account_id="dup", name="Dup", balance=Decimal("0.00"), account_type="C")
+    )
+    storages = [Storage(tmp_path / "store.json") for _ in range(2)]
+    start = threading.Barrier(len(storages))
+    results = {}
+
+    def post(storage):
+        start.wait()
+        results[id(storage)] = [
+            deposit(storage, "dup", Decimal("1.00"), idempotency_key=f"key-{idx}")[1].transaction_id
+            for idx in range(30)
+        ]
+
+    threads = [threading.Thread(target=post, args=(storage,)) for storage in storages]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    reopened = Storage(tmp_path / "store.json")
+    assert len(reopened.list_transactions(account_id="dup")) == 30
+    assert reopened.get_account("dup").balance == Decimal("30.00")
+    first, second = results.values()
+    assert first == second
+
+    # The key is checked again inside the write, so a stale caller replays instead of posting.
+    account = reopened.get_account("dup")
+    stale = Transaction(transaction_id="stale", account_id="dup", transaction_type="D", amount=Decimal("1.00"))
+    updated, posted = reopened.apply_transaction(stale, Decimal("31.00"), account.version, "key-0", "D:1.00")
+    assert posted.transaction_id == first[0]
+    with pytest.raises(DomainError) as excinfo:
+        deposit(reopened, "dup", Decimal("2.00"), idempotency_key="key-0")
+    assert excinfo.value.status_code == 422
+    assert reopened.get_account("dup").balance == Decimal("30.00")
+
+
+def test_idempotency_records_are_bounded_and_expire(tmp_path):
+    storage = Storage(tmp_path / "store.json")
+    storage.idempotency_max_keys = 2
+    account = storage.upsert_account(Account(account_id="k1", name="Keys", balance=Decimal("0.00"), account_type="C"))
+    for idx, created_at in enumerate([100.0, 200.0, 300.0]):
+        txn = Transaction(
+            transaction_id=f"t{idx}",
+            account_id="k1",
+            transaction_type="D",
+            amount=Decimal("1.00"),
+            date="2025/01/01",
+            time="00:00:00",
+        )
+        record = IdempotencyRecord(key=f"key{idx}", fingerprint="D:1.00", created_at=created_at, account=account, transaction=txn)
+        storage.append_transaction(txn, record)
+
+    assert list(storage.load().idempotency) == [("k1", "key1"), ("k1", "key2")]
+    # Records older than the TTL are ignored on lookup and dropped on the next write.
+    storage.idempotency_ttl_seconds = 1
+    assert storage.get_idempotency_record("k1", "key2") is None
+    deposit(storage, "k1", Decimal("1.00"), idempotency_key="fresh")
+    reopened = Storage(tmp_path / "store.json")
+    assert list(reopened.load().idempotency) == [("k1", "fresh")]
+    assert reopened.get_idempotency_record("k1", "fresh").transaction.amount == Decimal("1.00")
+
+
+def test_change_log_is_bounded(tmp_path, monkeypatch):
+    monkeypatch.setattr(storage_module, "CHANGE_LOG_LIMIT", 3)
+    storage = Storage(tmp_path / "store.json")
+    for idx in range(5):
+        storage.upsert_account(Account(account_id=f"c{idx}", name="Logged", balance=Decimal("1.00"), account_type="C"))
+
+    assert storage.change_offset() == 5
+    changes, complete = storage.changes_since(2)
+    assert complete and [change.key for change in changes] == ["c2", "c3", "c4"]
+    assert storage.changes_since(1) == (changes, False)
+    assert storage.changes_since(5) == ([], True)
+    assert storage.changes_since(9) == ([], False)
+
+    storage.save(storage.load())
+    changes, _ = Storage(tmp_path / "store.json").changes_since(5)
+    assert [(change.offset, change.entity, change.op) for change in changes] == [(6, "store", "reset")]
+
+
+def test_uuid7_ids_sort_in_creation_order():
+    ids = [uuid7() for _ in range(5_000)]
+    assert all(value.version == 7 for value in ids)
+    assert [str(value) for value in ids] == sorted(str(value) for value in ids)
+    assert len(set(ids)) == len(ids)
+
+
+def test_transaction_index_follows_appends(tmp_path):
+    storage = Storage(tmp_path / "store.json")
+    times = ["2025/01/03 10:00:00", "2025/01/01 08:00:00", "2025/01/02 09:00:00", "2025/01/02 09:00:00"]
+    for idx, stamp in enumerate(times):
+        date, time = stamp.split()
+        account_id = "odd" if idx % 2 else "even"
+        storage.append_transaction(
+            Transaction(
+                transaction_id=f"t{idx}",
+                account_id=account_id,
+                transaction_type="D",
+                amount=Decimal("1.00"),
+                date=date,
+                time=time,
+            )
+        )
+        if idx == 1:
+            assert [txn.transaction_id for txn in storage.list_transactions(start="2025/01/01 00:00:00")] == ["t1", "t0"]
+
+    in_range = storage.list_transactions(start="2025/01/02 00:00:00", end="2025/01/03 10:00:00")
+    assert [txn.transaction_id for txn in in_range] == ["t2", "t3", "t0"]
+    assert [txn.transaction_id for txn in storage.transactions_for_account("even", newest_first=True)] == ["t0", "t2"]
+    assert storage.transactions_for_account("odd", limit=0, newest_first=True) == []
+
+    reopened = Storage(tmp_path / "store.json")
+    odd = reopened.list_transactions(account_id="odd", end="2025/01/02 08:59:59")
+    assert [txn.transaction_id for txn in odd] == ["t1"]
+
+
+def test_account_index_follows_writes(tmp_path):
+    storage = Storage(tmp_path / "store.json")
+    for account_id, balance, account_type in [("a", "30.00", "S"), ("b", "10.00", "C"), ("c", "20.00", "S")]:
+        storage.upsert_account(Account(account_id=account_id, name=account_id, balance=Decimal(balance), account_type=account_type))
+    assert [acct.account_id for acct in storage.list_accounts(min_balance=Decimal("0"))] == ["b", "c", "a"]
+
+    storage.update_account_balance("a", Decimal("5.00"))
+    storage.upsert_account(Account(account_id="b", name="b", balance=Decimal("25.00"), account_type="S"))
+    storage.delete_account("c")
+    assert [acct.account_id for acct in storage.list_accounts(account_type="S")] == ["a", "b"]
+    assert storage.list_accounts(account_type="C") == []
+    assert [acct.account_id for acct in storage.list_accounts(min_balance=Decimal("5.00"), max_balance=Decimal("24.99"))] == ["a"]
+    assert [acct.account_id for acct in storage.list_accounts()] == ["a", "b"]
+
+
+def test_delete_keeps_account_positions_current(tmp_path):
+    storage = Storage(tmp_path / "store.json")
+    for account_id in ["a", "b", "c"]:
+        storage.upsert_account(Account(account_id=account_id, name=account_id, balance=Decimal("1.00"), account_type="S"))
+    assert storage.get_account("a") is not None
+
+    storage.delete_account("a")
+    assert storage._snapshot().account_positions == {"b": 0, "c": 1}
+    assert storage.get_account("c").account_id == "c"
+    assert storage.get_account("a") is None
+
+
+def test_search_index_ranks_and_follows_writes(tmp_path):
+    storage = Storage(tmp_path / "store.json")
+    for account_id, name in [("ADA01", "Ada Lovelace"), ("LOV02", "Love Ada"), ("GRC03", "Grace Hopper"), ("ADA", "Zed Adams")]:
+        storage.upsert_account(Account(account_id=account_id, name=name, balance=Decimal("1.00"), account_type="C"))
+
+    def search(query, limit=20):
+        return [acct.account_id for acct in storage.search_accounts(query, limit)]
+
+    assert search("ada") == ["ADA", "ADA01", "LOV02"]
+    assert search("ada", limit=2) == ["ADA", "ADA01"]
+    assert search("opp") == ["GRC03"]
+    assert search("  LOVE ") == ["LOV02", "ADA01"]
+    assert search("xyz") == []
+
+    storage.update_account_balance("GRC03", Decimal("9.00"))
+    assert storage.search_accounts("hopper")[0].balance == Decimal("9.00")
+    storage.upsert_account(Account(account_id="GRC03", name="Grace Brewster", balance=Decimal("9.00"), account_type="C"))
+    storage.delete_account("ADA01")
+    assert search("hop") == []
+    assert search("brew") == ["GRC03"]
+    assert search("ada") == ["ADA", "LOV02"]
+    assert Storage(tmp_path / "store.json").search_accounts("brew")[0].name == "Grace Brewster"
+
+
+def test_search_index_writes_share_the_sorted_lists():
+    accounts = [Account(account_id=f"C{idx:03d}", name=f"Customer {idx}", balance=Decimal("1.00"), account_type="C") for idx in range(100)]
+    index = SearchIndex.build(accounts)
+    renamed = accounts[7].model_copy(update={"name": "Ada Lovelace"})
+    updated = index.with_account(accounts[7], renamed).with_account(accounts[8], None)
+    assert updated.ids is index.ids and updated.grams is index.grams
+    assert updated.search("ada", 5) == ["C007"]
+    assert updated.search("customer 8", 5) == ["C080", "C081", "C082", "C083", "C084"]
+
+    # Past the pending limit the changes are merged into new lists.
+    for account in accounts[10:90]:
+        updated = updated.with_account(account, account.model_copy(update={"name": f"Renamed {account.account_id}"}))
+    assert len(updated.pending) < 80
+    live = [renamed, *accounts[:7], accounts[9], *accounts[90:]]
+    live += [account.model_copy(update={"name": f"Renamed {account.account_id}"}) for account in accounts[10:90]]
+    for query in ["ada", "renamed c01", "customer 9", "c00"]:
+        assert updated.search(query, 10) == SearchIndex.build(live).search(query, 10)
+
+
+def test_balance_as_of_replays_from_nearest_checkpoint(tmp_path, monkeypatch):
+    storage = Storage(tmp_path / "store.json")
+    monkeypatch.setattr(storage_module, "_now_key", lambda: "2025/01/01 00:00:00")
+    storage.upsert_account(Account(account_id="a", name="A", balance=Decimal("10.00"), account_type="C"))
+
+    def post(transaction_type, amount, stamp):
+        date, time = stamp.split()
+        payload = TransactionCreate(account_id="a", transaction_type=transaction_type, amount=amount, date=date, time=time)
+        create_transaction(storage, payload)
+
+    def balance(as_of, account_id="a"):
+        replay = storage.balance_as_of(account_id, as_of)
+        return None if replay is None else (replay.balance, replay.checkpoint and replay.checkpoint.as_of, replay.replayed)
+
+    post("D", Decimal("5.00"), "2025/01/10 12:00:00")
+    assert storage.record_checkpoints("2025/01/31 23:59:59") == 1
+    post("W", Decimal("3.00"), "2025/02/10 12:00:00")
+    assert storage.record_checkpoints("2025/02/28 23:59:59") == 1
+    assert storage.record_checkpoints("2025/03/31 23:59:59") == 0
+    # Posted late but dated January: both later checkpoints take it in.
+    post("D", Decimal("1.00"), "2025/01/20 09:00:00")
+
+    assert balance("2024/12/31 23:59:59") is None
+    assert balance("2025/01/01 00:00:00") == (Decimal("10.00"), "2025/01/01 00:00:00", 0)
+    assert balance("2025/01/15 00:00:00") == (Decimal("15.00"), "2025/01/01 00:00:00", 1)
+    assert balance("2025/02/15 00:00:00") == (Decimal("13.00"), "2025/01/31 23:59:59", 1)
+    assert balance("2025/12/31 23:59:59") == (Decimal("13.00"), "2025/02/28 23:59:59", 0)
+    assert Storage(tmp_path / "store.json").balance_as_of("a", "2025/01/25 00:00:00").balance == Decimal("16.00")
+
+    # Legacy accounts have no checkpoints and no opening transaction: work back from today.
+    store = storage.load()
+    store.accounts.append(Account(account_id="old", name="Old", balance=Decimal("50.00"), account_type="C"))
+    store.transactions.append(
+        Transaction(transaction_id="x1", account_id="old", transaction_type="D", amount=Decimal("20.00"), date="2025/01/05", time="08:00:00")
+    )
+    storage.save(store)
+    assert balance("2025/01/01 00:00:00", "old") == (Decimal("30.00"), None, 1)
+    monkeypatch.setattr(storage_module, "_now_key", lambda: "2025/03/01 00:00:00")
+    storage.upsert_account(Account(account_id="old", name="Old", balance=Decimal("80.00"), account_type="C"))
+    assert balance("2025/01/01 00:00:00", "old") == (Decimal("30.00"), "2025/03/01 00:00:00", 1)
+    assert balance("2025/03/01 00:00:00", "old")[0] == Decimal("80.00")
+    assert balance("2025/01/01 00:00:00", "nope") is None
+
+
+def test_checkpoint_run_during_a_posting_counts_it_once(tmp_path, monkeypatch):
+    storage = Storage(tmp_path / "store.json")
+    monkeypatch.setattr(storage_module, "_now_key", lambda: "2025/01/01 00:00:00")
+    storage.upsert_account(Account(account_id="a", name="A", balance=Decimal("10.00"), account_type="C"))
+    other = Storage(tmp_path / "store.json")
+    original = storage.apply_transaction
+
+    def checkpoint_then_apply(*args):
+        # Another process checkpoints after the posting was computed, before it is saved.
+        other.record_checkpoints("2025/01/31 23:59:59")
+        return original(*args)
+
+    storage.apply_transaction = checkpoint_then_apply
+    payload = TransactionCreate(account_id="a", transaction_type="D", amount=Decimal("5.00"), date="2025/01/10", time="12:00:00")
+    create_transaction(storage, payload)
+
+    reopened = Storage(tmp_path / "store.json")
+    assert reopened.get_account("a").balance == Decimal("15.00")
+    assert reopened.balance_as_of("a", "2025/01/31 23:59:59").balance == Decimal("15.00")
+    assert reopened.balance_as_of("a", "2025/12/31 23:59:59").balance == Decimal("15.00")
+    assert reopened.balance_as_of("a", "2025/01/05 00:00:00").balance == Decimal("10.00")
@@ -1,8 +1,11 @@
-import { Component, OnInit } from '@angular/core';
+import { Component, OnDestroy, OnInit } from '@angular/core';
 import { ActivatedRoute } from '@angular/router';
 import { FormBuilder, ReactiveFormsModule, Validators } from '@angular/forms';
 import { ApiService, Account, Transaction } from './api.service';
 import { NgIf, NgFor } from '@angular/common';
+import { Subscription } from 'rxjs';
+
+const STATEMENT_LIMIT = 5;
 
 @Component({
   selector: 'app-account-detail',
@@ -55,10 +58,11 @@ import { NgIf, NgFor } from '@angular/common';
     <p *ngIf="error" style="color: #a33;">{{ error }}</p>
   `,
 })
-export class AccountDetailComponent implements OnInit {
+export class AccountDetailComponent implements OnInit, OnDestroy {
   account?: Account;
   transactions: Transaction[] = [];
   error = '';
+  private subscription?: Subscription;
 
   depositForm = this.fb.group({
     amount: ['0.00', [Validators.required, Validators.min(0.01)]],
@@ -72,6 +76,27 @@ export class AccountDetailComponent implements OnInit {
   ngOnInit(): void {
     const id = this.route.snapshot.paramMap.get('id') ?? '';
     this.loadAccount(id);
+    this.api.watch();
+    this.subscription = this.api.changes$.subscribe((change) => {
+      if (change.entity === 'account' && change.key === id) {
+        if (change.op === 'delete') {
+          this.account = undefined;
+          this.error = 'Account was deleted';
+        } else {
+          this.account = change.data;
+        }
+      } else if (change.entity === 'transaction' && change.data?.account_id === id) {
+        // The statement lists the account's first entries, so only a short one grows.
+        const known = this.transactions.some((txn) => txn.transaction_id === change.key);
+        if (!known && this.transactions.length < STATEMENT_LIMIT) {
+          this.transactions = [...this.transactions, change.data];
+        }
+      }
+    });
+  }
+
+  ngOnDestroy(): void {
+    this.subscription?.unsubscribe();
   }
 
   private loadAccount(id: string): void {
@@ -99,10 +124,7 @@ export class AccountDetailComponent implements OnInit {
     }
     const amount = this.depositForm.value.amount ?? '0.00';
     this.api.deposit(this.account.account_id, String(amount)).subscribe({
-      next: (resp) => {
-        this.account = resp.account;
-        this.loadStatement();
-      },
+      next: (resp) => (this.account = resp.account),
       error: (err) => (this.error = err?.error?.detail ?? 'Deposit failed'),
     });
   }
@@ -113,10 +135,7 @@ export class AccountDetailComponent implements OnInit {
     }
     const amount = this.withdrawForm.value.amount ?? '0.00';
     this.api.withdraw(this.account.account_id, String(amount)).subscribe({
-      next: (resp) => {
-        this.account = resp.account;
-        this.loadStatement();
-      },
+      next: (resp) => (this.account = resp.account),
       error: (err) => (this.error = err?.error?.detail ?? 'Withdrawal failed'),
     });
   }
@@ -126,10 +145,7 @@ export class AccountDetailComponent implements OnInit {
       return;
     }
     this.api.applyInterest(this.account.account_id).subscribe({
-      next: (resp) => {
-        this.account = { ...this.account!, balance: resp.new_balance };
-        this.loadStatement();
-      },
+      next: (resp) => (this.account = { ...this.account!, balance: resp.new_balance }),
       error: (err) => (this.error = err?.error?.detail ?? 'Interest could not be applied'),
     });
   }
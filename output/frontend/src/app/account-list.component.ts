@@ -1,18 +1,40 @@
-import { Component, OnInit } from '@angular/core';
+import { Component, OnDestroy, OnInit } from '@angular/core';
 import { RouterLink } from '@angular/router';
-import { ApiService, Account } from './api.service';
+import { FormBuilder, ReactiveFormsModule } from '@angular/forms';
+import { ApiService, Account, ListQuery, hasFilters } from './api.service';
 import { NgFor, NgIf } from '@angular/common';
+import { Subscription, debounceTime, filter, map, startWith, switchMap } from 'rxjs';
+
+// Only the columns the table shows are requested for filtered views.
+const COLUMNS = 'account_id,name,balance,account_type';
 
 @Component({
   selector: 'app-account-list',
   standalone: true,
-  imports: [RouterLink, NgFor, NgIf],
+  imports: [RouterLink, ReactiveFormsModule, NgFor, NgIf],
   template: `
     <section class="card">
       <div style="display:flex; justify-content: space-between; align-items:center;">
         <h2>Account Snapshot</h2>
         <a routerLink="/accounts/new"><button>Create Account</button></a>
       </div>
+      <form [formGroup]="filters" style="display:flex; gap: 8px; margin-bottom: 12px;">
+        <input formControlName="q" type="search" placeholder="Search name or ID" />
+        <select formControlName="account_type">
+          <option value="">All types</option>
+          <option value="S">Savings</option>
+          <option value="C">Checking</option>
+        </select>
+        <input formControlName="min_balance" type="number" min="0" step="0.01" placeholder="Min balance" />
+        <input formControlName="max_balance" type="number" min="0" step="0.01" placeholder="Max balance" />
+        <select formControlName="sort">
+          <option value="">Unsorted</option>
+          <option value="account_id">ID</option>
+          <option value="name">Name</option>
+          <option value="-balance">Balance, highest first</option>
+          <option value="balance">Balance, lowest first</option>
+        </select>
+      </form>
       <table class="table" *ngIf="accounts.length; else empty">
         <thead>
           <tr>
@@ -39,12 +61,45 @@ import { NgFor, NgIf } from '@angular/common';
     </section>
   `,
 })
-export class AccountListComponent implements OnInit {
+export class AccountListComponent implements OnInit, OnDestroy {
   accounts: Account[] = [];
+  filters = this.fb.group({ q: [''], account_type: [''], min_balance: [''], max_balance: [''], sort: [''] });
+  private subscription?: Subscription;
 
-  constructor(private api: ApiService) {}
+  constructor(private api: ApiService, private fb: FormBuilder) {}
 
   ngOnInit(): void {
-    this.api.listAccounts().subscribe((resp) => (this.accounts = resp.accounts));
+    // Without filters the table is the live copy, fetched only then. With filters the
+    // server filters and sorts: the query runs when the form changes and again after
+    // account changes, never for other entities. A search term takes precedence and
+    // shows the ranked matches instead.
+    this.api.watch();
+    const changed$ = this.api.changes$.pipe(
+      filter((change) => change.entity === 'account' || change.entity === 'store'),
+      debounceTime(500),
+      startWith(null)
+    );
+    this.subscription = this.filters.valueChanges
+      .pipe(
+        startWith(this.filters.value),
+        debounceTime(300),
+        switchMap(({ q, ...query }) => {
+          if (q?.trim()) {
+            const term = q.trim();
+            return changed$.pipe(switchMap(() => this.api.searchAccounts(term).pipe(map((resp) => resp.accounts))));
+          }
+          if (hasFilters(query as ListQuery)) {
+            const params = { ...(query as ListQuery), fields: COLUMNS };
+            return changed$.pipe(switchMap(() => this.api.listAccounts(params).pipe(map((resp) => resp.accounts))));
+          }
+          this.api.load('account');
+          return this.api.accounts$;
+        })
+      )
+      .subscribe((accounts) => (this.accounts = accounts));
+  }
+
+  ngOnDestroy(): void {
+    this.subscription?.unsubscribe();
   }
 }
@@ -1,12 +1,13 @@
-import { Injectable } from '@angular/core';
+import { Injectable, OnDestroy } from '@angular/core';
 import { HttpClient } from '@angular/common/http';
-import { Observable } from 'rxjs';
+import { BehaviorSubject, Observable, Subject, map } from 'rxjs';
 
 export interface Account {
   account_id: string;
   name: string;
   balance: string;
   account_type: string;
+  version?: number;
 }
 
 export interface Transaction {
@@ -18,6 +19,28 @@ export interface Transaction {
   time: string;
 }
 
+// Filters, `sort` and `fields` for the list endpoints; empty values are left out.
+export type ListQuery = Record<string, string | number | null | undefined>;
+
+export interface ChangeEvent {
+  offset: number;
+  entity: 'account' | 'transaction' | 'scheduled_task' | 'task_execution' | 'store';
+  op: 'upsert' | 'delete' | 'reset';
+  key: string;
+  data: any | null;
+}
+
+export interface DashboardSummary {
+  account_count: number;
+  total_balance: string;
+  average_balance: string;
+  accounts_by_type: Record<string, { count: number; total_balance: string }>;
+  transaction_count: number;
+  transactions_by_type: Record<string, { count: number; total_amount: string }>;
+  month: string;
+  interest_this_month: string;
+}
+
 export interface ScheduledTask {
   id: string;
   display_name: string;
@@ -34,27 +57,152 @@ export interface ScheduledTaskExecution {
   task_id: string;
   status: string;
   started_at: string;
-  finished_at: string;
+  finished_at: string | null;
   log_path: string;
+  trigger?: string | null;
+  scheduled_at?: string | null;
+  fire_lag_ms?: number | null;
+  queue_wait_ms?: number | null;
+  duration_ms?: number | null;
 }
 
 export interface ScheduledTaskLogItem {
   execution_id: string;
   log_path: string;
+  size?: number | null;
+  created_at?: string | null;
 }
 
+// A live copy of one list: fetched once when a view asks for it, then kept current
+// from the change stream. Changes that arrive during the fetch are applied on top.
+class LiveList<T> {
+  loaded = false;
+  private state = new Map<string, T>();
+  private subject = new BehaviorSubject<T[]>([]);
+  private buffered: ChangeEvent[] | null = null;
+
+  readonly items$ = this.subject.asObservable();
+
+  constructor(private fetch: () => Observable<T[]>, private key: (item: T) => string) {}
+
+  load(): void {
+    this.loaded = true;
+    this.buffered = [];
+    this.fetch().subscribe({
+      next: (items) => {
+        this.state = new Map(items.map((item) => [this.key(item), item]));
+        const pending = this.buffered ?? [];
+        this.buffered = null;
+        pending.forEach((change) => applyDelta(this.state, change));
+        this.publish();
+      },
+      error: () => {
+        this.buffered = null;
+        this.loaded = false;
+      },
+    });
+  }
+
+  receive(change: ChangeEvent): void {
+    if (!this.loaded) {
+      return;
+    }
+    if (this.buffered) {
+      this.buffered.push(change);
+      return;
+    }
+    applyDelta(this.state, change);
+    this.publish();
+  }
+
+  private publish(): void {
+    this.subject.next([...this.state.values()]);
+  }
+}
+
+export type LiveListName = 'account' | 'transaction' | 'scheduled_task';
+
 @Injectable({ providedIn: 'root' })
-export class ApiService {
+export class ApiService implements OnDestroy {
   private baseUrl = 'http://localhost:8000';
 
+  // Only the lists some view has asked for are fetched; see watch() and load().
+  private lists: Record<LiveListName, LiveList<any>> = {
+    account: new LiveList<Account>(
+      () => this.listAccounts().pipe(map((resp) => resp.accounts)),
+      (item) => item.account_id
+    ),
+    transaction: new LiveList<Transaction>(
+      () => this.listTransactions().pipe(map((resp) => resp.transactions)),
+      (item) => item.transaction_id
+    ),
+    scheduled_task: new LiveList<ScheduledTask>(
+      () => this.listScheduledTasks().pipe(map((resp) => resp.tasks)),
+      (item) => item.id
+    ),
+  };
+  private changesSubject = new Subject<ChangeEvent>();
+  private events?: EventSource;
+
+  readonly accounts$: Observable<Account[]> = this.lists.account.items$;
+  readonly transactions$: Observable<Transaction[]> = this.lists.transaction.items$;
+  readonly scheduledTasks$: Observable<ScheduledTask[]> = this.lists.scheduled_task.items$;
+  readonly changes$ = this.changesSubject.asObservable();
+
   constructor(private http: HttpClient) {}
 
+  ngOnDestroy(): void {
+    this.events?.close();
+  }
+
+  // Opens GET /events without fetching any list. Views that only react to changes
+  // (the dashboard summary, filtered queries, one account) need nothing more.
+  watch(): void {
+    if (this.events) {
+      return;
+    }
+    this.events = new EventSource(`${this.baseUrl}/events`);
+    this.events.addEventListener('change', (message) => this.receive(JSON.parse((message as MessageEvent).data)));
+    // Changes were missed: refetch the lists in use and let everyone else refresh.
+    this.events.addEventListener('reset', () =>
+      this.receive({ offset: -1, entity: 'store', op: 'reset', key: '', data: null })
+    );
+  }
+
+  // Keeps the named list's live copy current, fetching it on first use. The stream
+  // is opened first, so nothing committed during the fetch is missed.
+  load(name: LiveListName): void {
+    this.watch();
+    if (!this.lists[name].loaded) {
+      this.lists[name].load();
+    }
+  }
+
+  private receive(change: ChangeEvent): void {
+    if (change.entity === 'store') {
+      Object.values(this.lists)
+        .filter((list) => list.loaded)
+        .forEach((list) => list.load());
+    } else if (change.entity in this.lists) {
+      this.lists[change.entity as LiveListName].receive(change);
+    }
+    this.changesSubject.next(change);
+  }
+
   health(): Observable<{ status: string }> {
     return this.http.get<{ status: string }>(`${this.baseUrl}/health`);
   }
 
-  listAccounts(): Observable<{ accounts: Account[] }> {
-    return this.http.get<{ accounts: Account[] }>(`${this.baseUrl}/accounts`);
+  summary(): Observable<DashboardSummary> {
+    return this.http.get<DashboardSummary>(`${this.baseUrl}/summary`);
+  }
+
+  listAccounts(query: ListQuery = {}): Observable<{ accounts: Account[] }> {
+    return this.http.get<{ accounts: Account[] }>(`${this.baseUrl}/accounts`, { params: queryParams(query) });
+  }
+
+  searchAccounts(q: string, limit = 20): Observable<{ accounts: Account[] }> {
+    return this.http.get<{ accounts: Account[] }>(`${this.baseUrl}/accounts/search`, { params: { q, limit } });
   }
 
   getAccount(accountId: string): Observable<Account> {
@@ -65,8 +213,9 @@ export class ApiService {
     return this.http.post<Account>(`${this.baseUrl}/accounts`, payload);
   }
 
-  updateAccount(accountId: string, payload: Omit<Account, 'account_id'>): Observable<Account> {
-    return this.http.put<Account>(`${this.baseUrl}/accounts/${accountId}`, payload);
+  updateAccount(accountId: string, payload: Omit<Account, 'account_id' | 'version'>, version?: number): Observable<Account> {
+    const headers = version === undefined ? undefined : { 'If-Match': `"${version}"` };
+    return this.http.put<Account>(`${this.baseUrl}/accounts/${accountId}`, payload, { headers });
   }
 
   deleteAccount(accountId: string): Observable<{ status: string }> {
@@ -95,8 +244,10 @@ export class ApiService {
     );
   }
 
-  listTransactions(): Observable<{ transactions: Transaction[] }> {
-    return this.http.get<{ transactions: Transaction[] }>(`${this.baseUrl}/transactions`);
+  listTransactions(query: ListQuery = {}): Observable<{ transactions: Transaction[] }> {
+    return this.http.get<{ transactions: Transaction[] }>(`${this.baseUrl}/transactions`, {
+      params: queryParams(query),
+    });
   }
 
   listScheduledTasks(): Observable<{ tasks: ScheduledTask[] }> {
@@ -142,3 +293,25 @@ export class ApiService {
     return this.http.post<ScheduledTaskExecution>(`${this.baseUrl}/scheduled-tasks/${taskId}/run`, {});
   }
 }
+
+function applyDelta<T>(state: Map<string, T>, change: ChangeEvent): void {
+  if (change.op === 'delete') {
+    state.delete(change.key);
+  } else {
+    state.set(change.key, change.data as T);
+  }
+}
+
+export function hasFilters(query: ListQuery): boolean {
+  return Object.values(query).some((value) => value !== null && value !== undefined && value !== '');
+}
+
+function queryParams(query: ListQuery): Record<string, string | number> {
+  const params: Record<string, string | number> = {};
+  for (const [key, value] of Object.entries(query)) {
+    if (value !== null && value !== undefined && value !== '') {
+      params[key] = value;
+    }
+  }
+  return params;
+}
@@ -1,21 +1,64 @@
-import { Component, OnInit } from '@angular/core';
-import { ApiService } from './api.service';
-import { NgIf } from '@angular/common';
+import { Component, OnDestroy, OnInit } from '@angular/core';
+import { ApiService, DashboardSummary } from './api.service';
+import { KeyValuePipe, NgFor, NgIf } from '@angular/common';
+import { Subscription, debounceTime, filter } from 'rxjs';
 
 @Component({
   selector: 'app-dashboard',
   standalone: true,
-  imports: [NgIf],
+  imports: [NgIf, NgFor, KeyValuePipe],
   template: `
     <section class="card">
       <h2>Welcome back</h2>
       <p>System status: <strong>{{ status }}</strong></p>
       <p>Use the navigation to manage accounts, log transactions, and apply interest.</p>
     </section>
+    <section class="card" *ngIf="summary">
+      <h2>Book Summary</h2>
+      <p>
+        {{ summary.account_count }} accounts holding {{ summary.total_balance }}
+        (average {{ summary.average_balance }}). Interest paid in {{ summary.month }}:
+        {{ summary.interest_this_month }}.
+      </p>
+      <table class="table">
+        <thead>
+          <tr>
+            <th>Account Type</th>
+            <th>Accounts</th>
+            <th>Balance</th>
+          </tr>
+        </thead>
+        <tbody>
+          <tr *ngFor="let item of summary.accounts_by_type | keyvalue">
+            <td>{{ item.key }}</td>
+            <td>{{ item.value.count }}</td>
+            <td>{{ item.value.total_balance }}</td>
+          </tr>
+        </tbody>
+      </table>
+      <table class="table">
+        <thead>
+          <tr>
+            <th>Transaction Type</th>
+            <th>Count</th>
+            <th>Amount</th>
+          </tr>
+        </thead>
+        <tbody>
+          <tr *ngFor="let item of summary.transactions_by_type | keyvalue">
+            <td>{{ item.key }}</td>
+            <td>{{ item.value.count }}</td>
+            <td>{{ item.value.total_amount }}</td>
+          </tr>
+        </tbody>
+      </table>
+    </section>
   `,
 })
-export class DashboardComponent implements OnInit {
+export class DashboardComponent implements OnInit, OnDestroy {
   status = 'checking...';
+  summary?: DashboardSummary;
+  private subscription?: Subscription;
 
   constructor(private api: ApiService) {}
 
@@ -24,5 +67,23 @@ export class DashboardComponent implements OnInit {
       next: (resp) => (this.status = resp.status),
       error: () => (this.status = 'offline'),
     });
+    this.loadSummary();
+    // The summary is constant-time to fetch, so a burst of changes just triggers one
+    // refresh. Only the change stream is opened; no list is downloaded for it.
+    this.api.watch();
+    this.subscription = this.api.changes$
+      .pipe(
+        filter((change) => change.entity !== 'scheduled_task' && change.entity !== 'task_execution'),
+        debounceTime(500)
+      )
+      .subscribe(() => this.loadSummary());
+  }
+
+  ngOnDestroy(): void {
+    this.subscription?.unsubscribe();
+  }
+
+  private loadSummary(): void {
+    this.api.summary().subscribe((resp) => (this.summary = resp));
   }
 }
@@ -1,7 +1,8 @@
-import { Component, OnInit } from '@angular/core';
+import { Component, OnDestroy, OnInit } from '@angular/core';
 import { FormBuilder, ReactiveFormsModule, Validators, FormsModule } from '@angular/forms';
 import { NgFor, NgIf } from '@angular/common';
-import { ApiService, ScheduledTask, ScheduledTaskExecution, ScheduledTaskLogItem } from './api.service';
+import { Subscription } from 'rxjs';
+import { ApiService, ChangeEvent, ScheduledTask, ScheduledTaskExecution, ScheduledTaskLogItem } from './api.service';
 
 const CRON_PATTERN = /^\S+\s+\S+\s+\S+\s+\S+\s+\S+$/;
 
@@ -164,7 +165,7 @@ const CRON_PATTERN = /^\S+\s+\S+\s+\S+\s+\S+\s+\S+$/;
     </section>
   `,
 })
-export class ScheduledTasksComponent implements OnInit {
+export class ScheduledTasksComponent implements OnInit, OnDestroy {
   tasks: ScheduledTask[] = [];
   executions: ScheduledTaskExecution[] = [];
   logs: ScheduledTaskLogItem[] = [];
@@ -192,21 +193,48 @@ export class ScheduledTasksComponent implements OnInit {
 
   constructor(private api: ApiService, private fb: FormBuilder) {}
 
-  ngOnInit(): void {
-    this.loadTasks();
-  }
+  private subscriptions: Subscription[] = [];
 
-  loadTasks(): void {
-    this.api.listScheduledTasks().subscribe({
-      next: (resp) => {
-        this.tasks = resp.tasks;
+  ngOnInit(): void {
+    this.api.load('scheduled_task');
+    this.subscriptions = [
+      this.api.scheduledTasks$.subscribe((tasks) => {
+        this.tasks = tasks;
         if (this.selectedTask) {
           const updated = this.tasks.find((task) => task.id === this.selectedTask?.id) ?? null;
           this.selectedTask = updated;
+          if (!updated) {
+            this.executions = [];
+            this.logs = [];
+            this.selectedLog = '';
+          }
         }
-      },
-      error: () => (this.error = 'Unable to load tasks'),
-    });
+      }),
+      this.api.changes$.subscribe((change) => this.applyExecutionChange(change)),
+    ];
+  }
+
+  ngOnDestroy(): void {
+    this.subscriptions.forEach((subscription) => subscription.unsubscribe());
+  }
+
+  private applyExecutionChange(change: ChangeEvent): void {
+    if (change.entity !== 'task_execution' || !this.selectedTask) {
+      return;
+    }
+    if (change.op === 'delete') {
+      this.executions = this.executions.filter((execution) => execution.id !== change.key);
+      return;
+    }
+    const execution = change.data as ScheduledTaskExecution;
+    if (execution.task_id !== this.selectedTask.id) {
+      return;
+    }
+    const index = this.executions.findIndex((item) => item.id === execution.id);
+    this.executions =
+      index === -1
+        ? [...this.executions, execution]
+        : this.executions.map((item, position) => (position === index ? execution : item));
   }
 
   resetForm(): void {
@@ -250,19 +278,13 @@ export class ScheduledTasksComponent implements OnInit {
     };
     if (this.editingTaskId) {
       this.api.updateScheduledTask(this.editingTaskId, payload).subscribe({
-        next: () => {
-          this.loadTasks();
-          this.resetForm();
-        },
+        next: () => this.resetForm(),
         error: (err) => (this.error = err?.error?.detail ?? 'Unable to update task'),
       });
       return;
     }
     this.api.createScheduledTask(payload).subscribe({
-      next: () => {
-        this.loadTasks();
-        this.resetForm();
-      },
+      next: () => this.resetForm(),
       error: (err) => (this.error = err?.error?.detail ?? 'Unable to create task'),
     });
   }
@@ -279,7 +301,6 @@ export class ScheduledTasksComponent implements OnInit {
           this.logs = [];
           this.selectedLog = '';
         }
-        this.loadTasks();
       },
       error: () => (this.error = 'Unable to delete task'),
     });
@@ -325,7 +346,6 @@ export class ScheduledTasksComponent implements OnInit {
     }
     this.api.runScheduledTask(this.selectedTask.id).subscribe({
       next: (execution) => {
-        this.loadExecutions(this.selectedTask!.id);
         this.loadLogs(this.selectedTask!.id);
         this.loadLog(execution);
       },
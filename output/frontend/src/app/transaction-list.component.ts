@@ -1,14 +1,34 @@
-import { Component, OnInit } from '@angular/core';
-import { ApiService, Transaction } from './api.service';
+import { Component, OnDestroy, OnInit } from '@angular/core';
+import { FormBuilder, ReactiveFormsModule } from '@angular/forms';
+import { ApiService, ListQuery, Transaction, hasFilters } from './api.service';
 import { NgFor } from '@angular/common';
+import { Subscription, debounceTime, filter, map, startWith, switchMap } from 'rxjs';
 
 @Component({
   selector: 'app-transaction-list',
   standalone: true,
-  imports: [NgFor],
+  imports: [ReactiveFormsModule, NgFor],
   template: `
     <section class="card">
       <h2>Transaction Journal</h2>
+      <form [formGroup]="filters" style="display:flex; gap: 8px; margin-bottom: 12px;">
+        <input formControlName="account_id" placeholder="Account ID" />
+        <select formControlName="transaction_type">
+          <option value="">All types</option>
+          <option value="D">Deposits</option>
+          <option value="W">Withdrawals</option>
+          <option value="I">Interest</option>
+        </select>
+        <input formControlName="from" type="date" />
+        <input formControlName="to" type="date" />
+        <input formControlName="min_amount" type="number" min="0" step="0.01" placeholder="Min amount" />
+        <select formControlName="sort">
+          <option value="">Unsorted</option>
+          <option value="-date,-time">Newest first</option>
+          <option value="date,time">Oldest first</option>
+          <option value="-amount">Largest first</option>
+        </select>
+      </form>
       <table class="table">
         <thead>
           <tr>
@@ -34,12 +54,40 @@ import { NgFor } from '@angular/common';
     </section>
   `,
 })
-export class TransactionListComponent implements OnInit {
+export class TransactionListComponent implements OnInit, OnDestroy {
   transactions: Transaction[] = [];
+  filters = this.fb.group({ account_id: [''], transaction_type: [''], from: [''], to: [''], min_amount: [''], sort: [''] });
+  private subscription?: Subscription;
 
-  constructor(private api: ApiService) {}
+  constructor(private api: ApiService, private fb: FormBuilder) {}
 
   ngOnInit(): void {
-    this.api.listTransactions().subscribe((resp) => (this.transactions = resp.transactions));
+    // Same split as the account list: live copy unfiltered, server query otherwise,
+    // re-run only after transaction changes.
+    this.api.watch();
+    const changed$ = this.api.changes$.pipe(
+      filter((change) => change.entity === 'transaction' || change.entity === 'store'),
+      debounceTime(500),
+      startWith(null)
+    );
+    this.subscription = this.filters.valueChanges
+      .pipe(
+        startWith(this.filters.value),
+        debounceTime(300),
+        switchMap((query) => {
+          if (hasFilters(query as ListQuery)) {
+            return changed$.pipe(
+              switchMap(() => this.api.listTransactions(query as ListQuery).pipe(map((resp) => resp.transactions)))
+            );
+          }
+          this.api.load('transaction');
+          return this.api.transactions$;
+        })
+      )
+      .subscribe((transactions) => (this.transactions = transactions));
+  }
+
+  ngOnDestroy(): void {
+    this.subscription?.unsubscribe();
   }
 }